@@ -6,16 +6,57 @@ Data: 2025-10-27
 """
 
 import os
+import re
 import json
 import sqlite3
 import secrets
+import shutil
 import csv
+import atexit
+import base64
+import bisect
+import cProfile
+import functools
+import gzip
+import hashlib
+import heapq
+import html
+import io
+import mimetypes
+import mmap
+import pickle
+import pstats
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, send_from_directory
+from flask import g, has_request_context
+from flask import before_render_template, template_rendered
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
-import pandas as pd
+from jinja2.utils import htmlsafe_json_dumps
 from waitress import serve
 
+try:
+    import brotli  # opcjonalnie - warianty .br zasobów statycznych
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image, ImageDraw, ImageFont  # opcjonalnie - obrazki wykresów PNG
+except ImportError:
+    Image = ImageDraw = ImageFont = None
+
+try:
+    import fcntl  # blokada parsowania między procesami (Linux); Windows działa w jednym procesie
+except ImportError:
+    fcntl = None
+
 # Konfiguracja aplikacji Flask
 app = Flask(__name__)
 
@@ -31,11 +72,340 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Max 16MB upload
 # Dozwolone rozszerzenia plików
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp'}
 
+# ==================== METRYKI (PROMETHEUS) ====================
+#
+# Lekkie liczniki i histogramy w pamięci procesu: czas odpowiedzi, kody statusu
+# i liczba trwających żądań per trasa oraz czasy etapów wewnętrznych
+# (parsowanie Excela, zapytania SQLite, renderowanie szablonów, serializacja JSON).
+# Eksport w formacie tekstowym Prometheusa pod /metrics.
+
+METRIC_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRIC_HELP = {
+    'kiosk_http_requests_total': ('counter', 'Liczba obsłużonych żądań HTTP'),
+    'kiosk_http_request_duration_seconds': ('histogram', 'Czas obsługi żądania HTTP'),
+    'kiosk_http_requests_in_flight': ('gauge', 'Liczba żądań obsługiwanych w tej chwili'),
+    'kiosk_stage_duration_seconds': ('histogram', 'Czas etapów wewnętrznych (Excel, SQLite, szablony, JSON)'),
+    'kiosk_server_threads': ('gauge', 'Liczba wątków roboczych serwera'),
+    'kiosk_singleflight_calls_total': ('counter', 'Wywołania kosztownych obliczeń (leader liczy, waiter czeka na jego wynik)'),
+    'kiosk_data_queue_waiting': ('gauge', 'Żądania czekające na miejsce do liczenia danych'),
+    'kiosk_load_shed_total': ('counter', 'Żądania obsłużone nieaktualną odpowiedzią (stale) lub odrzucone (rejected)'),
+    'kiosk_compression_total': ('counter', 'Skompresowane odpowiedzi (cache: hit - gotowa treść z pamięci, miss/off - kompresja)')
+}
+
+class Metrics:
+    """Rejestr metryk procesu (liczniki, wskaźniki, histogramy) z eksportem do Prometheusa"""
+
+    def __init__(self, buckets=METRIC_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._values = {}       # (nazwa, etykiety) -> wartość licznika/wskaźnika
+        self._histograms = {}   # (nazwa, etykiety) -> [liczniki kubełków..., suma, liczba]
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            key = (name, labels)
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, labels=(), value=0):
+        with self._lock:
+            self._values[(name, labels)] = value
+
+    def observe(self, name, labels, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = [0] * (len(self.buckets) + 3)
+            histogram[index] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        """Metryki w formacie tekstowym Prometheusa (text/plain; version=0.0.4)"""
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: list(h) for key, h in self._histograms.items()}
+
+        lines = []
+        for name, (metric_type, help_text) in METRIC_HELP.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type == 'histogram':
+                for (metric, labels), histogram in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bucket, count in zip(self.buckets + ('+Inf',), histogram):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._format_labels(labels, [('le', bucket)])} {cumulative}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {histogram[-2]:.6f}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {histogram[-1]}")
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self._format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+@contextmanager
+def timed_stage(stage):
+    """Zmierz czas etapu wewnętrznego (kiosk_stage_duration_seconds)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe('kiosk_stage_duration_seconds', (('stage', stage),), time.perf_counter() - start)
+
+def timed(stage):
+    """Dekorator mierzący czas wywołania funkcji jako etap wewnętrzny"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class TimedCursor(sqlite3.Cursor):
+    """Kursor SQLite mierzący czas execute/executemany"""
+
+    def execute(self, *args, **kwargs):
+        with timed_stage('sqlite'):
+            return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        with timed_stage('sqlite'):
+            return super().executemany(*args, **kwargs)
+
+class TimedConnection(sqlite3.Connection):
+    """
+    Połączenie SQLite, którego kursory mierzą czas zapytań. Connection.execute/executemany
+    w CPython wykonują zapytanie z pominięciem kursora z fabryki, więc idą tu przez cursor().
+    """
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args, **kwargs):
+        return self.cursor().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self.cursor().executemany(*args, **kwargs)
+
+    def executescript(self, *args, **kwargs):
+        with timed_stage('sqlite'):
+            return super().executescript(*args, **kwargs)
+
+def db_connect(path='kiosk.db', **kwargs):
+    """Otwórz połączenie z bazą kiosku (zapytania liczone w metrykach)"""
+    return sqlite3.connect(path, factory=TimedConnection, **kwargs)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Serializacja JSON (jsonify) liczona jako etap 'json'"""
+
+    def response(self, *args, **kwargs):
+        with timed_stage('json'):
+            return super().response(*args, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
+_metrics_local = threading.local()
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def _metrics_start_request():
+    request.environ['kiosk.metrics_start'] = time.perf_counter()
+    metrics.inc('kiosk_http_requests_in_flight', (('route', _route_label()),))
+
+@app.after_request
+def _metrics_response_status(response):
+    request.environ['kiosk.metrics_status'] = response.status_code
+    return response
+
+@app.teardown_request
+def _metrics_finish_request(exc):
+    start = request.environ.pop('kiosk.metrics_start', None)
+    if start is None:
+        return
+    route = _route_label()
+    status = 500 if exc is not None else request.environ.get('kiosk.metrics_status', 500)
+    metrics.inc('kiosk_http_requests_in_flight', (('route', route),), -1)
+    metrics.inc('kiosk_http_requests_total', (('method', request.method), ('route', route), ('status', str(status))))
+    metrics.observe('kiosk_http_request_duration_seconds', (('route', route),), time.perf_counter() - start)
+
+def _template_render_start(sender, template, context, **extra):
+    _metrics_local.template_start = time.perf_counter()
+
+def _template_render_done(sender, template, context, **extra):
+    start = getattr(_metrics_local, 'template_start', None)
+    if start is not None:
+        metrics.observe('kiosk_stage_duration_seconds', (('stage', 'template_render'),), time.perf_counter() - start)
+        _metrics_local.template_start = None
+
+before_render_template.connect(_template_render_start, app)
+template_rendered.connect(_template_render_done, app)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metryki procesu w formacie Prometheusa (w trybie wieloprocesowym - metryki jednego procesu)"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ==================== PROFILOWANIE ŻĄDAŃ ====================
+#
+# Tryb diagnostyczny dla admina: pojedyncze żądanie (?profile=1 lub nagłówek
+# X-Kiosk-Profile: 1 przy zalogowanej sesji) albo N kolejnych żądań do wybranej
+# trasy jest wykonywane pod cProfile. Profil trafia do profiles/*.prof (do
+# otwarcia w pstats / snakeviz), a w bazie zostaje podsumowanie najdroższych funkcji.
+
+PROFILE_FOLDER = 'profiles'
+PROFILE_KEEP = 50
+PROFILE_TOP_FUNCTIONS = 25
+PROFILE_ARMED_TTL = 2  # sekundy - jak często odświeżać listę uzbrojonych tras z bazy
+
+# Profiler jest globalny dla interpretera - naraz profilujemy tylko jedno żądanie
+_profile_lock = threading.Lock()
+_armed_cache = {'routes': frozenset(), 'expires': 0.0}
+
+def _armed_routes():
+    """Trasy z aktywnym licznikiem profilowania (z krótkim cache, by nie pytać bazy przy każdym żądaniu)"""
+    now = time.monotonic()
+    if now < _armed_cache['expires']:
+        return _armed_cache['routes']
+    try:
+        conn = db_connect()
+        rows = conn.execute("SELECT route FROM profiling_targets WHERE remaining > 0").fetchall()
+        conn.close()
+        routes = frozenset(row[0] for row in rows)
+    except sqlite3.Error:
+        routes = frozenset()
+    _armed_cache.update(routes=routes, expires=now + PROFILE_ARMED_TTL)
+    return routes
+
+def _claim_profile_slot(route):
+    """Zdejmij jedno żądanie z licznika trasy (atomowo - także między procesami)"""
+    conn = db_connect(timeout=5)
+    try:
+        with conn:
+            claimed = conn.execute("UPDATE profiling_targets SET remaining = remaining - 1 "
+                                   "WHERE route=? AND remaining > 0", (route,)).rowcount == 1
+    except sqlite3.Error as e:
+        print(f"Błąd profilowania trasy {route}: {e}")
+        claimed = False
+    finally:
+        conn.close()
+    if not claimed:
+        _armed_cache['expires'] = 0.0
+    return claimed
+
+def _profile_requested():
+    # Najpierw tani test parametru, dopiero potem sesja (nie czytamy cookie przy każdym żądaniu)
+    flag = request.args.get('profile') or request.headers.get('X-Kiosk-Profile')
+    return flag in ('1', 'true') and bool(session.get('authenticated'))
+
+def profile_routes():
+    """Trasy, które można uzbroić do profilowania (bez plików statycznych i samego profilowania)"""
+    return sorted({rule.rule for rule in app.url_map.iter_rules()
+                   if rule.endpoint != 'static'
+                   and not rule.rule.startswith(('/static', '/api/profiling', '/metrics'))})
+
+def summarize_profile(profiler, limit=PROFILE_TOP_FUNCTIONS):
+    """Najdroższe funkcje profilu (wg czasu łącznego) jako lista słowników"""
+    stats = pstats.Stats(profiler)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    summary = []
+    for func in stats.fcn_list[:limit]:
+        primitive_calls, total_calls, tottime, cumtime, _ = stats.stats[func]
+        summary.append({
+            'function': pstats.func_std_string(func),
+            'calls': total_calls,
+            'primitive_calls': primitive_calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3)
+        })
+    return summary
+
+def save_profile(profiler, route, duration, status):
+    """Zapisz profil do pliku .prof i podsumowanie do bazy; usuń najstarsze ponad PROFILE_KEEP"""
+    os.makedirs(PROFILE_FOLDER, exist_ok=True)
+    filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(4)}.prof"
+    profiler.dump_stats(os.path.join(PROFILE_FOLDER, filename))
+    summary = summarize_profile(profiler)
+
+    conn = db_connect(timeout=30)
+    try:
+        with conn:
+            conn.execute("INSERT INTO profiles (route, method, path, status, duration_ms, filename, summary) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (route, request.method, request.full_path.rstrip('?'), status,
+                          round(duration * 1000, 2), filename, json.dumps(summary)))
+            old = conn.execute("SELECT id, filename FROM profiles ORDER BY id DESC LIMIT -1 OFFSET ?",
+                               (PROFILE_KEEP,)).fetchall()
+            conn.executemany("DELETE FROM profiles WHERE id=?", [(row[0],) for row in old])
+    finally:
+        conn.close()
+
+    for _, old_filename in old:
+        try:
+            os.remove(os.path.join(PROFILE_FOLDER, old_filename))
+        except OSError:
+            pass
+    print(f"🔬 Zapisano profil {route} ({duration * 1000:.1f} ms): {filename}")
+
+@app.before_request
+def _profile_start_request():
+    if request.url_rule is None:
+        return
+    route = request.url_rule.rule
+    if route == '/metrics' or route.startswith('/api/profiling'):
+        return
+    requested = _profile_requested()
+    if not requested and route not in _armed_routes():
+        return
+    if not _profile_lock.acquire(blocking=False):
+        print(f"⚠️ Pominięto profilowanie {route} - trwa inne profilowanie")
+        return
+    # Licznik trasy zmniejszamy dopiero, gdy profiler jest wolny - żadne żądanie z puli N nie przepada
+    if not requested and not _claim_profile_slot(route):
+        _profile_lock.release()
+        return
+
+    profiler = cProfile.Profile()
+    request.environ['kiosk.profiler'] = (profiler, time.perf_counter())
+    profiler.enable()
+
+@app.teardown_request
+def _profile_finish_request(exc):
+    entry = request.environ.pop('kiosk.profiler', None)
+    if entry is None:
+        return
+    profiler, start = entry
+    try:
+        profiler.disable()
+    finally:
+        _profile_lock.release()
+
+    status = 500 if exc is not None else request.environ.get('kiosk.metrics_status', 500)
+    try:
+        save_profile(profiler, request.url_rule.rule, time.perf_counter() - start, status)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Błąd zapisu profilu: {e}")
+
 # ==================== BAZA DANYCH ====================
 
 def init_db():
     """Inicjalizacja bazy danych SQLite"""
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     
     # Tabela z ustawieniami ogólnymi
@@ -69,6 +439,105 @@ def init_db():
                   filename TEXT UNIQUE,
                   position INTEGER DEFAULT 0)''')
     
+    # Tabela z wersjami danych Export/Jumbo (wspólna dla wszystkich procesów)
+    c.execute('''CREATE TABLE IF NOT EXISTS data_versions
+                 (name TEXT PRIMARY KEY,
+                  version INTEGER DEFAULT 0,
+                  snapshot TEXT,
+                  source_mtime REAL,
+                  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    
+    # Tabela ze zdarzeniami SSE (tryb wieloprocesowy)
+    c.execute('''CREATE TABLE IF NOT EXISTS kiosk_events
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  type TEXT,
+                  data TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    
+    # Tabela z pytaniami quizowymi (stałe id, indeks po datach obowiązywania)
+    c.execute('''CREATE TABLE IF NOT EXISTS quiz_questions
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  category TEXT,
+                  question TEXT,
+                  answer1 TEXT,
+                  answer2 TEXT,
+                  answer3 TEXT,
+                  answer4 TEXT,
+                  correct_index INTEGER DEFAULT 1,
+                  explanation TEXT,
+                  start_date TEXT,
+                  end_date TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_quiz_questions_dates ON quiz_questions (start_date, end_date)")
+    
+    # Odpowiedzi z kiosku (zapisywane partiami) i statystyki dzienne aktualizowane przyrostowo
+    c.execute('''CREATE TABLE IF NOT EXISTS quiz_answers
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  question_id INTEGER,
+                  answer_index INTEGER,
+                  is_correct INTEGER,
+                  answered_at TIMESTAMP)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS quiz_answer_stats
+                 (question_id INTEGER,
+                  day TEXT,
+                  answers INTEGER DEFAULT 0,
+                  correct INTEGER DEFAULT 0,
+                  answer1_count INTEGER DEFAULT 0,
+                  answer2_count INTEGER DEFAULT 0,
+                  answer3_count INTEGER DEFAULT 0,
+                  answer4_count INTEGER DEFAULT 0,
+                  PRIMARY KEY (question_id, day))''')
+    
+    # Raporty wczytywania plików Excel (czasy etapów, jakość danych)
+    c.execute('''CREATE TABLE IF NOT EXISTS ingest_reports
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  dataset TEXT,
+                  filename TEXT,
+                  status TEXT,
+                  rows INTEGER,
+                  total_ms REAL,
+                  report TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    
+    # Wersje plików danych (pliki w data/versions/); opublikowana = najnowsze published_at
+    c.execute('''CREATE TABLE IF NOT EXISTS data_files
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  dataset TEXT,
+                  filename TEXT UNIQUE,
+                  original_name TEXT,
+                  size INTEGER,
+                  rows INTEGER,
+                  published_at REAL,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    
+    # Profilowanie żądań: liczniki uzbrojonych tras i zapisane profile (pliki w profiles/)
+    c.execute('''CREATE TABLE IF NOT EXISTS profiling_targets
+                 (route TEXT PRIMARY KEY,
+                  remaining INTEGER DEFAULT 0,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS profiles
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  route TEXT,
+                  method TEXT,
+                  path TEXT,
+                  status INTEGER,
+                  duration_ms REAL,
+                  filename TEXT,
+                  summary TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    
+    # Jednorazowy import pytań z pliku CSV (poprzedni sposób przechowywania)
+    c.execute("SELECT COUNT(*) FROM data_versions WHERE name='quiz'")
+    if c.fetchone()[0] == 0:
+        if os.path.exists(QUIZ_CSV_PATH):
+            with open(QUIZ_CSV_PATH, 'r', encoding='utf-8-sig') as f:
+                rows, errors = parse_quiz_csv(f.read())
+            for error in errors:
+                print(f"⚠️ Import pytań quizowych - pominięto: {error}")
+            insert_quiz_questions(c, rows, keep_ids=True)
+            print(f"✅ Zaimportowano {len(rows)} pytań quizowych z {QUIZ_CSV_PATH}")
+        c.execute("INSERT INTO data_versions (name, version) VALUES ('quiz', 1)")
+    
     # Wstaw domyślne ustawienia jeśli nie istnieją
     c.execute("SELECT COUNT(*) FROM settings")
     if c.fetchone()[0] == 0:
@@ -107,7 +576,7 @@ def init_db():
 
 def get_setting(key):
     """Pobierz ustawienie z bazy danych"""
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     c.execute("SELECT value FROM settings WHERE key=?", (key,))
     result = c.fetchone()
@@ -116,7 +585,7 @@ def get_setting(key):
 
 def update_setting(key, value):
     """Aktualizuj ustawienie w bazie danych"""
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
     conn.commit()
@@ -124,7 +593,7 @@ def update_setting(key, value):
 
 def get_inspirations():
     """Pobierz wszystkie inspiracje"""
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     c.execute("SELECT id, title, description, image_url FROM inspirations ORDER BY created_at DESC")
     inspirations = [{'id': row[0], 'title': row[1], 'description': row[2], 'image_url': row[3]} 
@@ -132,6 +601,140 @@ def get_inspirations():
     conn.close()
     return inspirations
 
+# ==================== RAPORT WCZYTYWANIA DANYCH ====================
+#
+# Każdy upload Export.xlsx / Jumbo.xlsx zostawia raport: czas kolejnych etapów
+# (otwarcie archiwum zip, wybór arkusza, odczyt komórek, przekształcenie, konwersja typów,
+# budowa indeksów, publikacja migawki) oraz jakość danych - puste i nieliczbowe
+# komórki per kolumna i brakujące dni per maszyna. Wolny albo uszkodzony eksport
+# z ERP widać w panelu admina, zanim trafi na kioski.
+
+INGEST_REPORT_KEEP = 100
+INGEST_MISSING_DAYS_LIMIT = 50  # maksymalna liczba maszyn/segmentów z brakami w raporcie
+
+class IngestReport:
+    """Czasy etapów i statystyki jakości jednego wczytania pliku Excel"""
+
+    def __init__(self, dataset, filename=None):
+        self.dataset = dataset
+        self.filename = filename
+        self.stages = []        # [(etap, ms), ...] w kolejności wykonania
+        self.info = {}          # rozmiary, wybrany arkusz, liczba wierszy
+        self.columns = {}       # kolumna -> {'nan': ..., 'coerced': ...}
+        self.missing_days = {}  # maszyna / segment -> lista brakujących dni
+        self.warnings = []
+        self.error = None
+        self._start = time.perf_counter()
+        self._elapsed = None
+
+    @contextmanager
+    def stage(self, name):
+        """Zmierz etap wczytywania (także jako etap 'ingest_<nazwa>' w /metrics)"""
+        start = time.perf_counter()
+        try:
+            with timed_stage(f'ingest_{name}'):
+                yield
+        finally:
+            self.stages.append((name, round((time.perf_counter() - start) * 1000, 1)))
+
+    def count(self, column, nan=0, coerced=0):
+        """Dolicz puste (nan) i zamienione na NaN przy konwersji (coerced) wartości kolumny"""
+        if not nan and not coerced:
+            return
+        stats = self.columns.setdefault(str(column), {'nan': 0, 'coerced': 0})
+        stats['nan'] += int(nan)
+        stats['coerced'] += int(coerced)
+
+    def warn(self, message):
+        self.warnings.append(message)
+
+    def finish(self):
+        """Zatrzymaj pomiar całkowitego czasu (raport zapisywany później, np. po zebraniu wyników z puli)"""
+        self._elapsed = time.perf_counter() - self._start
+
+    @property
+    def status(self):
+        if self.error:
+            return 'error'
+        if self.warnings or self.missing_days or any(s['coerced'] for s in self.columns.values()):
+            return 'warning'
+        return 'ok'
+
+    def to_dict(self):
+        return {
+            'dataset': self.dataset,
+            'filename': self.filename,
+            'status': self.status,
+            'total_ms': round((self._elapsed or time.perf_counter() - self._start) * 1000, 1),
+            'stages': [{'name': name, 'ms': ms} for name, ms in self.stages],
+            'info': self.info,
+            'columns': self.columns,
+            'missing_days': self.missing_days,
+            'warnings': self.warnings,
+            'error': self.error
+        }
+
+    def save(self):
+        """Zapisz raport w bazie (zostaje INGEST_REPORT_KEEP najnowszych)"""
+        report = self.to_dict()
+        conn = db_connect(timeout=30)
+        try:
+            with conn:
+                c = conn.cursor()
+                c.execute("INSERT INTO ingest_reports (dataset, filename, status, rows, total_ms, report) "
+                          "VALUES (?, ?, ?, ?, ?, ?)",
+                          (self.dataset, self.filename, report['status'], self.info.get('rows'),
+                           report['total_ms'], json.dumps(report, default=str)))
+                report['id'] = c.lastrowid
+                c.execute("DELETE FROM ingest_reports WHERE id <= ?", (report['id'] - INGEST_REPORT_KEEP,))
+        finally:
+            conn.close()
+        return report
+
+def read_excel_staged(path, report, preferred_sheets=()):
+    """
+    Wczytaj arkusz pliku .xlsx z pomiarem etapów: otwarcie archiwum (spis plików - rozmiary
+    bez rozpakowywania), wybór arkusza (pierwszy pasujący z preferred_sheets, inaczej pierwszy)
+    i odczyt komórek. Archiwum rozpakowuje tylko openpyxl, raz - w wyborze arkusza i odczycie.
+    """
+    import pandas as pd
+
+    with report.stage('zip_open'):
+        with open(path, 'rb') as f:
+            content = io.BytesIO(f.read())
+        try:
+            with zipfile.ZipFile(content) as archive:
+                xml_bytes = sum(info.file_size for info in archive.infolist())
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"Plik nie jest poprawnym plikiem .xlsx (uszkodzone archiwum zip: {e})") from e
+        report.info.update(file_bytes=len(content.getbuffer()), xml_bytes=xml_bytes)
+
+    with report.stage('sheet_selection'):
+        content.seek(0)
+        book = pd.ExcelFile(content, engine='openpyxl')
+        sheet = next((name for name in preferred_sheets if name in book.sheet_names), book.sheet_names[0])
+        report.info['sheet'] = sheet
+        if preferred_sheets and sheet not in preferred_sheets:
+            report.warn(f"Brak arkusza {' / '.join(preferred_sheets)} - użyto pierwszego arkusza '{sheet}'")
+
+    with report.stage('cell_read'):
+        try:
+            df = book.parse(sheet)
+        finally:
+            book.close()
+    report.info['source_rows'] = len(df)
+    return df
+
+def _missing_days(report, groups, expected):
+    """Zapisz w raporcie brakujące dni (expected - obecne) dla każdej grupy {nazwa: zbiór dni}"""
+    for name in sorted(groups, key=str):
+        missing = sorted(expected - groups[name])
+        if missing:
+            if len(report.missing_days) >= INGEST_MISSING_DAYS_LIMIT:
+                report.warn(f"Braki dni w kolejnych grupach pominięto (limit {INGEST_MISSING_DAYS_LIMIT})")
+                break
+            report.missing_days[str(name)] = missing
+
 # ==================== POMOCNICZE FUNKCJE ====================
 
 def allowed_file(filename):
@@ -147,16 +750,40 @@ def load_config():
         # Zwróć domyślną konfigurację jeśli plik nie istnieje
         return {'admin_pin': '7456', 'rotation_interval': 30, 'refresh_interval': 300}
 
+# Domyślne ustawienia serwera (sekcja "server" w config.json)
+DEFAULT_SERVER_CONFIG = {
+    'host': '0.0.0.0',
+    'port': 5000,
+    'threads': 4,                # wątki Waitress / tryb synchroniczny
+    'executor_threads': 8,       # wątki dla blokującej pracy (pandas/openpyxl) w trybie async
+    'connection_limit': 1000,    # maks. liczba jednoczesnych połączeń
+    'stream_limit': 500,         # maks. liczba otwartych strumieni SSE w trybie async
+    'keepalive_seconds': 15,     # co ile sekund podtrzymać otwarty strumień SSE
+    'data_slots': 2,             # ile żądań naraz może liczyć dane (reszta wątków zostaje dla lekkich żądań)
+    'data_queue': 16,            # ile żądań może czekać na wolne miejsce, zanim serwer odmówi (503)
+    'data_wait_seconds': 10,     # maks. czas oczekiwania w kolejce
+    'compress_level': 6,         # poziom kompresji odpowiedzi (gzip 1-9, brotli 0-11)
+    'compress_min_size': 1024,   # mniejsze odpowiedzi idą bez kompresji
+    'compress_cache_mb': 16      # pamięć na skompresowane treści powtarzających się odpowiedzi
+}
+
+def get_server_config():
+    """Ustawienia serwera z config.json uzupełnione wartościami domyślnymi"""
+    return {**DEFAULT_SERVER_CONFIG, **load_config().get('server', {})}
+
 def get_chart_data():
     """Wczytaj dane z pliku Export.xlsx - dla kompatybilności (nie używane)"""
     return []
 
 def get_chart_data_for_machine(kod='1310', start_day=1):
     """Wczytaj dane dla konkretnej maszyny z Export.xlsx - osobno dla każdej brygady (A, B, C) dzienne i narastające"""
+    # Dane z Export.xlsx (współdzielona migawka), wynik pamiętany dla bieżącej wersji danych
+    return chart_payload('export', ('chart-data', str(kod), start_day),
+                         lambda df_long: build_chart_data(df_long, kod, start_day))
+
+def build_chart_data(df_long, kod, start_day):
+    """Serie dzienne i narastające brygad A, B, C dla maszyny - 7 dni od start_day"""
     try:
-        # Wczytaj dane z Export.xlsx
-        df_long = load_long()
-        
         if df_long.empty:
             return {'series': []}
         
@@ -209,6 +836,79 @@ def get_chart_data_for_machine(kod='1310', start_day=1):
         print(f"Błąd wczytywania danych dla maszyny {kod}: {e}")
         return {'series': []}
 
+def list_machines(df_long):
+    """Lista maszyn (kod + etykieta) dla dropdownów"""
+    maszyny_df = df_long[['Kod', 'Nazwa']].drop_duplicates().sort_values('Kod')
+    maszyny = []
+    for kod, nazwa in zip(maszyny_df['Kod'], maszyny_df['Nazwa']):
+        if nazwa and str(nazwa).strip():
+            maszyny.append({'kod': kod, 'label': f"{kod} {nazwa}"})
+        else:
+            maszyny.append({'kod': kod, 'label': kod})
+    return maszyny
+
+ROLLUP_GRANULARITIES = ('day', 'week', 'month')
+
+@timed('rollups')
+def build_export_rollups(df_long):
+    """
+    Zestawienia tygodniowe i miesięczne per maszyna i brygada - liczone raz na wersję danych.
+    Wartości Export.xlsx to prędkości [m2/wh], więc okres opisuje średnia i suma dni z danymi,
+    liczba tych dni oraz wartość narastająca z arkusza na koniec okresu.
+    Tydzień = kolejne 7 dni miesiąca (1-7, 8-14, ...), plik nie zawiera dat kalendarzowych.
+    """
+    if df_long.empty:
+        return {}
+    periods = {'week': (df_long['Dzien'] - 1) // 7 + 1, 'month': 1}
+    keys = ['Kod', 'Brygada', 'Okres']
+    rollups = {}
+    for granularity, period in periods.items():
+        frame = df_long.assign(Okres=period)
+        daily = frame[frame['Typ'] == 'Dzienne'].groupby(keys)['Wartosc'].agg(srednia='mean', suma='sum', dni='count')
+        cumulative = frame[frame['Typ'] == 'Narastające'].sort_values('Dzien').groupby(keys)['Wartosc'].last()
+        rollups[granularity] = daily.join(cumulative.rename('narastajaco'), how='outer')
+    return rollups
+
+@timed('leaderboard')
+def build_leaderboard(df_long, month_rollup, machines):
+    """
+    Ranking brygad i maszyn od początku miesiąca - jedno przejście po zestawieniu miesięcznym.
+    Wartość maszyny/brygady to narastająca prędkość z arkusza na ostatni dzień. Prędkości
+    różnych maszyn nie są porównywalne wprost, więc brygady są oceniane liczbą maszyn,
+    na których prowadzą, a potem wynikiem względem średniej danej maszyny.
+    """
+    if month_rollup is None or month_rollup.empty:
+        return {'day': None, 'brygady': [], 'machines': []}
+
+    mtd = month_rollup['narastajaco'].droplevel('Okres').unstack('Brygada').dropna(how='all')
+    machine_mtd = mtd.mean(axis=1)
+    leaders = mtd.idxmax(axis=1)
+    relative = mtd.div(machine_mtd, axis=0)
+
+    brygady = sorted(({'brygada': brygada,
+                       'machines_led': int((leaders == brygada).sum()),
+                       'relative_pct': round(float(relative[brygada].mean()) * 100, 1),
+                       'machines': int(mtd[brygada].notna().sum())}
+                      for brygada in mtd.columns),
+                     key=lambda row: (-row['machines_led'], -row['relative_pct'], row['brygada']))
+
+    labels = {maszyna['kod']: maszyna['label'] for maszyna in machines}
+    # Stabilne sortowanie - przy równym wyniku kolejność wg kodu maszyny (indeks jest posortowany)
+    order = machine_mtd.sort_values(ascending=False, kind='stable')
+    ranked_machines = [{'kod': kod,
+                        'label': labels.get(kod, kod),
+                        'mtd': round(float(value), 0),
+                        'leader': leaders[kod],
+                        'brygady': {brygada: round(float(v), 0) for brygada, v in mtd.loc[kod].dropna().items()}}
+                       for kod, value in order.items()]
+
+    for rank, row in enumerate(brygady, 1):
+        row['rank'] = rank
+    for rank, row in enumerate(ranked_machines, 1):
+        row['rank'] = rank
+    daily = df_long.loc[df_long['Typ'] == 'Dzienne', 'Dzien']
+    return {'day': int(daily.max()) if not daily.empty else None, 'brygady': brygady, 'machines': ranked_machines}
+
 def sync_slide_order():
     """Synchronizuj tabelę slide_order z rzeczywistymi plikami na dysku"""
     images_path = os.path.join(app.config['UPLOAD_FOLDER'])
@@ -221,7 +921,7 @@ def sync_slide_order():
     disk_files = set(f for f in os.listdir(images_path) 
                      if allowed_file(f) and f not in excluded and not os.path.isdir(os.path.join(images_path, f)))
     
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     
     c.execute("SELECT filename FROM slide_order")
@@ -251,16 +951,21 @@ def sync_slide_order():
     conn.commit()
     conn.close()
 
-def get_slide_images():
-    """Pobierz listę zdjęć do pokazu slajdów posortowaną wg kolejności"""
+def get_slide_images(sync=True):
+    """
+    Pobierz listę zdjęć do pokazu slajdów posortowaną wg kolejności.
+    sync=False tylko czyta slide_order (bez zapisu do bazy) - dla manifestu offline.
+    """
     images_path = os.path.join(app.config['UPLOAD_FOLDER'])
     if not os.path.exists(images_path):
-        os.makedirs(images_path, exist_ok=True)
+        if sync:
+            os.makedirs(images_path, exist_ok=True)
         return []
     
-    sync_slide_order()
+    if sync:
+        sync_slide_order()
     
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     c.execute("SELECT filename, position FROM slide_order ORDER BY position ASC")
     rows = c.fetchall()
@@ -271,97 +976,214 @@ def get_slide_images():
         filepath = os.path.join(images_path, filename)
         if os.path.exists(filepath):
             images.append({
-                'url': url_for('static', filename='images/' + filename),
+                # Adres względny także w odświeżaniu w tle (kontekst aplikacji)
+                'url': url_for('static', filename='images/' + filename, _external=False),
                 'name': filename,
                 'position': position
             })
     
     return images
 
-def get_current_quiz_question():
+# Plik CSV z pytaniami - importowany jednorazowo do tabeli quiz_questions
+QUIZ_CSV_PATH = 'data/quiz_questions.csv'
+QUIZ_FIELDS = ['category', 'question', 'answer1', 'answer2', 'answer3', 'answer4',
+               'correct_index', 'explanation', 'start_date', 'end_date']
+
+# Indeks pytań quizowych: pytania sparsowane raz, przedziały dat zamienione
+# na posortowane punkty zmian - aktywne pytanie znajduje wyszukiwanie binarne
+_quiz_index = {'key': None, 'questions': [], 'by_id': {}, 'starts': [], 'active': []}
+_quiz_lock = threading.Lock()
+
+def _prepare_quiz_question(row):
+    """Zamień wiersz CSV na pytanie w formacie szablonu quiz.html"""
+    answers = []
+    for i in range(1, 5):
+        answer = (row.get(f'answer{i}') or '').strip()
+        if answer:
+            answers.append(answer)
+
+    # Konwertuj correct_index z 1-indeksowany na 0-indeksowany
+    try:
+        correct_index = int(row.get('correct_index', 1)) - 1
+    except (ValueError, TypeError):
+        correct_index = 0
+
+    return {
+        'id': row.get('id'),
+        'category': row.get('category', ''),
+        'question': row.get('question', ''),
+        'answers': answers,
+        'correct_index': correct_index,
+        'explanation': row.get('explanation', '')
+    }
+
+def build_quiz_index(rows):
     """
-    Wczytaj aktualne pytanie quizowe z pliku CSV
-    Zwraca pytanie, które jest aktywne w obecnej dacie (start_date <= dzisiaj <= end_date)
-    Jeśli nie ma dopasowania, zwraca pierwsze pytanie z pliku
+    Zbuduj indeks przedziałów dat z wierszy pytań (w kolejności id).
+    starts[i] to dzień, od którego aktywne jest pytanie active[i] (None = brak);
+    przy nakładających się przedziałach wygrywa pytanie o niższym id.
+    """
+    questions = [_prepare_quiz_question(row) for row in rows]
+
+    intervals = []
+    for position, row in enumerate(rows):
+        try:
+            start_date = datetime.strptime(row['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(row['end_date'], '%Y-%m-%d').date()
+        except (ValueError, KeyError, TypeError):
+            continue
+        if start_date <= end_date:
+            intervals.append((start_date, end_date, position))
+    intervals.sort()
+
+    # Punkty zmian: początki przedziałów i dni po ich końcach
+    breakpoints = set()
+    for start_date, end_date, _ in intervals:
+        breakpoints.add(start_date)
+        if end_date < date.max:
+            breakpoints.add(end_date + timedelta(days=1))
+
+    starts, active = [], []
+    heap = []  # (pozycja na liście, koniec przedziału) - na szczycie pytanie o najniższym id
+    next_interval = 0
+    for point in sorted(breakpoints):
+        while next_interval < len(intervals) and intervals[next_interval][0] <= point:
+            _, end_date, position = intervals[next_interval]
+            heapq.heappush(heap, (position, end_date))
+            next_interval += 1
+        while heap and heap[0][1] < point:
+            heapq.heappop(heap)
+        current = heap[0][0] if heap else None
+        if not active or active[-1] != current:
+            starts.append(point)
+            active.append(current)
+
+    by_id = {question['id']: question for question in questions if question['id'] is not None}
+    return {'questions': questions, 'by_id': by_id, 'starts': starts, 'active': active}
+
+def get_quiz_index():
+    """Zwróć indeks pytań - przebudowywany tylko po zmianie pytań w bazie (wersja 'quiz')"""
+    key = get_data_version('quiz')[0]
+    if _quiz_index['key'] == key:
+        return _quiz_index
+
+    with _quiz_lock:
+        if _quiz_index['key'] != key:
+            conn = db_connect()
+            conn.row_factory = sqlite3.Row
+            rows = [dict(row) for row in conn.execute(
+                f"SELECT id, {', '.join(QUIZ_FIELDS)} FROM quiz_questions ORDER BY id")]
+            conn.close()
+            _quiz_index.update(build_quiz_index(rows))
+            _quiz_index['key'] = key
+    return _quiz_index
+
+def get_current_quiz_question(today=None):
+    """
+    Zwróć pytanie quizowe aktywne w danym dniu (start_date <= dzisiaj <= end_date).
+    Jeśli nie ma dopasowania, zwraca pierwsze pytanie (najniższe id).
+    Zwrócony słownik jest współdzielony przez indeks - nie modyfikuj go.
     """
-    csv_path = 'data/quiz_questions.csv'
-    
-    # Sprawdź czy plik istnieje
-    if not os.path.exists(csv_path):
-        return None
-    
     try:
-        today = date.today()
-        questions = []
-        
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for row in reader:
-                questions.append(row)
-        
-        if not questions:
+        index = get_quiz_index()
+        if not index['questions']:
             return None
-        
-        # Znajdź pytanie aktywne w obecnej dacie
-        active_question = None
-        for q in questions:
-            try:
-                start_date = datetime.strptime(q['start_date'], '%Y-%m-%d').date()
-                end_date = datetime.strptime(q['end_date'], '%Y-%m-%d').date()
-                
-                if start_date <= today <= end_date:
-                    active_question = q
-                    break
-            except (ValueError, KeyError):
-                continue
-        
-        # Jeśli nie znaleziono aktywnego, użyj pierwszego
-        if not active_question:
-            active_question = questions[0]
-        
-        # Przetwórz odpowiedzi
-        answers = []
-        for i in range(1, 5):
-            answer_key = f'answer{i}'
-            if answer_key in active_question and active_question[answer_key].strip():
-                answers.append(active_question[answer_key].strip())
-        
-        # Konwertuj correct_index z 1-indeksowany na 0-indeksowany
-        try:
-            correct_index = int(active_question.get('correct_index', 1)) - 1
-        except (ValueError, TypeError):
-            correct_index = 0
-        
-        return {
-            'category': active_question.get('category', ''),
-            'question': active_question.get('question', ''),
-            'answers': answers,
-            'correct_index': correct_index,
-            'explanation': active_question.get('explanation', '')
-        }
-        
+
+        today = today or date.today()
+        i = bisect.bisect_right(index['starts'], today) - 1
+        position = index['active'][i] if i >= 0 else None
+        return index['questions'][position if position is not None else 0]
+
     except Exception as e:
         print(f"Błąd wczytywania pytań quizowych: {e}")
         return None
 
-def load_long():
+def _normalize_quiz_date(value):
+    """Data pytania jako YYYY-MM-DD (Excel często zapisuje DD.MM.YYYY)"""
+    value = (value or '').strip()
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Nieprawidłowa data: '{value}'")
+
+def validate_quiz_question(data):
+    """Sprawdź pytanie i zwróć krotkę wartości w kolejności QUIZ_FIELDS (ValueError przy błędzie)"""
+    question = {field: str(data.get(field) or '').strip() for field in QUIZ_FIELDS}
+    if not question['question']:
+        raise ValueError("Brak treści pytania")
+    try:
+        question['correct_index'] = int(question['correct_index'] or 1)
+    except ValueError:
+        raise ValueError(f"Nieprawidłowy numer poprawnej odpowiedzi: '{question['correct_index']}'")
+    if not 1 <= question['correct_index'] <= 4:
+        raise ValueError("Numer poprawnej odpowiedzi musi być z zakresu 1-4")
+    question['start_date'] = _normalize_quiz_date(question['start_date'])
+    question['end_date'] = _normalize_quiz_date(question['end_date'])
+    if question['start_date'] > question['end_date']:
+        raise ValueError("Data rozpoczęcia jest późniejsza niż data zakończenia")
+    return tuple(question[field] for field in QUIZ_FIELDS)
+
+def parse_quiz_csv(text):
+    """
+    Odczytaj pytania z CSV (separator ';', jak w pliku z Excela).
+    Zwraca (lista (id lub None, wartości), lista błędów z numerami wierszy)
+    """
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')), delimiter=';')
+    rows, errors, seen_ids = [], [], set()
+    for line, row in enumerate(reader, start=2):
+        try:
+            values = validate_quiz_question(row)
+            question_id = (row.get('id') or '').strip()
+            question_id = int(question_id) if question_id else None
+            if question_id is not None:
+                if question_id in seen_ids:
+                    raise ValueError(f"Powtórzone id {question_id}")
+                seen_ids.add(question_id)
+            rows.append((question_id, values))
+        except ValueError as e:
+            errors.append(f"Wiersz {line}: {e}")
+    return rows, errors
+
+def insert_quiz_questions(c, rows, keep_ids=False):
+    """Wstaw pytania jednym executemany (id z pliku tylko przy keep_ids)"""
+    placeholders = ', '.join('?' * (len(QUIZ_FIELDS) + 1))
+    c.executemany(f"INSERT INTO quiz_questions (id, {', '.join(QUIZ_FIELDS)}) VALUES ({placeholders})",
+                  [((question_id if keep_ids else None),) + values for question_id, values in rows])
+
+def bump_quiz_version(c):
+    """Podbij wersję pytań (w tej samej transakcji) - indeks quizu przebuduje się przy kolejnym żądaniu"""
+    c.execute("UPDATE data_versions SET version=version+1, updated_at=CURRENT_TIMESTAMP WHERE name='quiz'")
+
+def export_quiz_csv():
+    """Wszystkie pytania jako CSV (utf-8 z BOM, separator ';') do edycji w Excelu"""
+    conn = db_connect()
+    rows = conn.execute(f"SELECT id, {', '.join(QUIZ_FIELDS)} FROM quiz_questions ORDER BY id").fetchall()
+    conn.close()
+
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=';')
+    writer.writerow(['id'] + QUIZ_FIELDS)
+    writer.writerows(rows)
+    return '\ufeff' + output.getvalue()
+
+@timed('excel_parse')
+def load_long(report=None, path='Export.xlsx'):
     """
     Wczytaj dane z pliku Export.xlsx i przekształć do formy długiej (long format)
     Format: Typ, Kod, Nazwa, Brygada, Dzien (1-31), Wartosc
     POPRAWKA: Dni miesiąca są w wierszu 1 od kolumny D (indeks 3).
+    Czasy etapów i jakość danych trafiają do report (IngestReport), jeśli podano.
+    path - inny plik w tym formacie (np. nowa wersja przed publikacją)
     """
+    import pandas as pd  # leniwie - start serwera nie czeka na pandas (patrz ROZGRZEWANIE)
+    
+    if report is None:
+        report = IngestReport('export', 'Export.xlsx')
     try:
         # Wczytaj dane z Export.xlsx - używamy header=0, bo dni są w pierwszym wierszu
-        try:
-            df = pd.read_excel('Export.xlsx', sheet_name='Export', engine='openpyxl')
-        except ValueError:
-            try:
-                df = pd.read_excel('Export.xlsx', sheet_name='Eksport', engine='openpyxl')
-            except ValueError:
-                try:
-                    df = pd.read_excel('Export.xlsx', sheet_name='Arkusz1', engine='openpyxl')
-                except ValueError:
-                    df = pd.read_excel('Export.xlsx', sheet_name=0, engine='openpyxl')
+        df = read_excel_staged(path, report, preferred_sheets=('Export', 'Eksport', 'Arkusz1'))
         
         # Oczekiwana struktura: 
         # Kolumna A (0): Typ
@@ -369,104 +1191,1636 @@ def load_long():
         # Kolumna C (2): Brygada (lub Nazwa, sprawdzimy)
         # Kolumny D-AH (3-33): Dni 1-31
         
-        # Mapowanie kolumn bazowych
-        base_cols = df.columns[:3].tolist()
-        df.columns = ['Typ', 'Kod', 'Brygada'] + [str(c) for c in df.columns[3:]]
-        df['Nazwa'] = '' # Dodajemy pustą nazwę dla spójności
-        
-        id_vars = ['Typ', 'Kod', 'Nazwa', 'Brygada']
-        
-        # Wybierz tylko kolumny, które są numerami dni 1-31
-        value_vars = []
-        for col in df.columns[3:]:
-            try:
-                # Czyścimy nazwę kolumny (może być "1.0" lub "1")
-                c_clean = str(col).split('.')[0]
-                c_int = int(c_clean)
-                if 1 <= c_int <= 31:
-                    value_vars.append(col)
-            except:
-                continue
-        
-        df_long = pd.melt(
-            df,
-            id_vars=id_vars,
-            value_vars=value_vars,
-            var_name='Dzien',
-            value_name='Wartosc'
-        )
+        with report.stage('reshape'):
+            # Mapowanie kolumn bazowych
+            df.columns = ['Typ', 'Kod', 'Brygada'] + [str(c) for c in df.columns[3:]]
+            df['Nazwa'] = '' # Dodajemy pustą nazwę dla spójności
+            
+            id_vars = ['Typ', 'Kod', 'Nazwa', 'Brygada']
+            
+            # Wybierz tylko kolumny, które są numerami dni 1-31
+            value_vars = []
+            for col in df.columns[3:]:
+                try:
+                    # Czyścimy nazwę kolumny (może być "1.0" lub "1")
+                    c_clean = str(col).split('.')[0]
+                    c_int = int(c_clean)
+                    if 1 <= c_int <= 31:
+                        value_vars.append(col)
+                except:
+                    continue
+            if not value_vars:
+                report.warn("Nie znaleziono kolumn dni 1-31 (oczekiwane od kolumny D)")
+            
+            # Puste komórki dni (kolumny całkiem puste to dni, które jeszcze nie minęły)
+            for col in value_vars:
+                empty = int(df[col].isna().sum())
+                if empty < len(df):
+                    report.count(f"dzień {str(col).split('.')[0]}", nan=empty)
+            
+            df_long = pd.melt(
+                df,
+                id_vars=id_vars,
+                value_vars=value_vars,
+                var_name='Dzien',
+                value_name='Wartosc'
+            )
+            
+            # Konwertujemy Dzień na czysty int
+            df_long['Dzien'] = df_long['Dzien'].apply(lambda x: int(str(x).split('.')[0]))
+            df_long = df_long.dropna(subset=['Wartosc'])
         
-        # Konwertujemy Dzień na czysty int
-        df_long['Dzien'] = df_long['Dzien'].apply(lambda x: int(str(x).split('.')[0]))
-        df_long = df_long.dropna(subset=['Wartosc'])
+        with report.stage('type_coercion'):
+            # Konwertuj typy
+            df_long['Typ'] = df_long['Typ'].astype(str)
+            df_long['Kod'] = df_long['Kod'].astype(str)
+            df_long['Nazwa'] = df_long['Nazwa'].astype(str)
+            df_long['Brygada'] = df_long['Brygada'].astype(str)
+            numeric = pd.to_numeric(df_long['Wartosc'], errors='coerce')
+            coerced = numeric.isna() & df_long['Wartosc'].notna()
+            for day, count in df_long.loc[coerced, 'Dzien'].value_counts().items():
+                report.count(f"dzień {day}", coerced=count)
+            df_long['Wartosc'] = numeric.fillna(0)
         
-        # Konwertuj typy
-        df_long['Typ'] = df_long['Typ'].astype(str)
-        df_long['Kod'] = df_long['Kod'].astype(str)
-        df_long['Nazwa'] = df_long['Nazwa'].astype(str)
-        df_long['Brygada'] = df_long['Brygada'].astype(str)
-        df_long['Wartosc'] = pd.to_numeric(df_long['Wartosc'], errors='coerce').fillna(0)
+        with report.stage('index_build'):
+            # Dni bez żadnej wartości dziennej dla maszyny (do ostatniego dnia w pliku)
+            daily = df_long[df_long['Typ'] == 'Dzienne']
+            if not daily.empty:
+                groups = {kod: set(days) for kod, days in daily.groupby('Kod')['Dzien']}
+                _missing_days(report, groups, set(range(1, int(daily['Dzien'].max()) + 1)))
+            report.info['machines'] = int(df_long['Kod'].nunique())
         
+        report.info['rows'] = len(df_long)
         print(f"✅ Dane z Export.xlsx wczytane poprawnie (Dni od kolumny D): {len(df_long)} wierszy.")
         return df_long
     
     except FileNotFoundError:
-        print(f"❌ BŁĄD: Nie znaleziono pliku Export.xlsx")
+        print(f"❌ BŁĄD: Nie znaleziono pliku {path}")
+        report.error = f'Nie znaleziono pliku {path}'
         return pd.DataFrame(columns=['Typ', 'Kod', 'Nazwa', 'Brygada', 'Dzien', 'Wartosc'])
     except Exception as e:
         print(f"Błąd wczytywania danych z Export.xlsx: {e}")
+        report.error = str(e)
         import traceback
         traceback.print_exc()
         return pd.DataFrame(columns=['Typ', 'Kod', 'Nazwa', 'Brygada', 'Dzien', 'Wartosc'])
 
-# ==================== TRASY (ROUTES) ====================
+JUMBO_SPEED_COLUMNS = ['Prędkość dzienna [m2/wh]', 'Narastająca prędkość [m2/wh]']
 
-@app.route('/')
-def index():
-    """Strona główna - Dashboard"""
-    conn = sqlite3.connect('kiosk.db')
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    
-    # Pobierz ustawienia
-    settings_rows = c.execute('SELECT key, value FROM settings').fetchall()
-    settings_dict = {row['key']: row['value'] for row in settings_rows}
-    
-    # Pobierz inspiracje
-    inspirations_rows = c.execute('SELECT id, title, description, image_url FROM inspirations ORDER BY created_at DESC').fetchall()
-    inspirations = [dict(row) for row in inspirations_rows]
-    
-    # Pobierz widoczność stron
-    try:
-        visibility_rows = c.execute('SELECT page_id, is_visible FROM page_visibility').fetchall()
-        visibility = {row['page_id']: bool(row['is_visible']) for row in visibility_rows}
-    except:
-        visibility = {}
-    
-    conn.close()
-    
-    return render_template('index.html',
-                         header_title=settings_dict.get('header_title', 'Dashboard Inspiracji i Wyników'),
-                         footer_note=settings_dict.get('footer_note', 'Stora Enso'),
-                         about_text=settings_dict.get('about_text', ''),
-                         inspirations=inspirations,
-                         visibility=visibility)
+@timed('excel_parse')
+def load_jumbo(report=None, path='Jumbo.xlsx'):
+    """
+    Wczytaj dane z pliku Jumbo.xlsx z typami gotowymi dla wykresu wydajności
+    (Dzień jako data, prędkości jako liczby, bez wierszy bez daty)
+    """
+    import pandas as pd
 
-@app.context_processor
-def inject_page_visibility():
-    """Wstrzykuje stan widoczności stron do wszystkich szablonów"""
+    if report is None:
+        report = IngestReport('jumbo', 'Jumbo.xlsx')
     try:
-        conn = sqlite3.connect('kiosk.db')
-        c = conn.cursor()
-        c.execute('SELECT page_id, is_visible FROM page_visibility')
-        visibility = {row[0]: bool(row[1]) for row in c.fetchall()}
-        conn.close()
-        return dict(pages_visible=visibility)
-    except:
-        return dict(pages_visible={})
+        df = read_excel_staged(path, report)
 
-@app.route('/api/visibility', methods=['POST'])
-def update_visibility():
+        with report.stage('reshape'):
+            # Standaryzacja nazw kolumn - usuwamy białe znaki
+            df.columns = [str(c).strip() for c in df.columns]
+            for col in ['Segment', 'Brygada', 'Dzień', 'day_index'] + JUMBO_SPEED_COLUMNS:
+                if col not in df.columns:
+                    report.warn(f"Brak kolumny '{col}'")
+
+        with report.stage('type_coercion'):
+            # Konwersja mtf_report_date (jeśli to serial Excela)
+            if 'mtf_report_date' in df.columns:
+                # Sprawdź czy to liczby (serial Excela)
+                if pd.api.types.is_numeric_dtype(df['mtf_report_date']):
+                    # Konwersja seriala Excela (start od 1899-12-30 dla openpyxl/pandas)
+                    df['mtf_report_date'] = pd.to_datetime(df['mtf_report_date'], unit='D', origin='1899-12-30')
+                else:
+                    df['mtf_report_date'] = pd.to_datetime(df['mtf_report_date'], errors='coerce')
+
+            # Konwersja typów dla wykresu wydajności (z zachowaniem NaN)
+            if 'Dzień' in df.columns:
+                raw = df['Dzień']
+                df['Dzień'] = pd.to_datetime(raw, dayfirst=True, errors='coerce')
+                report.count('Dzień', nan=raw.isna().sum(), coerced=(df['Dzień'].isna() & raw.notna()).sum())
+                df = df.dropna(subset=['Dzień'])
+            for col in JUMBO_SPEED_COLUMNS:
+                if col in df.columns:
+                    raw = df[col]
+                    df[col] = pd.to_numeric(raw, errors='coerce')
+                    report.count(col, nan=raw.isna().sum(), coerced=(df[col].isna() & raw.notna()).sum())
+
+        with report.stage('index_build'):
+            # Dni kalendarzowe bez wiersza zbiorczego (Brygada = All) per segment
+            if {'Segment', 'Brygada', 'Dzień'} <= set(df.columns):
+                summary_rows = df[df['Brygada'] == 'All']
+                if not summary_rows.empty:
+                    days = pd.date_range(summary_rows['Dzień'].min(), summary_rows['Dzień'].max(), freq='D')
+                    groups = {segment: set(dates.dt.strftime('%Y-%m-%d'))
+                              for segment, dates in summary_rows.groupby('Segment')['Dzień']}
+                    _missing_days(report, groups, set(days.strftime('%Y-%m-%d')))
+                report.info['segments'] = int(df['Segment'].nunique())
+
+        report.info['rows'] = len(df)
+        return df
+    except Exception as e:
+        print(f"Błąd wczytywania Jumbo.xlsx: {e}")
+        report.error = str(e)
+        return pd.DataFrame()
+
+# ==================== ŁĄCZENIE RÓWNOCZESNYCH OBLICZEŃ (SINGLE-FLIGHT) ====================
+#
+# Po restarcie lub uploadzie wszystkie kioski pytają o te same dane w ciągu kilku
+# sekund. Równoczesne wywołania tej samej kosztownej operacji (parsowanie Excela,
+# seria jednej maszyny, kostka Jumbo, obrazek wykresu) czekają na wynik pierwszego
+# zamiast liczyć go od nowa. Liczniki: kiosk_singleflight_calls_total w /metrics.
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Rejestr trwających obliczeń: klucz -> wynik współdzielony przez wszystkich czekających"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, kind, key, fn):
+        """Wykonaj fn() raz dla (kind, key); równoczesne wywołania dostają ten sam wynik lub wyjątek"""
+        with self._lock:
+            flight = self._flights.get((kind, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(kind, key)] = _Flight()
+
+        metrics.inc('kiosk_singleflight_calls_total', (('kind', kind), ('role', 'leader' if leader else 'waiter')))
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[(kind, key)]
+            flight.done.set()
+
+    def busy(self, kind, key):
+        """Czy obliczenie (kind, key) właśnie trwa"""
+        return (kind, key) in self._flights
+
+single_flight = SingleFlight()
+
+# ==================== WSPÓŁDZIELONY CACHE DANYCH ====================
+#
+# Sparsowane dane Export/Jumbo zapisywane są jako migawka (pickle protokołu 5
+# z buforami poza strumieniem), którą każdy proces mapuje do pamięci (mmap)
+# zamiast ponownie czytać Excel. Numer wersji w tabeli data_versions mówi
+# procesom, kiedy trzeba przeładować migawkę.
+
+SNAPSHOT_FOLDER = 'cache'
+DATASET_SOURCES = {'export': 'Export.xlsx', 'jumbo': 'Jumbo.xlsx'}
+# Zbiory zbiorcze z wielu plików (ingest.py) - bez pliku źródłowego, tylko migawka
+ARCHIVE_DATASETS = {'export_archive': 'export', 'jumbo_archive': 'jumbo'}
+
+class DataStore:
+    """
+    Niezmienna migawka wszystkich zbiorów danych: ramki, indeksy (lista maszyn),
+    numery wersji i gotowe odpowiedzi wykresów. Nowa wersja danych to nowy obiekt
+    podmieniany jednym przypisaniem - czytający nie biorą blokad i nigdy nie widzą
+    danych w połowie aktualizacji. Ramek nie wolno modyfikować w miejscu.
+    """
+
+    def __init__(self, datasets=None, payloads=None, indexes=None):
+        self._datasets = dict(datasets or {})   # nazwa -> (wersja, DataFrame)
+        self._payloads = dict(payloads or {})   # (nazwa, parametry) -> odpowiedź wykresu
+        self._indexes = dict(indexes or {})     # nazwa -> indeksy liczone raz na wersję
+        for name, (_, df) in self._datasets.items():
+            if name not in self._indexes:
+                self._indexes[name] = build_dataset_index(name, df)
+        self.machines = self._indexes.get('export', {}).get('machines', [])
+        self.leaderboard = self._indexes.get('export', {}).get('leaderboard', {'day': None, 'brygady': [], 'machines': []})
+        self.version = '-'.join(f"{name}{version}" for name, (version, _) in sorted(self._datasets.items()))
+
+    def dataset_version(self, name):
+        return self._datasets[name][0] if name in self._datasets else 0
+
+    def frame(self, name):
+        return self._datasets[name][1]
+
+    def rollup(self, granularity):
+        """Zestawienie Export dla 'week' lub 'month' (patrz build_export_rollups) albo None"""
+        return self._indexes.get('export', {}).get('rollups', {}).get(granularity)
+
+    def replace(self, name, version, df):
+        """Nowa migawka z podmienionym zbiorem; odpowiedzi pozostałych zbiorów przechodzą bez zmian"""
+        payloads = {key: payload for key, payload in self._payloads.items() if key[0] != name}
+        indexes = {key: index for key, index in self._indexes.items() if key != name}
+        return DataStore({**self._datasets, name: (version, df)}, payloads, indexes)
+
+    def payload(self, name, params, builder):
+        """Odpowiedź dla parametrów params zbudowana raz na migawkę przez builder(df)"""
+        key = (name, params)
+        payload = self._payloads.get(key)
+        if payload is None:
+            payload = single_flight.do('payload', (self.dataset_version(name), key),
+                                       lambda: self._build_payload(key, builder))
+        return payload
+
+    def cached_payload(self, name, params):
+        """Gotowa odpowiedź z migawki lub None (bez liczenia)"""
+        return self._payloads.get((name, params))
+
+    def _build_payload(self, key, builder):
+        payload = builder(self.frame(key[0]))
+        if len(self._payloads) < CHART_PAYLOAD_LIMIT:
+            self._payloads[key] = payload
+        return payload
+
+def build_dataset_index(name, df):
+    """Indeksy zbioru danych budowane przy wczytaniu nowej wersji (lista maszyn, zestawienia)"""
+    if name != 'export' or df.empty:
+        return {}
+    machines = list_machines(df)
+    rollups = build_export_rollups(df)
+    return {'machines': machines, 'rollups': rollups,
+            'leaderboard': build_leaderboard(df, rollups.get('month'), machines)}
+
+# Gotowe odpowiedzi wykresów (słowniki przed jsonify) na migawkę - suwak dni
+# na kilkunastu kioskach pyta w kółko o te same kombinacje maszyna/dzień
+CHART_PAYLOAD_LIMIT = 4096
+
+_data_store = DataStore()
+_dataset_lock = threading.RLock()
+
+def _source_mtime(name):
+    """Czas modyfikacji pliku źródłowego (None gdy plik nie istnieje)"""
+    try:
+        return os.path.getmtime(DATASET_SOURCES[name])
+    except OSError:
+        return None
+
+def _parse_dataset(name):
+    """Sparsuj plik źródłowy zbioru danych"""
+    return load_long() if name == 'export' else load_jumbo()
+
+@timed('snapshot_write')
+def write_snapshot(path, df):
+    """Zapisz DataFrame jako migawkę: nagłówek JSON, pickle i bufory numpy wyrównane do 64 B"""
+    buffers = []
+    payload = pickle.dumps(df, protocol=5, buffer_callback=buffers.append)
+    raw_buffers = [b.raw() for b in buffers]
+
+    # Układ pliku: [4 B długość nagłówka][nagłówek][pickle][bufory]
+    layout = []
+    offset = len(payload)
+    for raw in raw_buffers:
+        offset += (-offset) % 64
+        layout.append([offset, raw.nbytes])
+        offset += raw.nbytes
+    header = json.dumps({'payload': len(payload), 'buffers': layout}).encode('utf-8')
+    header += b' ' * ((-(4 + len(header))) % 64)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        base = f.tell()
+        f.write(payload)
+        for (buf_offset, _), raw in zip(layout, raw_buffers):
+            f.write(b'\0' * (base + buf_offset - f.tell()))
+            f.write(raw)
+    os.replace(tmp_path, path)
+
+@timed('snapshot_read')
+def read_snapshot(path):
+    """Odczytaj migawkę - tablice numpy wskazują wprost na zmapowany plik (tylko do odczytu)"""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    header_len = struct.unpack_from('<I', view, 0)[0]
+    header = json.loads(bytes(view[4:4 + header_len]))
+    base = 4 + header_len
+    payload = view[base:base + header['payload']]
+    buffers = [view[base + offset:base + offset + size] for offset, size in header['buffers']]
+    return pickle.loads(payload, buffers=buffers)
+
+def get_data_version(name):
+    """Zwróć (wersja, ścieżka migawki, mtime źródła) z tabeli data_versions"""
+    conn = db_connect()
+    c = conn.cursor()
+    c.execute("SELECT version, snapshot, source_mtime FROM data_versions WHERE name=?", (name,))
+    row = c.fetchone()
+    conn.close()
+    return row if row else (0, None, None)
+
+def get_data_versions():
+    """Zwróć {nazwa: (wersja, ścieżka migawki, mtime źródła)} z tabeli data_versions"""
+    conn = db_connect()
+    rows = conn.execute("SELECT name, version, snapshot, source_mtime FROM data_versions").fetchall()
+    conn.close()
+    return {row[0]: row[1:] for row in rows}
+
+def publish_dataset(name, df, source_mtime=None):
+    """
+    Opublikuj nową wersję danych: zapisz migawkę i podbij numer wersji w SQLite.
+    Pozostałe procesy przeładują migawkę przy najbliższym żądaniu.
+    """
+    os.makedirs(SNAPSHOT_FOLDER, exist_ok=True)
+    conn = db_connect(timeout=30)
+    try:
+        # BEGIN IMMEDIATE - tylko jeden proces publikuje naraz
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT version FROM data_versions WHERE name=?", (name,)).fetchone()
+        version = (row[0] if row else 0) + 1
+        snapshot = os.path.join(SNAPSHOT_FOLDER, f"{name}-{version}.snap")
+        write_snapshot(snapshot, df)
+        conn.execute("INSERT OR REPLACE INTO data_versions (name, version, snapshot, source_mtime, updated_at) "
+                     "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                     (name, version, snapshot, source_mtime))
+        conn.commit()
+    finally:
+        conn.close()
+
+    _swap_dataset(name, version, df)
+    _remove_old_snapshots(name, version)
+    return version
+
+def _swap_dataset(name, version, df):
+    """Opublikuj w procesie migawkę z nową wersją zbioru (jedna podmiana referencji)"""
+    global _data_store
+    with _dataset_lock:
+        if _data_store.dataset_version(name) < version:
+            _data_store = _data_store.replace(name, version, df)
+
+def _remove_old_snapshots(name, version):
+    """Usuń migawki starsze niż poprzednia wersja (inne procesy mogą jeszcze czytać poprzednią)"""
+    for filename in os.listdir(SNAPSHOT_FOLDER):
+        if not (filename.startswith(f"{name}-") and filename.endswith('.snap')):
+            continue
+        try:
+            if int(filename[len(name) + 1:-len('.snap')]) < version - 1:
+                os.remove(os.path.join(SNAPSHOT_FOLDER, filename))
+        except (ValueError, OSError):
+            # Windows nie pozwala usunąć pliku zmapowanego przez inny proces
+            continue
+
+def _is_current(store, versions, mtimes):
+    for name in DATASET_SOURCES:
+        version, _, source_mtime = versions.get(name, (0, None, None))
+        if not version or store.dataset_version(name) != version or source_mtime != mtimes[name]:
+            return False
+    for name in ARCHIVE_DATASETS:
+        if store.dataset_version(name) != versions.get(name, (0, None, None))[0]:
+            return False
+    return True
+
+def _refresh_data_store():
+    """
+    Zwróć aktualną migawkę procesu. Gdy inny proces opublikował nową wersję, wczytaj
+    jego migawkę (mmap); Excel jest parsowany tylko wtedy, gdy nikt nie ma jeszcze
+    aktualnej migawki albo plik źródłowy zmieniono poza panelem admina.
+    """
+    store = _data_store
+    mtimes = {name: _source_mtime(name) for name in DATASET_SOURCES}
+    if _is_current(store, get_data_versions(), mtimes):
+        return store
+    return single_flight.do('parse', None, lambda: _rebuild_data_store(mtimes))
+
+def current_data_store():
+    """Migawka bieżącego żądania, jeśli da się ją dostać bez czekania; None, gdy dane trzeba przebudować"""
+    if has_request_context() and 'data_store' in g:
+        return g.data_store
+    if single_flight.busy('parse', None):
+        return None
+    store = _data_store
+    if not _is_current(store, get_data_versions(), {name: _source_mtime(name) for name in DATASET_SOURCES}):
+        return None
+    if has_request_context():
+        g.data_store = store
+    return store
+
+@contextmanager
+def dataset_parse_lock(name):
+    """
+    Blokada zbioru danych między procesami (plik cache/<nazwa>.lock) na czas parsowania
+    i publikacji - plik parsuje jeden proces, pozostałe czekają i mapują jego migawkę.
+    Kolejność blokad: najpierw _dataset_lock, potem ta.
+    """
+    os.makedirs(SNAPSHOT_FOLDER, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_FOLDER, f"{name}.lock"), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _load_snapshot(name, version, snapshot):
+    """Podmień zbiór na migawkę z dysku; False, gdy jej brak albo nie da się jej odczytać"""
+    if not snapshot or not os.path.exists(snapshot):
+        return False
+    try:
+        _swap_dataset(name, version, read_snapshot(snapshot))
+        return True
+    except Exception as e:
+        print(f"Błąd odczytu migawki {snapshot}: {e}")
+        return False
+
+def _rebuild_data_store(mtimes):
+    """Doprowadź migawkę procesu do wersji z data_versions (jeden wątek naraz)"""
+    with _dataset_lock:
+        # Ponownie po zdobyciu blokady - inny wątek mógł właśnie wczytać te same dane
+        versions = get_data_versions()
+        for name in DATASET_SOURCES:
+            version, snapshot, source_mtime = versions.get(name, (0, None, None))
+            if version and source_mtime == mtimes[name]:
+                if _data_store.dataset_version(name) == version or _load_snapshot(name, version, snapshot):
+                    continue
+            with dataset_parse_lock(name):
+                # Ponownie po zdobyciu blokady - inny proces mógł w tym czasie wczytać
+                # ten sam plik (start kilku procesów, upload w innym procesie)
+                version, snapshot, source_mtime = get_data_version(name)
+                mtime = _source_mtime(name)
+                if version and source_mtime == mtime:
+                    if _data_store.dataset_version(name) == version or _load_snapshot(name, version, snapshot):
+                        continue
+                publish_dataset(name, _parse_dataset(name), mtime)
+            if version and source_mtime != mtime:
+                # Plik zmieniono poza panelem admina - kioski dostają to samo zdarzenie co po uploadzie
+                event_broker.publish(DATASET_EVENTS[name])
+        for name in ARCHIVE_DATASETS:
+            version, snapshot, _ = versions.get(name, (0, None, None))
+            if version and _data_store.dataset_version(name) != version:
+                _swap_dataset(name, version, _read_archive_snapshot(snapshot))
+        return _data_store
+
+def _read_archive_snapshot(snapshot):
+    """Migawka zbioru zbiorczego; gdy jej brak - pusta ramka (zbioru nie da się sparsować od nowa)"""
+    import pandas as pd
+    try:
+        return read_snapshot(snapshot)
+    except Exception as e:
+        print(f"Błąd odczytu migawki {snapshot}: {e}")
+        return pd.DataFrame()
+
+def data_store():
+    """
+    Migawka danych dla bieżącego żądania - pobierana przy pierwszym użyciu i trzymana
+    w g do końca żądania, więc wszystkie odczyty w jednym żądaniu widzą tę samą wersję.
+    Poza żądaniem (wątki w tle) zawsze najnowsza migawka.
+    """
+    if not has_request_context():
+        return _refresh_data_store()
+    if 'data_store' not in g:
+        g.data_store = _refresh_data_store()
+    return g.data_store
+
+def get_dataset_with_version(name):
+    """
+    Zwróć (wersja, dane) dla 'export' (forma długa Export.xlsx) lub 'jumbo' (Jumbo.xlsx)
+    z migawki bieżącego żądania. Zwrócony DataFrame jest współdzielony - nie modyfikuj go w miejscu.
+    """
+    store = data_store()
+    return store.dataset_version(name), store.frame(name)
+
+def get_dataset(name):
+    """Zwróć dane w aktualnej wersji (patrz get_dataset_with_version)"""
+    return data_store().frame(name)
+
+def chart_payload(name, params, builder):
+    """
+    Zwróć odpowiedź wykresu dla parametrów params (krotka) zbudowaną przez builder(df).
+    Wynik jest liczony raz na wersję zbioru danych; zwrócony słownik jest współdzielony.
+    """
+    return data_store().payload(name, params, builder)
+
+# ==================== OGRANICZANIE OBCIĄŻENIA (LOAD SHEDDING) ====================
+#
+# Liczenie danych (parsowanie, serie wykresów) może zajmować naraz tylko
+# server.data_slots wątków; kolejne żądania czekają w ograniczonej kolejce.
+# Gdy miejsca brak albo dane są właśnie przebudowywane, endpointy wykresów i treści
+# zwracają ostatnią dobrą odpowiedź oznaczoną jako nieaktualna (X-Kiosk-Stale,
+# Cache-Control: stale-while-revalidate), a świeża liczy się w tle.
+
+STALE_REVALIDATE_SECONDS = 30
+
+class AdmissionControl:
+    """Ograniczona liczba miejsc do liczenia danych i ograniczona kolejka oczekujących"""
+
+    def __init__(self, slots, queue_limit, wait_seconds):
+        self._slots = threading.BoundedSemaphore(max(1, slots))
+        self._lock = threading.Lock()
+        self.queue_limit = queue_limit
+        self.wait_seconds = wait_seconds
+        self.waiting = 0
+
+    def acquire(self, wait=True):
+        """Zajmij miejsce; bez wait - tylko gdy jest wolne od razu. False = odmowa"""
+        if self._slots.acquire(blocking=False):
+            return True
+        if not wait:
+            return False
+        with self._lock:
+            if self.waiting >= self.queue_limit:
+                return False
+            self.waiting += 1
+            metrics.set('kiosk_data_queue_waiting', (), self.waiting)
+        try:
+            return self._slots.acquire(timeout=self.wait_seconds)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                metrics.set('kiosk_data_queue_waiting', (), self.waiting)
+
+    def release(self):
+        self._slots.release()
+
+_server_config = get_server_config()
+data_admission = AdmissionControl(_server_config['data_slots'], _server_config['data_queue'],
+                                  _server_config['data_wait_seconds'])
+
+# Ostatnia dobra odpowiedź per endpoint i parametry - niezależnie od wersji danych
+_last_good = {}
+
+def _remember_good(key, payload):
+    if key in _last_good or len(_last_good) < CHART_PAYLOAD_LIMIT:
+        _last_good[key] = payload
+
+def _revalidate(key, compute):
+    try:
+        if not data_admission.acquire():
+            return
+        try:
+            _remember_good(key, compute())
+        finally:
+            data_admission.release()
+    except Exception as e:
+        print(f"Błąd odświeżania w tle {key}: {e}")
+
+def _revalidate_in_background(key, compute):
+    """Policz świeżą odpowiedź w tle (jeden wątek na klucz)"""
+    if single_flight.busy('revalidate', key):
+        return
+    # Kontekst aplikacji, nie kopia żądania: kopia dzieliłaby environ i g z żądaniem,
+    # a jej zamknięcie w wątku powtórzyłoby teardown (metryki, profiler) tego żądania.
+    # url_for działa dzięki adresowi serwera przechwyconemu z bieżącego żądania;
+    # bez żądania data_store() daje najnowszą migawkę.
+    url_adapter = app.url_map.bind(request.host, script_name=request.script_root or '/',
+                                   url_scheme=request.scheme)
+    def revalidate():
+        with app.app_context() as ctx:
+            ctx.url_adapter = url_adapter
+            single_flight.do('revalidate', key, lambda: _revalidate(key, compute))
+    threading.Thread(target=revalidate, daemon=True).start()
+
+def _stale_response(payload):
+    metrics.inc('kiosk_load_shed_total', (('route', _route_label()), ('outcome', 'stale')))
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = f'max-age=0, stale-while-revalidate={STALE_REVALIDATE_SECONDS}'
+    response.headers['Warning'] = '110 - "Response is Stale"'
+    response.headers['X-Kiosk-Stale'] = '1'
+    return response
+
+def serve_payload(key, compute, ready=True):
+    """
+    Odpowiedź JSON z compute() z kontrolą obciążenia. Gdy dane nie są gotowe (ready=False)
+    albo brak wolnego miejsca - ostatnia dobra odpowiedź jako stale i odświeżenie w tle;
+    bez ostatniej dobrej odpowiedzi żądanie czeka w kolejce (pełna kolejka = 503).
+    """
+    stale = _last_good.get(key)
+    if stale is not None and (not ready or not data_admission.acquire(wait=False)):
+        _revalidate_in_background(key, compute)
+        return _stale_response(stale)
+    if stale is None and not data_admission.acquire():
+        metrics.inc('kiosk_load_shed_total', (('route', _route_label()), ('outcome', 'rejected')))
+        response = jsonify({'error': 'Serwer jest przeciążony, spróbuj ponownie za chwilę'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    try:
+        payload = compute()
+    finally:
+        data_admission.release()
+    _remember_good(key, payload)
+    return jsonify(payload)
+
+def serve_chart_payload(name, params, builder):
+    """
+    Odpowiedź wykresu (patrz chart_payload) w formacie z chart_format() - gotowa z migawki
+    od razu, w pozostałych przypadkach przez serve_payload
+    """
+    fmt = chart_format()
+    if fmt is None:
+        return jsonify({'error': 'Dozwolone format: ' + ', '.join(CHART_FORMATS)}), 400
+    if fmt != 'rows':
+        params, builder = params + (fmt,), columnar_builder(name, params, builder, fmt)
+    store = current_data_store()
+    if store is not None:
+        payload = store.cached_payload(name, params)
+        if payload is not None:
+            _remember_good((name, params), payload)
+            return jsonify(payload)
+    return serve_payload((name, params), lambda: chart_payload(name, params, builder), ready=store is not None)
+
+def serve_store_value(key, getter):
+    """
+    Odpowiedź z wartości gotowej na migawce (getter(store), np. lista maszyn) - z aktualnej
+    migawki bez miejsca do liczenia; miejsce zajmuje dopiero przebudowa danych (serve_payload)
+    """
+    store = current_data_store()
+    if store is not None:
+        value = getter(store)
+        _remember_good(key, value)
+        return jsonify(value)
+    return serve_payload(key, lambda: getter(data_store()), ready=False)
+
+# ==================== FORMAT KOLUMNOWY WYKRESÓW ====================
+#
+# Domyślnie serie wykresów mają postać wierszową: każda seria niesie własną oś X
+# (x/y) albo wartości do wspólnej listy 'days' (data). Z ?format=columnar (lub
+# Accept: application/vnd.kiosk.columnar+json) odpowiedź ma jedną wspólną oś 'x',
+# opis serii osobno ('series': nazwa, typ, kolor, oś) i gęste tablice 'values'
+# z jawnym null tam, gdzie brak danych. ?format=columnar-b64 koduje tablice jako
+# base64 liczb float little-endian ({'dtype': 'f4'|'f8', 'data'}, NaN = brak danych)
+# do odczytu przez Float32Array/Float64Array bez parsowania liczb z JSON.
+
+CHART_FORMATS = ('rows', 'columnar', 'columnar-b64')
+COLUMNAR_MIMETYPE = 'application/vnd.kiosk.columnar+json'
+FLOAT32_EXACT_LIMIT = 2 ** 24  # liczby całkowite poniżej tej wartości są dokładne w float32
+
+def chart_format():
+    """Format odpowiedzi wykresu z ?format= lub nagłówka Accept ('rows' domyślnie, None gdy nieznany)"""
+    fmt = request.args.get('format')
+    if fmt is None:
+        return 'columnar' if COLUMNAR_MIMETYPE in request.headers.get('Accept', '') else 'rows'
+    return fmt if fmt in CHART_FORMATS else None
+
+def encode_float_array(values):
+    """Tablica liczb (None = brak) jako base64 float32, a gdy float32 nie wystarcza - float64"""
+    import numpy as np
+    array = np.array(values, dtype='<f8')
+    finite = array[np.isfinite(array)]
+    if np.all((np.abs(finite) < FLOAT32_EXACT_LIMIT) & (finite == np.round(finite))):
+        array = array.astype('<f4')
+    return {'dtype': array.dtype.str[1:], 'data': base64.b64encode(array.tobytes()).decode('ascii')}
+
+def columnar_payload(payload, fmt='columnar'):
+    """Odpowiedź wykresu w postaci wierszowej przepisana na format kolumnowy (patrz opis sekcji)"""
+    rows = payload.get('series', [])
+    result = {key: value for key, value in payload.items() if key not in ('series', 'days')}
+    if 'days' in payload:
+        x = list(payload['days'])
+        positions = None
+    else:
+        # Suma osi wszystkich serii - słupki i linie mogą mieć różne dni
+        x = list(dict.fromkeys(value for s in rows for value in s.get('x', [])))
+        if all(isinstance(value, (int, float)) for value in x):
+            x.sort()
+        positions = {value: i for i, value in enumerate(x)}
+
+    def dense(serie, values):
+        if positions is None:
+            return list(values)
+        column = [None] * len(x)
+        for day, value in zip(serie['x'], values):
+            column[positions[day]] = value
+        return column
+
+    encode = encode_float_array if fmt == 'columnar-b64' else (lambda column: column)
+    meta, values = [], []
+    for serie in rows:
+        entry = {key: value for key, value in serie.items() if not isinstance(value, list)}
+        # Dodatkowe tablice serii (np. 'total' i 'days' zestawień) - wyrównane do wspólnej osi
+        extra = {key: encode(dense(serie, value)) for key, value in serie.items()
+                 if isinstance(value, list) and key not in ('x', 'y', 'data')}
+        if extra:
+            entry['extra'] = extra
+        meta.append(entry)
+        values.append(encode(dense(serie, serie['y'] if 'y' in serie else serie.get('data', []))))
+    result.update({'format': fmt, 'x': x, 'series': meta, 'values': values})
+    return result
+
+def columnar_builder(name, params, builder, fmt):
+    """Builder odpowiedzi kolumnowej - z odpowiedzi wierszowej tej samej migawki (liczonej raz)"""
+    return lambda df: columnar_payload(data_store().payload(name, params, builder), fmt)
+
+# ==================== WERSJE PLIKÓW DANYCH ====================
+#
+# Upload nie nadpisuje Export.xlsx / Jumbo.xlsx w miejscu. Plik trafia najpierw do
+# data/versions/ pod nazwą z datą, jest w całości parsowany (walidacja) i dopiero
+# wtedy podmieniany atomowo (os.replace) razem ze wskaźnikiem wersji w data_versions.
+# Wątek, który akurat czyta plik, widzi starą albo nową wersję - nigdy uciętą.
+# Kilka poprzednich wersji zostaje na dysku do natychmiastowego przywrócenia.
+
+DATA_FILE_FOLDER = os.path.join('data', 'versions')
+DATA_FILE_KEEP = 5
+DATASET_LOADERS = {'export': load_long, 'jumbo': load_jumbo}
+DATASET_EVENTS = {'export': 'export-data', 'jumbo': 'jumbo-data'}
+
+_publish_lock = threading.Lock()
+
+def _new_data_file_path(dataset, suffix=None):
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    return os.path.join(DATA_FILE_FOLDER, f"{dataset}-{stamp}-{suffix or secrets.token_hex(3)}.xlsx")
+
+def save_data_file(dataset, file):
+    """Zapisz przesłany plik jako nową wersję w data/versions (do .part, potem zmiana nazwy)"""
+    os.makedirs(DATA_FILE_FOLDER, exist_ok=True)
+    path = _new_data_file_path(dataset)
+    file.save(f"{path}.part")
+    os.replace(f"{path}.part", path)
+    return path
+
+def _replace_file(source, target, attempts=5):
+    """Skopiuj plik obok celu i podmień atomowo (Windows: ponów, gdy cel jest chwilowo otwarty)"""
+    tmp_path = f"{target}.tmp"
+    shutil.copyfile(source, tmp_path)
+    for attempt in range(attempts):
+        try:
+            os.replace(tmp_path, target)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                os.remove(tmp_path)
+                raise
+            time.sleep(0.2)
+
+def _archive_live_file(dataset):
+    """Przy pierwszej publikacji zachowaj obecny plik jako wersję, aby dało się do niego wrócić"""
+    source = DATASET_SOURCES[dataset]
+    conn = db_connect(timeout=30)
+    try:
+        with conn:
+            if conn.execute("SELECT COUNT(*) FROM data_files WHERE dataset=?", (dataset,)).fetchone()[0] or \
+                    not os.path.exists(source):
+                return
+            path = _new_data_file_path(dataset, 'poprzedni')
+            shutil.copyfile(source, path)
+            conn.execute("INSERT INTO data_files (dataset, filename, original_name, size, published_at) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         (dataset, os.path.basename(path), os.path.basename(source), os.path.getsize(path),
+                          os.path.getmtime(source)))
+    finally:
+        conn.close()
+
+def _record_published(dataset, path, original_name, rows):
+    """Oznacz wersję jako opublikowaną i usuń wersje starsze niż DATA_FILE_KEEP ostatnich"""
+    filename = os.path.basename(path)
+    conn = db_connect(timeout=30)
+    try:
+        with conn:
+            c = conn.cursor()
+            c.execute("UPDATE data_files SET published_at=? WHERE filename=?", (time.time(), filename))
+            if not c.rowcount:
+                c.execute("INSERT INTO data_files (dataset, filename, original_name, size, rows, published_at) "
+                          "VALUES (?, ?, ?, ?, ?, ?)",
+                          (dataset, filename, original_name, os.path.getsize(path), rows, time.time()))
+            old = c.execute("SELECT id, filename FROM data_files WHERE dataset=? "
+                            "ORDER BY published_at DESC LIMIT -1 OFFSET ?", (dataset, DATA_FILE_KEEP)).fetchall()
+            c.executemany("DELETE FROM data_files WHERE id=?", [(row[0],) for row in old])
+    finally:
+        conn.close()
+    for _, old_filename in old:
+        try:
+            os.remove(os.path.join(DATA_FILE_FOLDER, old_filename))
+        except OSError:
+            pass
+
+def publish_data_file(dataset, path, original_name=None):
+    """
+    Zwaliduj wersję pliku (pełne parsowanie) i opublikuj ją: podmień plik źródłowy atomowo
+    i zapisz migawkę z nowym numerem wersji. Zwraca (dane, raport); dane = None oznacza
+    niepoprawny plik - wtedy nic nie zostało zmienione.
+    """
+    report = IngestReport(dataset, original_name or os.path.basename(path))
+    df = DATASET_LOADERS[dataset](report, path=path)
+    if report.error or df.empty:
+        report.error = report.error or 'Plik nie zawiera danych w oczekiwanym układzie'
+        return None, report.save()
+
+    with report.stage('cache_publish'):
+        # Blokada parsowania od podmiany pliku do zapisu wersji - inne procesy, które zobaczą
+        # nowy plik, poczekają i wczytają tę migawkę zamiast parsować go ponownie
+        with _publish_lock, _dataset_lock, dataset_parse_lock(dataset):
+            _archive_live_file(dataset)
+            source = DATASET_SOURCES[dataset]
+            backup = f"{source}.prev"
+            if os.path.exists(source):
+                shutil.copy2(source, backup)
+            try:
+                _replace_file(path, source)
+                publish_dataset(dataset, df, _source_mtime(dataset))
+                _record_published(dataset, path, original_name, len(df))
+            except Exception:
+                # Wersja nie została opublikowana - wróć do poprzedniego pliku (z tym samym
+                # czasem modyfikacji, więc aktywna migawka pozostaje aktualna)
+                if os.path.exists(backup):
+                    os.replace(backup, source)
+                raise
+            finally:
+                if os.path.exists(backup):
+                    os.remove(backup)
+
+    report.info['version_file'] = os.path.basename(path)
+    report = report.save()
+    event_broker.publish(DATASET_EVENTS[dataset])
+    schedule_chart_images(dataset)
+    return df, report
+
+# ==================== WCZYTYWANIE WIELU PLIKÓW (ARCHIWUM) ====================
+#
+# Zaległe dane (kilka linii, zakładów, miesięcy) to wiele plików Export/Jumbo naraz.
+# ingest_workbooks() parsuje je równolegle w puli procesów (openpyxl trzyma GIL,
+# więc wątki nic by nie dały), dokleja kolumnę 'Plik' z nazwą pliku źródłowego
+# i publikuje całość jako osobne zbiory export_archive / jumbo_archive - migawki
+# jak dla Export/Jumbo, więc procesy serwera widzą je bez parsowania. Wykresy
+# kiosku korzystają dalej z bieżących Export.xlsx / Jumbo.xlsx.
+# Uruchomienie: python ingest.py <katalog|archiwum.zip>
+
+INGEST_PROVENANCE_COLUMN = 'Plik'
+
+def workbook_dataset(filename, dataset=None):
+    """Zbiór danych pliku: wymuszony dataset albo z nazwy (Export*.xlsx, Jumbo*.xlsx); None - pomiń"""
+    name = os.path.basename(filename).lower()
+    if not name.endswith('.xlsx') or name.startswith('~$'):
+        return None
+    if dataset:
+        return dataset
+    return next((kind for kind in DATASET_LOADERS if name.startswith(kind)), None)
+
+def find_workbooks(folder, dataset=None):
+    """Pliki do wczytania z katalogu (także podkatalogi) jako [(zbiór, ścieżka, nazwa względna)]"""
+    workbooks = []
+    for current, dirs, files in os.walk(folder):
+        dirs.sort()
+        for filename in sorted(files):
+            kind = workbook_dataset(filename, dataset)
+            if kind:
+                path = os.path.join(current, filename)
+                workbooks.append((kind, path, os.path.relpath(path, folder).replace(os.sep, '/')))
+    return workbooks
+
+@contextmanager
+def workbook_folder(source):
+    """Katalog z plikami - archiwum .zip jest rozpakowywane do katalogu tymczasowego"""
+    if os.path.isdir(source):
+        yield source
+        return
+    if not zipfile.is_zipfile(source):
+        raise ValueError(f"{source} nie jest katalogiem ani archiwum .zip")
+    with tempfile.TemporaryDirectory(prefix='kiosk-ingest-') as folder:
+        with zipfile.ZipFile(source) as archive:
+            archive.extractall(folder)
+        yield folder
+
+def _parse_workbook(dataset, path, name):
+    """Wczytaj jeden plik (w procesie puli) - ramka z kolumną 'Plik' i raport wczytania"""
+    report = IngestReport(dataset, name)
+    df = DATASET_LOADERS[dataset](report, path)
+    if not df.empty:
+        df.insert(0, INGEST_PROVENANCE_COLUMN, name)
+    report.finish()
+    return df, report
+
+def ingest_workbooks(source, dataset=None, workers=None, publish=True):
+    """
+    Wczytaj wszystkie pliki Export/Jumbo z katalogu lub archiwum .zip w workers procesach
+    (domyślnie liczba rdzeni), połącz per zbiór i opublikuj jako export_archive / jumbo_archive.
+    Raport każdego pliku trafia do ingest_reports; pliki z błędem nie wchodzą do zbioru.
+    Zwraca {zbiór zbiorczy: {'rows', 'version', 'files': [raporty]}}.
+    Pula procesów - wywoływać z osobnego procesu (ingest.py), nie z wątku serwera.
+    """
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+
+    with workbook_folder(source) as folder:
+        workbooks = find_workbooks(folder, dataset)
+        if not workbooks:
+            raise ValueError(f"Brak plików Export*.xlsx / Jumbo*.xlsx w {source}")
+        workers = max(1, min(workers or os.cpu_count() or 1, len(workbooks)))
+        if workers == 1:
+            results = [_parse_workbook(*workbook) for workbook in workbooks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_parse_workbook, *zip(*workbooks)))
+
+    summary = {}
+    for name, kind in ARCHIVE_DATASETS.items():
+        parsed = [result for (k, _, _), result in zip(workbooks, results) if k == kind]
+        if not parsed:
+            continue
+        frames = [df for df, report in parsed if not report.error and not df.empty]
+        merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        version = publish_dataset(name, merged) if publish and frames else None
+        summary[name] = {'rows': len(merged), 'version': version,
+                         'files': [report.save() for _, report in parsed]}
+    return summary
+
+# ==================== ZDARZENIA NA ŻYWO (SSE) ====================
+
+class EventBroker:
+    """
+    Bufor zdarzeń wysyłanych do kiosków przez Server-Sent Events.
+    Każde zdarzenie dostaje ID w formacie '<epoka>-<numer>', dzięki czemu kiosk po
+    ponownym połączeniu (nagłówek Last-Event-ID) dostaje tylko to, co przegapił,
+    a po restarcie serwera (inna epoka) - zdarzenie 'reset' i pełne odświeżenie.
+    """
+
+    def __init__(self, size=256):
+        self.epoch = str(int(time.time()))
+        self.size = size
+        self._events = deque(maxlen=size)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._db_path = None
+
+    def use_database(self, db_path='kiosk.db'):
+        """
+        Trzymaj zdarzenia w tabeli SQLite zamiast w pamięci procesu.
+        Używane w trybie wieloprocesowym - zdarzenie z jednego procesu widzą wszystkie.
+        """
+        self._db_path = db_path
+
+    @property
+    def last_id(self):
+        if self._db_path:
+            conn = db_connect(self._db_path)
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM kiosk_events").fetchone()[0]
+            conn.close()
+            return last_id
+        return self._last_id
+
+    def format_id(self, event_id):
+        return f"{self.epoch}-{event_id}"
+
+    def parse_id(self, raw_id):
+        """Zwróć numer zdarzenia z Last-Event-ID lub None, jeśli ID pochodzi z innej epoki"""
+        try:
+            epoch, event_id = str(raw_id).split('-', 1)
+            if epoch != self.epoch:
+                return None
+            return int(event_id)
+        except (ValueError, TypeError):
+            return None
+
+    def add_listener(self, callback):
+        """Zarejestruj funkcję wywoływaną po każdej publikacji (np. serwer asynchroniczny)"""
+        self._listeners.append(callback)
+
+    def publish(self, event_type, data=None):
+        """Opublikuj zdarzenie (np. 'settings', 'slides', 'export-data')"""
+        if self._db_path:
+            conn = db_connect(self._db_path)
+            c = conn.cursor()
+            c.execute("INSERT INTO kiosk_events (type, data) VALUES (?, ?)",
+                      (event_type, json.dumps(data or {})))
+            event_id = c.lastrowid
+            c.execute("DELETE FROM kiosk_events WHERE id <= ?", (event_id - self.size,))
+            conn.commit()
+            conn.close()
+        else:
+            with self._lock:
+                self._last_id += 1
+                self._events.append((self._last_id, event_type, data or {}))
+                event_id = self._last_id
+        for callback in self._listeners:
+            callback()
+        return event_id
+
+    def since(self, last_id):
+        """
+        Zwróć zdarzenia nowsze niż last_id.
+        None oznacza, że kiosk nie może nadrobić zaległości (bufor się przepełnił).
+        """
+        if self._db_path:
+            conn = db_connect(self._db_path)
+            oldest = conn.execute("SELECT MIN(id) FROM kiosk_events").fetchone()[0]
+            rows = conn.execute("SELECT id, type, data FROM kiosk_events WHERE id > ? ORDER BY id",
+                                (last_id,)).fetchall()
+            conn.close()
+            if oldest is not None and last_id < oldest - 1:
+                return None
+            return [(row[0], row[1], json.loads(row[2])) for row in rows]
+        with self._lock:
+            if self._events and last_id < self._events[0][0] - 1:
+                return None
+            return [e for e in self._events if e[0] > last_id]
+
+
+event_broker = EventBroker()
+
+def format_sse(event_id, event_type, data):
+    """Sformatuj pojedyncze zdarzenie w formacie text/event-stream"""
+    return f"id: {event_broker.format_id(event_id)}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+def pending_sse_events(raw_last_id):
+    """
+    Zwróć listę fragmentów strumienia SSE, których kiosk jeszcze nie widział.
+    Bez Last-Event-ID kiosk dostaje tylko aktualne ID (pierwsze połączenie).
+    """
+    if not raw_last_id:
+        current = event_broker.last_id
+        return [f"id: {event_broker.format_id(current)}\n\n"], current
+
+    last_id = event_broker.parse_id(raw_last_id)
+    events = event_broker.since(last_id) if last_id is not None else None
+    if events is None:
+        # Restart serwera lub przepełniony bufor - kiosk musi odświeżyć wszystko
+        current = event_broker.last_id
+        return [format_sse(current, 'reset', {})], current
+
+    chunks = [format_sse(event_id, event_type, data) for event_id, event_type, data in events]
+    return chunks, (events[-1][0] if events else last_id)
+
+# ==================== TELEMETRIA ODPOWIEDZI QUIZU ====================
+#
+# Odpowiedzi z kiosku trafiają najpierw do bufora pierścieniowego w pamięci.
+# Wątek w tle co kilka sekund zapisuje całą zebraną partię w jednej transakcji
+# i dolicza ją do statystyk dziennych (quiz_answer_stats), więc zmiana zmiany
+# z setkami odpowiedzi daje kilka zapisów zamiast setek osobnych commitów.
+
+class QuizAnswerBuffer:
+    """Bufor pierścieniowy odpowiedzi quizu zapisywany do SQLite partiami"""
+
+    def __init__(self, size=10000, flush_seconds=5, batch_size=1000, db_path='kiosk.db'):
+        self._answers = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.db_path = db_path
+        self.dropped = 0
+
+    def record(self, question_id, answer_index, is_correct):
+        """Zapamiętaj odpowiedź (bez dostępu do bazy); przy pełnym buforze wypada najstarsza"""
+        with self._lock:
+            if len(self._answers) == self._answers.maxlen:
+                self.dropped += 1
+            self._answers.append((question_id, answer_index, int(is_correct), datetime.now()))
+            full_batch = len(self._answers) >= self.batch_size
+        self._ensure_flusher()
+        if full_batch:
+            # Pełna partia - zapis od razu, zanim bufor zacznie gubić najstarsze odpowiedzi
+            self._wake.set()
+
+    @property
+    def pending(self):
+        return len(self._answers)
+
+    def _ensure_flusher(self):
+        # Wątek zapisu startuje przy pierwszej odpowiedzi w danym procesie (także po fork)
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+        threading.Thread(target=self._run, daemon=True, name='quiz-answers-flush').start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Błąd zapisu odpowiedzi quizu: {e}")
+
+    def flush(self):
+        """Zapisz zebrane odpowiedzi w jednej transakcji i zaktualizuj statystyki dzienne"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._answers:
+                    return 0
+                batch = list(self._answers)
+                self._answers.clear()
+
+            # Agregacja partii w pamięci: (pytanie, dzień) -> [odpowiedzi, poprawne, 1, 2, 3, 4]
+            stats = {}
+            for question_id, answer_index, is_correct, answered_at in batch:
+                row = stats.setdefault((question_id, answered_at.date().isoformat()), [0, 0, 0, 0, 0, 0])
+                row[0] += 1
+                row[1] += is_correct
+                if 0 <= answer_index < 4:
+                    row[2 + answer_index] += 1
+
+            conn = db_connect(self.db_path, timeout=30)
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO quiz_answers (question_id, answer_index, is_correct, answered_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        [(question_id, answer_index, is_correct, answered_at.isoformat(sep=' ', timespec='seconds'))
+                         for question_id, answer_index, is_correct, answered_at in batch])
+                    conn.executemany(
+                        "INSERT INTO quiz_answer_stats "
+                        "(question_id, day, answers, correct, answer1_count, answer2_count, answer3_count, answer4_count) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (question_id, day) DO UPDATE SET "
+                        "answers = answers + excluded.answers, correct = correct + excluded.correct, "
+                        "answer1_count = answer1_count + excluded.answer1_count, "
+                        "answer2_count = answer2_count + excluded.answer2_count, "
+                        "answer3_count = answer3_count + excluded.answer3_count, "
+                        "answer4_count = answer4_count + excluded.answer4_count",
+                        [key + tuple(values) for key, values in stats.items()])
+            except sqlite3.Error:
+                # Nie gub partii - wróć z nią do bufora (najstarsze wypadną, jeśli brak miejsca)
+                with self._lock:
+                    merged = batch + list(self._answers)
+                    overflow = max(0, len(merged) - self._answers.maxlen)
+                    self.dropped += overflow
+                    self._answers.clear()
+                    self._answers.extend(merged[overflow:])
+                raise
+            finally:
+                conn.close()
+            return len(batch)
+
+_quiz_answer_config = load_config().get('quiz_answers', {})
+quiz_answers = QuizAnswerBuffer(size=int(_quiz_answer_config.get('buffer_size', 10000)),
+                                flush_seconds=float(_quiz_answer_config.get('flush_seconds', 5)),
+                                batch_size=int(_quiz_answer_config.get('batch_size', 1000)))
+atexit.register(quiz_answers.flush)
+
+# ==================== ZASOBY STATYCZNE (FINGERPRINT + KOMPRESJA) ====================
+#
+# Duże pliki statyczne (plotly.js, chart.js, tailwind.css, czcionki) kopiowane są
+# przy starcie do static/dist pod nazwą z hashem treści, razem z wersjami .gz i .br.
+# Dzięki temu mogą mieć nagłówek Cache-Control: immutable - kiosk po restarcie
+# nie pobiera ponownie megabajtów, dopóki plik się nie zmieni.
+
+ASSET_FOLDER = os.path.join('static', 'dist')
+FINGERPRINTED_ASSETS = [
+    # Czcionki najpierw - CSS odwołuje się do nich przez url(...)
+    'fonts/roboto-light.ttf',
+    'fonts/roboto-regular.ttf',
+    'fonts/roboto-medium.ttf',
+    'fonts/roboto-bold.ttf',
+    'css/tailwind.css',
+    'css/style.css',
+    'js/plotly.js',
+    'js/chart.js',
+    'js/main.js'
+]
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+_asset_manifest = {}
+_asset_lock = threading.Lock()
+
+def _rewrite_css_urls(css_text, css_path, manifest):
+    """Podmień względne url(...) w CSS na nazwy z hashem"""
+    css_dir = os.path.dirname(css_path)
+
+    def replace(match):
+        url = match.group(2)
+        target = os.path.normpath(os.path.join(css_dir, url)).replace(os.sep, '/')
+        if target in manifest:
+            url = os.path.relpath(manifest[target], css_dir).replace(os.sep, '/')
+        return f"url({match.group(1)}{url}{match.group(1)})"
+
+    return re.sub(r"url\((['\"]?)([^'\")]+)\1\)", replace, css_text)
+
+def _write_asset(target, content):
+    """Zapisz plik z hashem oraz wersje skompresowane (pomija pliki, które już istnieją)"""
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(f"{target}.gz", 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(f"{target}.br", 'wb') as f:
+            f.write(brotli.compress(content, quality=9))
+    # Plik główny na końcu - jego obecność oznacza kompletny zestaw
+    tmp_path = f"{target}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, target)
+
+def build_static_assets():
+    """
+    Zbuduj static/dist: nazwy z hashem treści + warianty gzip/brotli.
+    Zwraca manifest {'js/plotly.js': 'js/plotly.<hash>.js', ...} (ścieżki względem static/dist)
+    """
+    manifest = {}
+    for path in FINGERPRINTED_ASSETS:
+        source = os.path.join('static', path)
+        if not os.path.exists(source):
+            continue
+        with open(source, 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            content = _rewrite_css_urls(content.decode('utf-8'), path, manifest).encode('utf-8')
+
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        name, ext = os.path.splitext(path)
+        fingerprinted = f"{name}.{digest}{ext}"
+        _write_asset(os.path.join(ASSET_FOLDER, fingerprinted), content)
+        manifest[path] = fingerprinted
+
+    # Usuń stare wersje plików
+    current = {os.path.normpath(p) for p in manifest.values()}
+    for root, _, files in os.walk(ASSET_FOLDER):
+        for filename in files:
+            rel_path = os.path.relpath(os.path.join(root, filename), ASSET_FOLDER)
+            base_path = re.sub(r'\.(gz|br|tmp)$', '', rel_path)
+            if os.path.normpath(base_path) not in current:
+                try:
+                    os.remove(os.path.join(root, filename))
+                except OSError:
+                    pass
+
+    with _asset_lock:
+        _asset_manifest.clear()
+        _asset_manifest.update(manifest)
+    print(f"✅ Zasoby statyczne przygotowane: {len(manifest)} plików (brotli: {'tak' if brotli else 'nie'})")
+    return manifest
+
+def asset_url(path):
+    """Adres zasobu statycznego - wersja z hashem jeśli jest gotowa, w przeciwnym razie zwykły plik"""
+    fingerprinted = _asset_manifest.get(path)
+    if fingerprinted:
+        return url_for('static_asset', filename=fingerprinted)
+    return url_for('static', filename=path)
+
+app.add_template_global(asset_url)
+
+@app.route('/static/dist/<path:filename>')
+def static_asset(filename):
+    """Zasób z hashem w nazwie: wersja .br/.gz wg Accept-Encoding i cache 'immutable'"""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding'))
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if candidate in accepted and os.path.exists(os.path.join(ASSET_FOLDER, filename + suffix)):
+            encoding = candidate
+            filename += suffix
+            break
+
+    response = send_from_directory(ASSET_FOLDER, filename, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
+
+# ==================== KOMPRESJA ODPOWIEDZI (GZIP / BROTLI) ====================
+#
+# Waitress wysyła odpowiedzi bez kompresji, a HTML (/wykres, panel admina) i JSON
+# wykresów oraz treści kompresują się kilkukrotnie. Middleware WSGI kompresuje
+# gotowe odpowiedzi tekstowe (z Content-Length, od server.compress_min_size bajtów)
+# wg Accept-Encoding: brotli (gdy pakiet jest zainstalowany), potem gzip.
+# Strumienie (SSE, eksport CSV/Parquet) i pliki już skompresowane przechodzą bez zmian.
+# Skompresowane treści odpowiedzi, które można cache'ować, są pamiętane (LRU wg
+# skrótu treści) - kiosk odpytujący w kółko te same dane nie kompresuje ich od nowa.
+
+COMPRESSIBLE_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'application/json',
+                          'application/javascript', 'text/javascript', 'application/manifest+json',
+                          'application/vnd.kiosk.columnar+json', 'image/svg+xml')
+
+def accepted_encodings(header):
+    """Kodowania z Accept-Encoding o niezerowej wadze (np. 'gzip;q=0' oznacza odmowę)"""
+    accepted = set()
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+class CompressionMiddleware:
+    """Middleware WSGI kompresujące odpowiedzi tekstowe (patrz opis sekcji)"""
+
+    def __init__(self, wsgi_app, level=6, min_size=1024, cache_bytes=16 * 1024 * 1024):
+        self.wsgi_app = wsgi_app
+        self.level = level
+        self.min_size = min_size
+        self.cache_bytes = cache_bytes
+        self._cache = {}        # (skrót treści, kodowanie) -> skompresowana treść (kolejność = LRU)
+        self._cache_size = 0
+        self._lock = threading.Lock()
+
+    def _choose_encoding(self, environ):
+        if environ.get('REQUEST_METHOD') not in ('GET', 'POST'):
+            return None
+        accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING'))
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted or '*' in accepted:
+            return 'gzip'
+        return None
+
+    def _should_compress(self, status, headers):
+        if not status.startswith('200'):
+            return False
+        header = {name.lower(): value for name, value in headers}
+        mimetype = header.get('content-type', '').split(';')[0].strip().lower()
+        return (mimetype in COMPRESSIBLE_MIMETYPES
+                and 'content-encoding' not in header
+                and 'no-transform' not in header.get('cache-control', '')
+                and header.get('content-length', '').isdigit()
+                and int(header['content-length']) >= self.min_size)
+
+    @staticmethod
+    def _cacheable(headers):
+        header = {name.lower(): value for name, value in headers}
+        cache_control = header.get('cache-control', '')
+        return 'set-cookie' not in header and 'no-store' not in cache_control and 'private' not in cache_control
+
+    def _compress(self, body, encoding, cacheable):
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding) if cacheable else None
+        if key is not None:
+            with self._lock:
+                compressed = self._cache.pop(key, None)
+                if compressed is not None:
+                    self._cache[key] = compressed
+                    metrics.inc('kiosk_compression_total', (('encoding', encoding), ('cache', 'hit')))
+                    return compressed
+
+        with timed_stage('compress'):
+            if encoding == 'br':
+                compressed = brotli.compress(body, quality=min(self.level, 11))
+            else:
+                compressed = gzip.compress(body, compresslevel=min(self.level, 9), mtime=0)
+        metrics.inc('kiosk_compression_total', (('encoding', encoding), ('cache', 'miss' if key else 'off')))
+
+        if key is not None and len(compressed) <= self.cache_bytes // 8:
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = compressed
+                    self._cache_size += len(compressed)
+                while self._cache_size > self.cache_bytes:
+                    oldest = next(iter(self._cache))
+                    self._cache_size -= len(self._cache.pop(oldest))
+        return compressed
+
+    def __call__(self, environ, start_response):
+        encoding = self._choose_encoding(environ)
+        if encoding is None:
+            return self.wsgi_app(environ, start_response)
+
+        captured = {}
+        buffered = []
+        synchronous = [True]
+
+        def capture(status, headers, exc_info=None):
+            # Decyzja zapada od razu; start_response wywołany dopiero przy iteracji - bez kompresji
+            if synchronous[0] and exc_info is None and self._should_compress(status, headers):
+                captured.update(status=status, headers=headers)
+                return buffered.append
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.wsgi_app(environ, capture)
+        synchronous[0] = False
+        if not captured:
+            return app_iter
+
+        try:
+            body = b''.join(buffered) + b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        compressed = self._compress(body, encoding, self._cacheable(captured['headers']))
+
+        headers = []
+        vary = ['Accept-Encoding']
+        for name, value in captured['headers']:
+            lower = name.lower()
+            if lower == 'content-length':
+                continue
+            if lower == 'vary':
+                vary = [v.strip() for v in value.split(',') if v.strip()] + vary
+                continue
+            if lower == 'etag' and not value.startswith('W/'):
+                # Inne bajty niż wersja nieskompresowana - słaby ETag (If-None-Match nadal działa)
+                value = 'W/' + value
+            headers.append((name, value))
+        headers += [('Content-Encoding', encoding), ('Content-Length', str(len(compressed))),
+                    ('Vary', ', '.join(dict.fromkeys(vary)))]
+        start_response(captured['status'], headers)
+        return [compressed]
+
+app.wsgi_app = CompressionMiddleware(app.wsgi_app, level=_server_config['compress_level'],
+                                     min_size=_server_config['compress_min_size'],
+                                     cache_bytes=_server_config['compress_cache_mb'] * 1024 * 1024)
+
+# ==================== TRYB OFFLINE (SERVICE WORKER) ====================
+#
+# Kiosk rejestruje service worker (/sw.js), który trzyma w pamięci podręcznej
+# wszystko z manifestu /api/manifest: stronę główną, zasoby statyczne, slajdy
+# i dane API - każdy wpis z własną wersją. Gdy serwer nie odpowiada, kiosk działa
+# z pamięci podręcznej; po zmianie wersji manifestu pobiera tylko zmienione wpisy.
+
+OFFLINE_STATIC_FILES = ['images/storaenso_logo.png']
+OFFLINE_JUMBO_URL = '/api/jumbo-data?segments[]=Amazon&segments[]=Reszta&brygada=All&format=columnar'
+
+def _short_hash(value):
+    """Krótki hash (12 znaków) dowolnej wartości serializowalnej do JSON"""
+    return hashlib.sha256(json.dumps(value, default=str, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def _file_version(path):
+    """Wersja pliku na podstawie czasu modyfikacji i rozmiaru"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{int(stat.st_mtime)}-{stat.st_size}"
+
+def _content_version():
+    """Wersja treści z bazy (ustawienia, inspiracje, widoczność stron)"""
+    conn = db_connect()
+    c = conn.cursor()
+    rows = [
+        c.execute('SELECT key, value FROM settings ORDER BY key').fetchall(),
+        c.execute('SELECT id, title, description, image_url FROM inspirations ORDER BY id').fetchall(),
+        c.execute('SELECT page_id, is_visible FROM page_visibility ORDER BY page_id').fetchall()
+    ]
+    conn.close()
+    return _short_hash(rows)
+
+def build_offline_manifest():
+    """
+    Zbuduj manifest dla service workera: lista {'url', 'version'} wszystkich zasobów
+    potrzebnych kioskowi offline oraz wersja całości (hash wpisów)
+    """
+    content_version = _content_version()
+    store = data_store()
+    export_version = store.dataset_version('export')
+    jumbo_version = store.dataset_version('jumbo')
+    slides = get_slide_images(sync=False)
+    slides_version = _short_hash([(s['name'], _file_version(os.path.join(app.config['UPLOAD_FOLDER'], s['name'])))
+                                  for s in slides])
+    assets_version = _short_hash(_asset_manifest)
+
+    entries = [
+        # Strona główna zawiera ustawienia i adresy zasobów z hashem
+        {'url': url_for('index'), 'version': f"{content_version}-{assets_version}"},
+        {'url': url_for('get_content'), 'version': f"{content_version}-{export_version}-{slides_version}"},
+        {'url': url_for('api_inspirations'), 'version': content_version},
+        {'url': url_for('slides'), 'version': slides_version},
+        {'url': url_for('get_machines'), 'version': f"export-{export_version}"},
+        {'url': OFFLINE_JUMBO_URL, 'version': f"jumbo-{jumbo_version}"}
+    ]
+
+    # Wykresy wszystkich maszyn (pierwszy tydzień - widok domyślny kiosku)
+    for maszyna in store.machines:
+        entries.append({'url': url_for('chart_data', kod=maszyna['kod'], start_day=1, format='columnar'),
+                        'version': f"export-{export_version}"})
+
+    # Zasoby statyczne - wersja jest już w nazwie pliku
+    for path in FINGERPRINTED_ASSETS:
+        if path in _asset_manifest:
+            entries.append({'url': asset_url(path), 'version': _asset_manifest[path]})
+    for path in OFFLINE_STATIC_FILES:
+        version = _file_version(os.path.join('static', path))
+        if version:
+            entries.append({'url': url_for('static', filename=path), 'version': version})
+
+    for slide in slides:
+        version = _file_version(os.path.join(app.config['UPLOAD_FOLDER'], slide['name']))
+        if version:
+            entries.append({'url': slide['url'], 'version': version})
+
+    # Lokalne obrazki inspiracji (adresy zewnętrzne pomijamy)
+    seen = {entry['url'] for entry in entries}
+    for inspiration in get_inspirations():
+        image_url = inspiration.get('image_url') or ''
+        if image_url.startswith('/static/') and image_url not in seen:
+            version = _file_version(image_url.lstrip('/'))
+            if version:
+                entries.append({'url': image_url, 'version': version})
+                seen.add(image_url)
+
+    return {'version': _short_hash(entries), 'entries': entries}
+
+# Ostatnio zbudowany manifest i klucz, z którego powstał. Każda zmiana treści
+# z panelu admina publikuje zdarzenie SSE, więc numer ostatniego zdarzenia razem
+# z wersjami danych, zasobów i plików slajdów wystarcza, by wykryć nowy manifest
+# bez zapytań o ustawienia i bez haszowania wszystkich wpisów.
+_offline_manifest_cache = {'key': None, 'manifest': None}
+_offline_manifest_lock = threading.Lock()
+
+def _offline_manifest_key():
+    """Tani klucz manifestu: zdarzenia, wersje danych, zasoby statyczne i pliki slajdów"""
+    store = data_store()
+    try:
+        with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+            slide_files = sorted((entry.name, _file_version(entry.path)) for entry in entries if entry.is_file())
+    except OSError:
+        slide_files = []
+    static_files = [_file_version(os.path.join('static', path)) for path in OFFLINE_STATIC_FILES]
+    return (event_broker.epoch, event_broker.last_id,
+            store.dataset_version('export'), store.dataset_version('jumbo'),
+            tuple(sorted(_asset_manifest.items())), tuple(slide_files), tuple(static_files))
+
+def current_offline_manifest():
+    """Manifest offline - przebudowany tylko wtedy, gdy zmienił się jego klucz"""
+    key = _offline_manifest_key()
+    with _offline_manifest_lock:
+        if _offline_manifest_cache['key'] == key:
+            return _offline_manifest_cache['manifest']
+    manifest = build_offline_manifest()
+    with _offline_manifest_lock:
+        _offline_manifest_cache.update(key=key, manifest=manifest)
+    return manifest
+
+@app.route('/api/manifest')
+def offline_manifest():
+    """
+    Manifest zasobów dla service workera (ETag = wersja manifestu).
+    Service worker wysyła If-None-Match z wersją, którą już ma - bez zmian odpowiedź to 304.
+    """
+    manifest = current_offline_manifest()
+    if request.if_none_match.contains(manifest['version']):
+        response = app.response_class(status=304)
+        response.set_etag(manifest['version'])
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    response = jsonify(manifest)
+    response.set_etag(manifest['version'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/sw.js')
+def service_worker():
+    """Service worker musi być serwowany z katalogu głównego, aby obejmował całą stronę"""
+    response = send_from_directory(os.path.join(app.root_path, 'static', 'js'), 'sw.js',
+                                   mimetype='text/javascript', max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
+# ==================== TRASY (ROUTES) ====================
+
+@app.route('/')
+def index():
+    """Strona główna - Dashboard"""
+    conn = db_connect()
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    
+    # Pobierz ustawienia
+    settings_rows = c.execute('SELECT key, value FROM settings').fetchall()
+    settings_dict = {row['key']: row['value'] for row in settings_rows}
+    
+    # Pobierz inspiracje
+    inspirations_rows = c.execute('SELECT id, title, description, image_url FROM inspirations ORDER BY created_at DESC').fetchall()
+    inspirations = [dict(row) for row in inspirations_rows]
+    
+    # Pobierz widoczność stron
+    try:
+        visibility_rows = c.execute('SELECT page_id, is_visible FROM page_visibility').fetchall()
+        visibility = {row['page_id']: bool(row['is_visible']) for row in visibility_rows}
+    except:
+        visibility = {}
+    
+    conn.close()
+    
+    return render_template('index.html',
+                         header_title=settings_dict.get('header_title', 'Dashboard Inspiracji i Wyników'),
+                         footer_note=settings_dict.get('footer_note', 'Stora Enso'),
+                         about_text=settings_dict.get('about_text', ''),
+                         inspirations=inspirations,
+                         visibility=visibility)
+
+@app.context_processor
+def inject_page_visibility():
+    """Wstrzykuje stan widoczności stron do wszystkich szablonów"""
+    try:
+        conn = db_connect()
+        c = conn.cursor()
+        c.execute('SELECT page_id, is_visible FROM page_visibility')
+        visibility = {row[0]: bool(row[1]) for row in c.fetchall()}
+        conn.close()
+        return dict(pages_visible=visibility)
+    except:
+        return dict(pages_visible={})
+
+@app.route('/api/visibility', methods=['POST'])
+def update_visibility():
     """Aktualizuj widoczność stron"""
     if not session.get('authenticated'):
         return jsonify({'error': 'Brak autoryzacji'}), 401
@@ -478,12 +2832,13 @@ def update_visibility():
     if not page_id:
         return jsonify({'error': 'Brak ID strony'}), 400
         
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     c.execute("UPDATE page_visibility SET is_visible=? WHERE page_id=?", (is_visible, page_id))
     conn.commit()
     conn.close()
     
+    event_broker.publish('visibility', {'page_id': page_id})
     return jsonify({'success': True})
 
 @app.route('/admin', methods=['GET', 'POST'])
@@ -510,7 +2865,7 @@ def admin():
         # AUTOMATYCZNA NAPRAWA BAZY (Dla serwerów bez nowej tabeli)
         init_db()
         
-        conn = sqlite3.connect('kiosk.db')
+        conn = db_connect()
         conn.row_factory = sqlite3.Row
         c = conn.cursor()
         
@@ -537,7 +2892,8 @@ def admin():
                              about_text=settings_dict.get('about_text', ''),
                              inspirations=inspirations,
                              pages=pages,
-                             slides=slides)
+                             slides=slides,
+                             profile_routes=profile_routes())
     except Exception as e:
         print(f"BŁĄD W ADMIN: {str(e)}")
         import traceback
@@ -554,7 +2910,7 @@ def admin_logout():
 def quiz():
     """Strona Quiz / Pytanie dnia"""
     # Sprawdź widoczność
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     c.execute('SELECT is_visible FROM page_visibility WHERE page_id=?', ('quiz',))
     row = c.fetchone()
@@ -588,6 +2944,7 @@ def update_settings():
     if data and 'about_text' in data:
         update_setting('about_text', data['about_text'])
     
+    event_broker.publish('settings')
     return jsonify({'success': True})
 
 @app.route('/api/inspiration', methods=['POST'])
@@ -597,13 +2954,14 @@ def add_inspiration():
         return jsonify({'error': 'Brak autoryzacji'}), 401
     
     data = request.json or {}
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     c.execute("INSERT INTO inspirations (title, description, image_url) VALUES (?, ?, ?)",
              (data.get('title', ''), data.get('description', ''), data.get('image_url', '')))
     conn.commit()
     conn.close()
     
+    event_broker.publish('inspirations')
     return jsonify({'success': True})
 
 @app.route('/api/inspiration/<int:inspiration_id>', methods=['DELETE'])
@@ -612,12 +2970,13 @@ def delete_inspiration(inspiration_id):
     if not session.get('authenticated'):
         return jsonify({'error': 'Brak autoryzacji'}), 401
     
-    conn = sqlite3.connect('kiosk.db')
+    conn = db_connect()
     c = conn.cursor()
     c.execute("DELETE FROM inspirations WHERE id=?", (inspiration_id,))
     conn.commit()
     conn.close()
     
+    event_broker.publish('inspirations')
     return jsonify({'success': True})
 
 @app.route('/api/upload', methods=['POST'])
@@ -642,6 +3001,7 @@ def upload_file():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         
+        event_broker.publish('slides')
         return jsonify({
             'success': True,
             'url': f'/static/images/{filename}',
@@ -664,11 +3024,12 @@ def delete_slide(filename):
         if os.path.exists(filepath):
             os.remove(filepath)
             # Usuń też z tabeli kolejności
-            conn = sqlite3.connect('kiosk.db')
+            conn = db_connect()
             c = conn.cursor()
             c.execute("DELETE FROM slide_order WHERE filename=?", (filename,))
             conn.commit()
             conn.close()
+            event_broker.publish('slides')
             return jsonify({'success': True})
         else:
             return jsonify({'error': 'Plik nie istnieje'}), 404
@@ -689,7 +3050,7 @@ def reorder_slide():
         return jsonify({'error': 'Nieprawidłowe parametry'}), 400
     
     try:
-        conn = sqlite3.connect('kiosk.db')
+        conn = db_connect()
         c = conn.cursor()
         
         # Pobierz wszystkie slajdy posortowane wg pozycji
@@ -726,6 +3087,7 @@ def reorder_slide():
         conn.commit()
         conn.close()
         
+        event_broker.publish('slides')
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -745,17 +3107,19 @@ def upload_jumbo():
     
     if file and (file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
         try:
-            filepath = 'Jumbo.xlsx'
-            file.save(filepath)
-            
-            df_check = pd.read_excel(filepath, engine='openpyxl')
-            if df_check.empty:
-                return jsonify({'error': 'Plik został zapisany, ale wydaje się pusty lub ma nieprawidłową strukturę.'}), 200
+            # Nowa wersja trafia do data/versions; Jumbo.xlsx podmieniany dopiero po walidacji
+            path = save_data_file('jumbo', file)
+            df_check, report = publish_data_file('jumbo', path, file.filename)
+            if df_check is None:
+                os.remove(path)
+                return jsonify({'error': f"Plik odrzucony, kiosk nadal używa poprzedniej wersji: {report['error']}",
+                                'report': report}), 400
             
             return jsonify({
                 'success': True,
                 'message': f'Plik Jumbo.xlsx został zaktualizowany ({len(df_check)} wierszy)',
-                'filename': 'Jumbo.xlsx'
+                'filename': 'Jumbo.xlsx',
+                'report': report
             })
         except Exception as e:
             return jsonify({'error': f'Błąd podczas zapisywania pliku: {str(e)}'}), 500
@@ -778,44 +3142,117 @@ def upload_excel():
     # Sprawdź czy to plik Excel
     if file and (file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
         try:
-            # Zapisz jako Export.xlsx (zastąp istniejący)
-            filepath = 'Export.xlsx'
-            file.save(filepath)
-            
-            # Wymuś przeładowanie danych, aby sprawdzić czy plik jest czytelny
-            df_check = load_long()
-            if df_check.empty:
-                 return jsonify({'error': 'Plik został zapisany, ale wydaje się pusty lub ma nieprawidłową strukturę.'}), 200
+            # Nowa wersja trafia do data/versions; Export.xlsx podmieniany dopiero po walidacji
+            path = save_data_file('export', file)
+            df_check, report = publish_data_file('export', path, file.filename)
+            if df_check is None:
+                os.remove(path)
+                return jsonify({'error': f"Plik odrzucony, kiosk nadal używa poprzedniej wersji: {report['error']}",
+                                'report': report}), 400
             
             return jsonify({
                 'success': True,
                 'message': f'Plik Export.xlsx został zaktualizowany ({len(df_check)} wierszy)',
-                'filename': 'Export.xlsx'
+                'filename': 'Export.xlsx',
+                'report': report
             })
         except Exception as e:
             return jsonify({'error': f'Błąd podczas zapisywania pliku: {str(e)}'}), 500
     
     return jsonify({'error': 'Niedozwolony typ pliku - wymagany plik .xlsx lub .xls'}), 400
 
-@app.route('/api/quiz/questions', methods=['GET'])
-def get_quiz_questions():
-    """Pobierz wszystkie pytania quizowe"""
+@app.route('/api/data-files', methods=['GET'])
+def get_data_files():
+    """Zachowane wersje plików danych (najnowsza publikacja pierwsza), ?dataset=export|jumbo"""
     if not session.get('authenticated'):
         return jsonify({'error': 'Brak autoryzacji'}), 401
     
-    csv_path = 'data/quiz_questions.csv'
+    dataset = request.args.get('dataset', 'export')
+    if dataset not in DATASET_SOURCES:
+        return jsonify({'error': 'Nieznany zbiór danych'}), 400
     
-    if not os.path.exists(csv_path):
-        return jsonify([])
+    conn = db_connect()
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(
+        "SELECT id, filename, original_name, size, rows, created_at, published_at FROM data_files "
+        "WHERE dataset=? ORDER BY published_at DESC", (dataset,)).fetchall()
+    conn.close()
+    
+    files = []
+    for i, row in enumerate(rows):
+        item = dict(row)
+        item['live'] = i == 0
+        item['published_at'] = datetime.fromtimestamp(row['published_at']).strftime('%Y-%m-%d %H:%M:%S')
+        files.append(item)
+    return jsonify(files)
+
+@app.route('/api/data-files/<int:file_id>/publish', methods=['POST'])
+def rollback_data_file(file_id):
+    """Przywróć wcześniejszą wersję pliku danych (ponowna walidacja i atomowa podmiana)"""
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+    
+    conn = db_connect()
+    row = conn.execute("SELECT dataset, filename, original_name FROM data_files WHERE id=?", (file_id,)).fetchone()
+    conn.close()
+    if row is None:
+        return jsonify({'error': 'Nie znaleziono wersji'}), 404
+    
+    dataset, filename, original_name = row
+    path = os.path.join(DATA_FILE_FOLDER, filename)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Plik wersji nie istnieje na dysku'}), 404
+    
+    try:
+        df, report = publish_data_file(dataset, path, original_name)
+    except Exception as e:
+        return jsonify({'error': f'Błąd podczas przywracania wersji: {str(e)}'}), 500
+    if df is None:
+        return jsonify({'error': f"Nie można przywrócić wersji: {report['error']}", 'report': report}), 400
     
+    return jsonify({
+        'success': True,
+        'message': f"Przywrócono {DATASET_SOURCES[dataset]} z {original_name or filename} ({len(df)} wierszy)",
+        'report': report
+    })
+
+@app.route('/api/ingest-reports', methods=['GET'])
+def get_ingest_reports():
+    """Raporty wczytywania plików Excel (najnowsze pierwsze), opcjonalnie ?dataset=export|jumbo"""
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+
+    dataset = request.args.get('dataset')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), INGEST_REPORT_KEEP)
+    conn = db_connect()
+    conn.row_factory = sqlite3.Row
+    if dataset:
+        rows = conn.execute("SELECT id, report, created_at FROM ingest_reports WHERE dataset=? "
+                            "ORDER BY id DESC LIMIT ?", (dataset, limit)).fetchall()
+    else:
+        rows = conn.execute("SELECT id, report, created_at FROM ingest_reports ORDER BY id DESC LIMIT ?",
+                            (limit,)).fetchall()
+    conn.close()
+
+    reports = []
+    for row in rows:
+        report = json.loads(row['report'])
+        report.update(id=row['id'], created_at=row['created_at'])
+        reports.append(report)
+    return jsonify(reports)
+
+@app.route('/api/quiz/questions', methods=['GET'])
+def get_quiz_questions():
+    """Pobierz wszystkie pytania quizowe"""
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+
     try:
-        questions = []
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for idx, row in enumerate(reader, start=1):
-                row['id'] = idx
-                questions.append(row)
-        return jsonify(questions)
+        conn = db_connect()
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(f"SELECT id, {', '.join(QUIZ_FIELDS)} FROM quiz_questions ORDER BY id").fetchall()
+        conn.close()
+        return jsonify([dict(row) for row in rows])
     except Exception as e:
         print(f"Błąd wczytywania pytań: {e}")
         return jsonify([])
@@ -825,134 +3262,271 @@ def add_quiz_question():
     """Dodaj nowe pytanie quizowe"""
     if not session.get('authenticated'):
         return jsonify({'error': 'Brak autoryzacji'}), 401
-    
+
     data = request.json or {}
-    csv_path = 'data/quiz_questions.csv'
-    
     try:
-        # Pobierz wszystkie istniejące pytania
-        questions = []
-        if os.path.exists(csv_path):
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f, delimiter=';')
-                for row in reader:
-                    questions.append(row)
-        
-        # Znajdź najwyższe ID
-        max_id = 0
-        for q in questions:
-            try:
-                max_id = max(max_id, int(q.get('id', 0)))
-            except:
-                pass
-        
-        new_id = max_id + 1
-        
-        # Dodaj nowe pytanie
-        new_question = {
-            'id': str(new_id),
-            'category': data.get('category', ''),
-            'question': data.get('question', ''),
-            'answer1': data.get('answer1', ''),
-            'answer2': data.get('answer2', ''),
-            'answer3': data.get('answer3', ''),
-            'answer4': data.get('answer4', ''),
-            'correct_index': str(data.get('correct_index', 1)),
-            'explanation': data.get('explanation', ''),
-            'start_date': data.get('start_date', ''),
-            'end_date': data.get('end_date', '')
-        }
-        
-        questions.append(new_question)
-        
-        # Zapisz wszystkie pytania
-        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-            fieldnames = ['id', 'category', 'question', 'answer1', 'answer2', 'answer3', 'answer4', 
-                         'correct_index', 'explanation', 'start_date', 'end_date']
-            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';')
-            writer.writeheader()
-            writer.writerows(questions)
-        
+        values = validate_quiz_question(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        conn = db_connect()
+        c = conn.cursor()
+        c.execute(f"INSERT INTO quiz_questions ({', '.join(QUIZ_FIELDS)}) VALUES ({', '.join('?' * len(QUIZ_FIELDS))})",
+                  values)
+        new_id = c.lastrowid
+        bump_quiz_version(c)
+        conn.commit()
+        conn.close()
+
         return jsonify({'success': True, 'id': new_id})
-        
+
     except Exception as e:
         print(f"Błąd dodawania pytania: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/quiz/question/<int:question_id>', methods=['DELETE'])
-def delete_quiz_question(question_id):
-    """Usuń pytanie quizowe"""
+@app.route('/api/quiz/question/<int:question_id>', methods=['DELETE'])
+def delete_quiz_question(question_id):
+    """Usuń pytanie quizowe (id pozostałych pytań się nie zmieniają)"""
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+
+    try:
+        conn = db_connect()
+        c = conn.cursor()
+        c.execute("DELETE FROM quiz_questions WHERE id=?", (question_id,))
+        deleted = c.rowcount
+        if deleted:
+            bump_quiz_version(c)
+        conn.commit()
+        conn.close()
+
+        if not deleted:
+            return jsonify({'error': 'Pytanie nie znalezione'}), 404
+        return jsonify({'success': True})
+
+    except Exception as e:
+        print(f"Błąd usuwania pytania: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/quiz/export', methods=['GET'])
+def export_quiz_questions():
+    """Pobierz wszystkie pytania jako plik CSV (do edycji w Excelu)"""
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+
+    return Response(export_quiz_csv(), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=quiz_questions.csv'})
+
+@app.route('/api/quiz/import', methods=['POST'])
+def import_quiz_questions():
+    """
+    Import pytań z pliku CSV (separator ';').
+    mode=append dodaje pytania, mode=replace zastępuje całą bazę pytań (z zachowaniem id z pliku).
+    Plik z błędami nie jest importowany wcale.
+    """
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+
+    file = request.files.get('csv_file')
+    if not file or file.filename == '':
+        return jsonify({'error': 'Nie wybrano pliku'}), 400
+
+    mode = request.form.get('mode', 'append')
+    if mode not in ('append', 'replace'):
+        return jsonify({'error': 'Nieprawidłowy tryb importu'}), 400
+
+    try:
+        text = file.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return jsonify({'error': 'Plik musi być zapisany w kodowaniu UTF-8 (CSV UTF-8 w Excelu)'}), 400
+
+    rows, errors = parse_quiz_csv(text)
+    if errors:
+        return jsonify({'error': 'Plik zawiera błędy - nic nie zaimportowano', 'details': errors[:20]}), 400
+    if not rows:
+        return jsonify({'error': 'Plik nie zawiera pytań'}), 400
+
+    conn = db_connect(timeout=30)
+    try:
+        # Cały import w jednej transakcji - kiosk widzi starą albo nową bazę pytań
+        conn.execute("BEGIN IMMEDIATE")
+        c = conn.cursor()
+        if mode == 'replace':
+            c.execute("DELETE FROM quiz_questions")
+        insert_quiz_questions(c, rows, keep_ids=(mode == 'replace'))
+        bump_quiz_version(c)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Błąd importu pytań: {e}")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+    return jsonify({'success': True, 'imported': len(rows), 'mode': mode})
+
+@app.route('/api/quiz/answer', methods=['POST'])
+def record_quiz_answer():
+    """Zapisz odpowiedź z kiosku (trafia do bufora, do bazy zapisywana partiami)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        question_id = int(data.get('question_id'))
+        answer_index = int(data.get('answer_index'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Brak id pytania lub numeru odpowiedzi'}), 400
+
+    question = get_quiz_index()['by_id'].get(question_id)
+    if question is None or not 0 <= answer_index < len(question['answers']):
+        return jsonify({'error': 'Nieznane pytanie lub odpowiedź'}), 400
+
+    is_correct = answer_index == question['correct_index']
+    quiz_answers.record(question_id, answer_index, is_correct)
+    return jsonify({'success': True, 'correct': is_correct}), 202
+
+@app.route('/api/quiz/stats', methods=['GET'])
+def get_quiz_stats():
+    """Statystyki odpowiedzi na pytania quizowe (per pytanie i dzień)"""
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+
+    # Dopisz do bazy to, co jeszcze czeka w buforze
+    try:
+        quiz_answers.flush()
+    except sqlite3.Error as e:
+        print(f"Błąd zapisu odpowiedzi quizu: {e}")
+
+    days = request.args.get('days', 30, type=int)
+    since = (date.today() - timedelta(days=max(days, 1) - 1)).isoformat()
+
+    conn = db_connect()
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute('''SELECT s.question_id, s.day, s.answers, s.correct,
+                                  s.answer1_count, s.answer2_count, s.answer3_count, s.answer4_count,
+                                  q.category, q.question
+                           FROM quiz_answer_stats s
+                           LEFT JOIN quiz_questions q ON q.id = s.question_id
+                           WHERE s.day >= ?
+                           ORDER BY s.day DESC, s.question_id''', (since,)).fetchall()
+    conn.close()
+
+    stats = []
+    for row in rows:
+        item = dict(row)
+        item['correct_pct'] = round(100.0 * row['correct'] / row['answers'], 1) if row['answers'] else 0
+        stats.append(item)
+    return jsonify({'stats': stats, 'pending': quiz_answers.pending, 'dropped': quiz_answers.dropped})
+
+@app.route('/api/profiling', methods=['GET'])
+def get_profiling():
+    """Uzbrojone trasy i zapisane profile (z podsumowaniem najdroższych funkcji)"""
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+
+    conn = db_connect()
+    conn.row_factory = sqlite3.Row
+    targets = conn.execute("SELECT route, remaining FROM profiling_targets WHERE remaining > 0 ORDER BY route").fetchall()
+    rows = conn.execute("SELECT id, route, method, path, status, duration_ms, summary, created_at "
+                        "FROM profiles ORDER BY id DESC").fetchall()
+    conn.close()
+
+    profiles = []
+    for row in rows:
+        item = dict(row)
+        item['summary'] = json.loads(row['summary'] or '[]')
+        profiles.append(item)
+    return jsonify({'targets': [dict(row) for row in targets], 'profiles': profiles})
+
+@app.route('/api/profiling/arm', methods=['POST'])
+def arm_profiling():
+    """Profiluj N kolejnych żądań do trasy (count=0 wyłącza)"""
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+
+    data = request.json or {}
+    route = data.get('route')
+    try:
+        count = int(data.get('count', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Nieprawidłowa liczba żądań'}), 400
+    if route not in profile_routes():
+        return jsonify({'error': 'Nieznana trasa'}), 400
+    if not 0 <= count <= 100:
+        return jsonify({'error': 'Liczba żądań musi być z zakresu 0-100'}), 400
+
+    conn = db_connect()
+    with conn:
+        conn.execute("INSERT INTO profiling_targets (route, remaining) VALUES (?, ?) "
+                     "ON CONFLICT (route) DO UPDATE SET remaining = excluded.remaining, "
+                     "created_at = CURRENT_TIMESTAMP", (route, count))
+    conn.close()
+    _armed_cache['expires'] = 0.0
+
+    return jsonify({'success': True, 'route': route, 'remaining': count})
+
+@app.route('/api/profiling/<int:profile_id>/download', methods=['GET'])
+def download_profile(profile_id):
+    """Pobierz plik .prof (pstats / snakeviz)"""
     if not session.get('authenticated'):
         return jsonify({'error': 'Brak autoryzacji'}), 401
-    
-    csv_path = 'data/quiz_questions.csv'
-    
-    if not os.path.exists(csv_path):
-        return jsonify({'error': 'Plik nie istnieje'}), 404
-    
+
+    conn = db_connect()
+    row = conn.execute("SELECT filename FROM profiles WHERE id=?", (profile_id,)).fetchone()
+    conn.close()
+    if row is None or not os.path.exists(os.path.join(PROFILE_FOLDER, row[0])):
+        return jsonify({'error': 'Profil nie znaleziony'}), 404
+
+    return send_from_directory(PROFILE_FOLDER, row[0], mimetype='application/octet-stream',
+                               as_attachment=True, max_age=0)
+
+@app.route('/api/profiling/<int:profile_id>', methods=['DELETE'])
+def delete_profile(profile_id):
+    """Usuń zapisany profil"""
+    if not session.get('authenticated'):
+        return jsonify({'error': 'Brak autoryzacji'}), 401
+
+    conn = db_connect()
+    row = conn.execute("SELECT filename FROM profiles WHERE id=?", (profile_id,)).fetchone()
+    if row is not None:
+        with conn:
+            conn.execute("DELETE FROM profiles WHERE id=?", (profile_id,))
+    conn.close()
+    if row is None:
+        return jsonify({'error': 'Profil nie znaleziony'}), 404
+
     try:
-        # Wczytaj wszystkie pytania
-        questions = []
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for row in reader:
-                questions.append(row)
-        
-        # Usuń pytanie o danym ID (ID to pozycja w liście, 1-indeksowany)
-        if 1 <= question_id <= len(questions):
-            questions.pop(question_id - 1)
-        else:
-            return jsonify({'error': 'Pytanie nie znalezione'}), 404
-        
-        # Zapisz pozostałe pytania z nowymi ID
-        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-            fieldnames = ['id', 'category', 'question', 'answer1', 'answer2', 'answer3', 'answer4', 
-                         'correct_index', 'explanation', 'start_date', 'end_date']
-            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';')
-            writer.writeheader()
-            
-            for idx, q in enumerate(questions, start=1):
-                q['id'] = str(idx)
-                writer.writerow(q)
-        
-        return jsonify({'success': True})
-        
-    except Exception as e:
-        print(f"Błąd usuwania pytania: {e}")
-        return jsonify({'error': str(e)}), 500
+        os.remove(os.path.join(PROFILE_FOLDER, row[0]))
+    except OSError:
+        pass
+    return jsonify({'success': True})
 
 @app.route('/api/chart-data')
 def chart_data():
     """Zwróć dane do wykresów dla konkretnej maszyny"""
     kod = request.args.get('kod', '1310')
     start_day = int(request.args.get('start_day', 1))
-    data = get_chart_data_for_machine(kod=kod, start_day=start_day)
-    return jsonify(data)
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ROLLUP_GRANULARITIES:
+        return jsonify({'error': 'Dozwolone granularity: day, week, month'}), 400
+    if granularity != 'day':
+        return serve_rollup_series(str(kod), granularity)
+    return serve_chart_payload('export', ('chart-data', str(kod), start_day),
+                               lambda df_long: build_chart_data(df_long, kod, start_day))
 
 @app.route('/api/machines')
 def get_machines():
     """Zwróć listę dostępnych maszyn z Export.xlsx"""
     try:
-        df_long = load_long()
-        if df_long.empty:
-            return jsonify([])
-        
-        # Pobierz unikalne maszyny (kod + nazwa)
-        maszyny_df = df_long[['Kod', 'Nazwa']].drop_duplicates().sort_values('Kod')
-        maszyny = []
-        for _, row in maszyny_df.iterrows():
-            kod = row['Kod']
-            nazwa = row['Nazwa']
-            if nazwa and str(nazwa).strip():
-                maszyny.append({'kod': kod, 'label': f"{kod} {nazwa}"})
-            else:
-                maszyny.append({'kod': kod, 'label': kod})
-        
-        return jsonify(maszyny)
+        return serve_store_value(('export', ('machines',)), lambda store: store.machines)
     except Exception as e:
         print(f"Błąd pobierania listy maszyn: {e}")
         return jsonify([])
 
+@app.route('/api/leaderboard')
+def get_leaderboard():
+    """Ranking brygad A/B/C i maszyn od początku miesiąca (liczony raz na wersję Export.xlsx)"""
+    return serve_store_value(('export', ('leaderboard',)), lambda store: store.leaderboard)
+
 @app.route('/api/slides')
 def slides():
     """Zwróć listę zdjęć do pokazu slajdów"""
@@ -968,7 +3542,11 @@ def api_inspirations():
 @app.route('/api/content')
 def get_content():
     """Zwróć całą treść dla strony głównej (dla auto-refresh)"""
-    conn = sqlite3.connect('kiosk.db')
+    return serve_payload(('content',), build_content)
+
+def build_content():
+    """Treść strony głównej: ustawienia, inspiracje, widoczność stron i slajdy"""
+    conn = db_connect()
     conn.row_factory = sqlite3.Row
     c = conn.cursor()
     
@@ -986,157 +3564,199 @@ def get_content():
     
     conn.close()
     
-    return jsonify({
+    return {
         'settings': settings_dict,
         'inspirations': inspirations_list,
         'visibility': visibility_dict,
         'chart_data': get_chart_data(),
         'slides': get_slide_images()
-    })
+    }
+
+@app.route('/api/events')
+def events_stream():
+    """
+    Strumień zdarzeń SSE dla kiosków.
+    Odpowiedź zawiera tylko zaległe zdarzenia i od razu się zamyka - przeglądarka sama
+    łączy się ponownie po czasie 'retry' z nagłówkiem Last-Event-ID. Dzięki temu
+    podłączony kiosk nie blokuje żadnego z wątków Waitress.
+    """
+    config = load_config()
+    retry_ms = int(config.get('sse_retry_ms', 5000))
+    raw_last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '')
+    chunks, _ = pending_sse_events(raw_last_id)
+
+    body = f"retry: {retry_ms}\n\n" + ''.join(chunks)
+    return Response(body, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # ==================== WYKRESY PLOTLY ====================
 
+def build_wykres_figure(df_long, kod, title):
+    """
+    Zbuduj figurę Plotly (słownik data/layout) dla maszyny - wykres kombinowany
+    (słupki dzienne + linie narastające). Nie wymaga importu plotly po stronie serwera,
+    wykres rysuje statyczny static/js/plotly.js w przeglądarce.
+    """
+    # Kolory dla brygad (słupki)
+    kolory_slupki = {'A': '#0ea5e9', 'B': '#FF6B35', 'C': '#6b7280'}  # niebieski, pomarańczowy, szary
+    kolory_linie = {'A': '#0284c7', 'B': '#f97316', 'C': '#4b5563'}  # ciemniejsze odcienie
+
+    df_maszyna = df_long[df_long['Kod'] == kod]
+    traces = []
+
+    # Słupki dla wartości dziennych (brygady A, B, C) - oś Y lewa
+    for brygada in ['A', 'B', 'C']:
+        mask = (df_maszyna['Typ'] == 'Dzienne') & (df_maszyna['Brygada'] == brygada)
+        filtered = df_maszyna[mask].sort_values('Dzien')
+        if not filtered.empty:
+            values = filtered['Wartosc'].tolist()
+            traces.append({
+                'type': 'bar',
+                'x': filtered['Dzien'].tolist(),
+                'y': values,
+                'name': brygada,
+                'marker': {'color': kolory_slupki.get(brygada, '#999999')},
+                'text': values,
+                'textposition': 'outside',
+                'texttemplate': '%{text:.0f}',
+                'yaxis': 'y'
+            })
+
+    # Linie dla wartości narastających (brygady A, B, C) - oś Y prawa
+    for brygada in ['A', 'B', 'C']:
+        mask = (df_maszyna['Typ'] == 'Narastające') & (df_maszyna['Brygada'] == brygada)
+        filtered = df_maszyna[mask].sort_values('Dzien')
+        if not filtered.empty:
+            kolor = kolory_linie.get(brygada, '#666666')
+            traces.append({
+                'type': 'scatter',
+                'x': filtered['Dzien'].tolist(),
+                'y': filtered['Wartosc'].tolist(),
+                'mode': 'lines+markers',
+                'name': f'Narastająco {brygada}',
+                'line': {'color': kolor, 'width': 2},
+                'marker': {'color': kolor, 'size': 6},
+                'yaxis': 'y2'
+            })
+
+    # Maksymalna wartość ze wszystkich danych dla synchronizacji osi Y (+10% marginesu)
+    max_value = int(df_maszyna['Wartosc'].max() * 1.1) if not df_maszyna.empty else 10000
+
+    layout = {
+        'title': {'text': title},
+        'xaxis': {'title': {'text': ''}, 'showgrid': True, 'gridcolor': '#e5e7eb', 'dtick': 1},
+        'yaxis': {'title': {'text': 'Produkcja dzienna'}, 'showgrid': True, 'gridcolor': '#e5e7eb',
+                  'side': 'left', 'range': [0, max_value]},
+        'yaxis2': {'title': {'text': 'Produkcja narastająca'}, 'showgrid': False, 'overlaying': 'y',
+                   'side': 'right', 'range': [0, max_value]},
+        'hovermode': 'x unified',
+        'plot_bgcolor': 'white',
+        'paper_bgcolor': 'white',
+        'barmode': 'group',
+        'showlegend': True,
+        'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': -0.2, 'xanchor': 'center', 'x': 0.5}
+    }
+    return {'data': traces, 'layout': layout}
+
 @app.route('/wykres')
 def wykres():
     """Strona z interaktywnym wykresem Plotly - wykres kombinowany (słupki + linie)"""
-    import plotly.graph_objects as go
-    from plotly.offline import plot
-    
-    df_long = load_long()
-    
-    # Pobierz unikalne wartości dla dropdown maszyn
-    if not df_long.empty:
-        # Utwórz listę maszyn (kod + nazwa)
-        maszyny_df = df_long[['Kod', 'Nazwa']].drop_duplicates().sort_values('Kod')
-        maszyny = []
-        for _, row in maszyny_df.iterrows():
-            kod = row['Kod']
-            nazwa = row['Nazwa']
-            if nazwa and nazwa.strip():
-                maszyny.append({'kod': kod, 'label': f"{kod} {nazwa}"})
-            else:
-                maszyny.append({'kod': kod, 'label': kod})
-        
+    store = data_store()
+
+    if store.machines:
+        maszyny = store.machines
+
         # Domyślna maszyna
-        default_kod = maszyny[0]['kod'] if maszyny else ''
-        default_nazwa = maszyny[0]['label'] if maszyny else ''
-        
-        # Wygeneruj początkowy wykres kombinowany
-        fig = go.Figure()
-        
-        # Kolory dla brygad (słupki)
-        kolory_slupki = {'A': '#0ea5e9', 'B': '#FF6B35', 'C': '#6b7280'}  # niebieski, pomarańczowy, szary
-        kolory_linie = {'A': '#0284c7', 'B': '#f97316', 'C': '#4b5563'}  # ciemniejsze odcienie
-        
-        # Dodaj słupki dla wartości dziennych (brygady A, B, C) - oś Y lewa
-        for brygada in ['A', 'B', 'C']:
-            mask = (df_long['Typ'] == 'Dzienne') & (df_long['Kod'] == default_kod) & (df_long['Brygada'] == brygada)
-            filtered = df_long[mask].copy().sort_values('Dzien')
-            
-            if not filtered.empty:
-                fig.add_trace(go.Bar(
-                    x=filtered['Dzien'].tolist(),
-                    y=filtered['Wartosc'].tolist(),
-                    name=brygada,
-                    marker_color=kolory_slupki.get(brygada, '#999999'),
-                    text=filtered['Wartosc'].tolist(),
-                    textposition='outside',
-                    texttemplate='%{text:.0f}',
-                    yaxis='y'
-                ))
-        
-        # Dodaj linie dla wartości narastających (brygady A, B, C) - oś Y prawa
-        for brygada in ['A', 'B', 'C']:
-            mask = (df_long['Typ'] == 'Narastające') & (df_long['Kod'] == default_kod) & (df_long['Brygada'] == brygada)
-            filtered = df_long[mask].copy().sort_values('Dzien')
-            
-            if not filtered.empty:
-                fig.add_trace(go.Scatter(
-                    x=filtered['Dzien'].tolist(),
-                    y=filtered['Wartosc'].tolist(),
-                    mode='lines+markers',
-                    name=f'Narastająco {brygada}',
-                    line=dict(color=kolory_linie.get(brygada, '#666666'), width=2),
-                    marker=dict(color=kolory_linie.get(brygada, '#666666'), size=6),
-                    yaxis='y2'
-                ))
-        
-        # Dodaj linie Cel 0 i Cel 100 (opcjonalnie)
-        # Na razie pominięte - można dodać później jeśli potrzebne
-        
-        # Oblicz maksymalną wartość ze wszystkich danych dla synchronizacji osi Y
-        mask_all = df_long['Kod'] == default_kod
-        if mask_all.any():
-            max_value = df_long[mask_all]['Wartosc'].max()
-            max_value = int(max_value * 1.1)  # Dodaj 10% marginesu
-        else:
-            max_value = 10000  # Wartość domyślna
-        
-        fig.update_layout(
-            title=default_nazwa,
-            xaxis_title='',
-            hovermode='x unified',
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            barmode='group',
-            showlegend=True,
-            legend=dict(
-                orientation='h',
-                yanchor='bottom',
-                y=-0.2,
-                xanchor='center',
-                x=0.5
-            ),
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='#e5e7eb',
-                dtick=1
-            ),
-            yaxis=dict(
-                title='Produkcja dzienna',
-                showgrid=True,
-                gridcolor='#e5e7eb',
-                side='left',
-                range=[0, max_value]
-            ),
-            yaxis2=dict(
-                title='Produkcja narastająca',
-                showgrid=False,
-                overlaying='y',
-                side='right',
-                range=[0, max_value]
-            )
-        )
-        
-        # Generuj HTML wykresu z w pełni osadzoną biblioteką Plotly (inline)
-        plot_html = plot(fig, output_type='div', include_plotlyjs=True)
-        
+        default_kod = maszyny[0]['kod']
+        default_nazwa = maszyny[0]['label']
+
+        # Do strony trafia tylko JSON figury (liczony raz na migawkę) - biblioteka Plotly ładowana jest ze static/js
+        figure_json = store.payload('export', ('wykres-figure', default_kod),
+                                    lambda df_long: htmlsafe_json_dumps(build_wykres_figure(df_long, default_kod, default_nazwa)))
     else:
         maszyny = []
         default_kod = ''
         default_nazwa = ''
-        plot_html = '<div class="text-center text-gray-600 p-8">Brak danych - proszę dodać plik Export.xlsx</div>'
-    
+        figure_json = None
+
     return render_template('wykres.html',
                          maszyny=maszyny,
                          default_kod=default_kod,
                          default_nazwa=default_nazwa,
-                         plot_html=plot_html)
+                         figure_json=figure_json)
 
 @app.route('/api/series')
 def api_series():
     """Zwróć dane wszystkich serii dla wykresu kombinowanego w formacie JSON"""
     # Pobierz kod maszyny z query string
     kod = request.args.get('kod', '')
-    
-    df_long = load_long()
-    
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ROLLUP_GRANULARITIES:
+        return jsonify({'error': 'Dozwolone granularity: day, week, month'}), 400
+    if granularity != 'day':
+        return serve_rollup_series(kod, granularity)
+    return serve_chart_payload('export', ('series', kod), lambda df_long: build_series_data(df_long, kod))
+
+def serve_rollup_series(kod, granularity):
+    """Seria tygodniowa/miesięczna z gotowego zestawienia migawki (koszt jak widok dzienny)"""
+    return serve_chart_payload('export', ('series', kod, granularity),
+                               lambda df_long: build_rollup_series(df_long, data_store().rollup(granularity),
+                                                                   kod, granularity))
+
+def build_rollup_series(df_long, rollup, kod, granularity):
+    """
+    Wykres kombinowany w ujęciu tygodni lub miesiąca: słupki - średnia dni z danymi
+    (dodatkowo 'total' i 'days' na okres), linie - wartość narastająca na koniec okresu
+    """
+    result = {'series': [], 'kod': kod, 'nazwa': '', 'granularity': granularity}
+    if df_long.empty or rollup is None or kod not in rollup.index.get_level_values('Kod'):
+        return result
+    result['nazwa'] = df_long.loc[df_long['Kod'] == kod, 'Nazwa'].iloc[0]
+
+    machine = rollup.xs(kod, level='Kod')
+    periods = sorted(int(p) for p in machine.index.get_level_values('Okres').unique())
+    last_day = int(df_long['Dzien'].max())
+    if granularity == 'week':
+        labels = [f"Tydz. {p} ({7 * p - 6}-{min(7 * p, last_day)})" for p in periods]
+    else:
+        labels = ['Miesiąc']
+
+    kolory_slupki = {'A': '#0ea5e9', 'B': '#FF6B35', 'C': '#6b7280'}
+    kolory_linie = {'A': '#0284c7', 'B': '#f97316', 'C': '#4b5563'}
+    for brygada in ['A', 'B', 'C']:
+        if brygada not in machine.index.get_level_values('Brygada'):
+            continue
+        rows = machine.xs(brygada, level='Brygada').reindex(periods)
+        result['series'].append({
+            'type': 'bar',
+            'name': brygada,
+            'x': labels,
+            'y': [round(float(v), 0) for v in rows['srednia'].fillna(0)],
+            'total': [round(float(v), 0) for v in rows['suma'].fillna(0)],
+            'days': [int(v) for v in rows['dni'].fillna(0)],
+            'color': kolory_slupki.get(brygada, '#999999'),
+            'yaxis': 'y'
+        })
+        result['series'].append({
+            'type': 'line',
+            'name': f'Narastająco {brygada}',
+            'x': labels,
+            'y': [round(float(v), 0) for v in rows['narastajaco'].fillna(0)],
+            'color': kolory_linie.get(brygada, '#666666'),
+            'yaxis': 'y2'
+        })
+    # Kolejność jak w widoku dziennym: najpierw słupki, potem linie
+    result['series'].sort(key=lambda s: s['type'] != 'bar')
+    return result
+
+def build_series_data(df_long, kod):
+    """Serie wykresu kombinowanego dla maszyny (słupki dzienne + linie narastające brygad A, B, C)"""
     if df_long.empty or not kod:
-        return jsonify({
+        return {
             'series': [],
             'kod': kod,
             'nazwa': ''
-        })
+        }
     
     # Pobierz nazwę maszyny
     maszyna_df = df_long[df_long['Kod'] == kod][['Nazwa']].drop_duplicates()
@@ -1199,36 +3819,14 @@ def api_series():
             'yaxis': 'y2'
         })
     
-    return jsonify({
+    return {
         'series': series_data,
         'kod': kod,
         'nazwa': nazwa
-    })
+    }
 
 # ==================== URUCHOMIENIE APLIKACJI ====================
 
-def load_jumbo():
-    """Wczytaj dane z pliku Jumbo.xlsx"""
-    try:
-        df = pd.read_excel('Jumbo.xlsx', engine='openpyxl')
-        
-        # Standaryzacja nazw kolumn - usuwamy białe znaki
-        df.columns = [str(c).strip() for c in df.columns]
-        
-        # Konwersja mtf_report_date (jeśli to serial Excela)
-        if 'mtf_report_date' in df.columns:
-            # Sprawdź czy to liczby (serial Excela)
-            if pd.api.types.is_numeric_dtype(df['mtf_report_date']):
-                # Konwersja seriala Excela (start od 1899-12-30 dla openpyxl/pandas)
-                df['mtf_report_date'] = pd.to_datetime(df['mtf_report_date'], unit='D', origin='1899-12-30')
-            else:
-                df['mtf_report_date'] = pd.to_datetime(df['mtf_report_date'], errors='coerce')
-        
-        return df
-    except Exception as e:
-        print(f"Błąd wczytywania Jumbo.xlsx: {e}")
-        return pd.DataFrame()
-
 @app.route('/api/jumbo-data')
 def get_jumbo_data():
     """API dla wykresu wydajności z Jumbo.xlsx (Poprawiona logika: bez sumowania, obsługa None)"""
@@ -1236,91 +3834,599 @@ def get_jumbo_data():
         segments_selected = request.args.getlist('segments[]')
         if not segments_selected:
             segments_selected = ["Amazon", "Reszta"]
-        
-        # Kod używa bezpośrednio pd.read_excel
-        df = pd.read_excel("Jumbo.xlsx")
-        if df.empty:
-            return jsonify({'series': []})
-
-        # 1. Konwersja typów (z zachowaniem NaN)
-        df["Dzień"] = pd.to_datetime(df["Dzień"], dayfirst=True, errors='coerce')
-        df["Prędkość dzienna [m2/wh]"] = pd.to_numeric(df["Prędkość dzienna [m2/wh]"], errors="coerce")
-        df["Narastająca prędkość [m2/wh]"] = pd.to_numeric(df["Narastająca prędkość [m2/wh]"], errors="coerce")
-        
-        # Usuwamy tylko wiersze bez daty
-        df = df.dropna(subset=["Dzień"])
-        
-        # 2. Filtrowanie: Respektujemy wybór brygady z dropdownu
-        # Jeśli brygada == "All", używamy tylko wierszy z Brygada == "All"
-        # Jeśli brygada != "All", używamy tylko wierszy konkretnej brygady (A, B lub C)
         brygada_selected = request.args.get('brygada', 'All')
-        filtered = df[(df["Segment"].isin(segments_selected)) & (df["Brygada"] == brygada_selected)]
         
-        # 3. Sortowanie i usunięcie ograniczenia do ostatnich 14 dni
-        filtered = filtered.sort_values("Dzień")
-        
-        if filtered.empty:
-            return jsonify({'series': [], 'days': []})
+        # Dane z Jumbo.xlsx z gotowymi typami (współdzielona migawka, patrz load_jumbo)
+        return serve_chart_payload('jumbo', ('jumbo-data', tuple(segments_selected), brygada_selected),
+                                   lambda df: build_jumbo_series(df, segments_selected, brygada_selected))
+    except Exception as e:
+        print(f"Błąd API jumbo: {e}")
+        return jsonify({'series': [], 'error': str(e)})
 
-        # 4. Przygotowanie osi X
-        unique_days = sorted(filtered["Dzień"].unique())
-        unique_days_str = [d.strftime('%d.%m.%Y') for d in pd.to_datetime(unique_days)]
-        
-        # Pobieramy day_index dla każdego unikalnego dnia (powinien być ten sam dla wszystkich segmentów w danym dniu)
-        day_indices = []
-        for d in unique_days:
-            idx_val = filtered[filtered["Dzień"] == d]["day_index"].iloc[0]
-            day_indices.append(int(idx_val))
+def build_jumbo_series(df, segments_selected, brygada_selected):
+    """Serie wykresu wydajności (prędkość dzienna i narastająca) dla wybranych segmentów i brygady"""
+    import pandas as pd
+    
+    # 1. Brak danych w Jumbo.xlsx
+    if df.empty:
+        return {'series': []}
+    
+    # 2. Filtrowanie: Respektujemy wybór brygady z dropdownu
+    # Jeśli brygada == "All", używamy tylko wierszy z Brygada == "All"
+    # Jeśli brygada != "All", używamy tylko wierszy konkretnej brygady (A, B lub C)
+    filtered = df[(df["Segment"].isin(segments_selected)) & (df["Brygada"] == brygada_selected)]
+    
+    # 3. Sortowanie i usunięcie ograniczenia do ostatnich 14 dni
+    filtered = filtered.sort_values("Dzień")
+    
+    if filtered.empty:
+        return {'series': [], 'days': []}
 
-        series_data = []
-        kolory_slupki = {'Amazon': '#004E89', 'Reszta': '#15803d'}
-        kolory_narastajace = {'Amazon': '#FF6B35', 'Reszta': '#38bdf8'}
-        
-        for segment in segments_selected:
-            seg_df = filtered[filtered["Segment"] == segment]
-            
-            seg_data_daily = []
-            seg_data_cum = []
-            
-            for d in unique_days:
-                day_df = seg_df[seg_df["Dzień"] == d]
-                if not day_df.empty:
-                    # Bierzemy pierwszy (i jedyny dla All) wiersz - brak sumowania!
-                    val_daily = day_df["Prędkość dzienna [m2/wh]"].iloc[0]
-                    val_cum = day_df["Narastająca prędkość [m2/wh]"].iloc[0]
-                    
-                    seg_data_daily.append(float(val_daily) if pd.notnull(val_daily) else None)
-                    seg_data_cum.append(float(val_cum) if pd.notnull(val_cum) else None)
-                else:
-                    seg_data_daily.append(None)
-                    seg_data_cum.append(None)
-                    
-            if any(v is not None for v in seg_data_daily) or any(v is not None for v in seg_data_cum):
-                # Dzienna
-                series_data.append({
-                    'type': 'bar',
-                    'name': f'{segment} – dzienna',
-                    'data': [round(v, 0) if v is not None else None for v in seg_data_daily],
-                    'color': kolory_slupki.get(segment, '#999'),
-                    'yaxis': 'y1'
-                })
-                # Narastająca
-                series_data.append({
-                    'type': 'line',
-                    'name': f'{segment} – narastająca',
-                    'data': [round(v, 0) if v is not None else None for v in seg_data_cum],
-                    'color': kolory_narastajace.get(segment, '#666'),
-                    'yaxis': 'y2'
-                })
+    # 4. Przygotowanie osi X
+    unique_days = sorted(filtered["Dzień"].unique())
+    unique_days_str = pd.to_datetime(unique_days).strftime('%d.%m.%Y').tolist()
+    
+    # Pierwszy wiersz każdej pary segment/dzień - brak sumowania! (dla All i tak jest jeden)
+    first_rows = filtered.drop_duplicates(["Segment", "Dzień"])
+    # day_index dla każdego unikalnego dnia (ten sam dla wszystkich segmentów w danym dniu)
+    day_indices = [int(v) for v in first_rows.drop_duplicates("Dzień")["day_index"]]
+    by_segment = first_rows.set_index(["Segment", "Dzień"])
 
-        return jsonify({
-            'series': series_data,
-            'days': unique_days_str,
-            'day_indices': day_indices
-        })
+    series_data = []
+    kolory_slupki = {'Amazon': '#004E89', 'Reszta': '#15803d'}
+    kolory_narastajace = {'Amazon': '#FF6B35', 'Reszta': '#38bdf8'}
+    
+    for segment in segments_selected:
+        if segment not in by_segment.index.get_level_values("Segment"):
+            continue
+        # Całe kolumny na oś dni naraz; brak dnia lub wartości -> None
+        seg_df = by_segment.xs(segment, level="Segment").reindex(unique_days)
+        seg_data_daily = seg_df["Prędkość dzienna [m2/wh]"].astype(float).round(0)
+        seg_data_cum = seg_df["Narastająca prędkość [m2/wh]"].astype(float).round(0)
+                
+        if seg_data_daily.notna().any() or seg_data_cum.notna().any():
+            # Dzienna
+            series_data.append({
+                'type': 'bar',
+                'name': f'{segment} – dzienna',
+                'data': seg_data_daily.astype(object).where(seg_data_daily.notna(), None).tolist(),
+                'color': kolory_slupki.get(segment, '#999'),
+                'yaxis': 'y1'
+            })
+            # Narastająca
+            series_data.append({
+                'type': 'line',
+                'name': f'{segment} – narastająca',
+                'data': seg_data_cum.astype(object).where(seg_data_cum.notna(), None).tolist(),
+                'color': kolory_narastajace.get(segment, '#666'),
+                'yaxis': 'y2'
+            })
+
+    return {
+        'series': series_data,
+        'days': unique_days_str,
+        'day_indices': day_indices
+    }
+
+# ==================== OBRAZY WYKRESÓW (SVG / PNG) ====================
+#
+# Dla słabszych terminali wykresy /api/series i /api/jumbo-data są renderowane
+# na serwerze do statycznego obrazka. Obrazki trafiają do cache/charts pod nazwą
+# zawierającą parametry wykresu i wersję danych, więc wszystkie procesy korzystają
+# z tych samych plików, a po uploadzie domyślne warianty generuje wątek w tle.
+
+CHART_IMAGE_FOLDER = os.path.join(SNAPSHOT_FOLDER, 'charts')
+CHART_IMAGE_DATASETS = {'series': 'export', 'jumbo': 'jumbo'}
+CHART_IMAGE_MIMETYPES = {'svg': 'image/svg+xml', 'png': 'image/png'}
+CHART_IMAGE_SIZE = (1280, 720)
+CHART_JUMBO_VARIANTS = [['Amazon', 'Reszta'], ['Amazon'], ['Reszta']]
+CHART_BRYGADY = ['All', 'A', 'B', 'C']
+
+_chart_fonts = {}
+
+def _format_tick(value):
+    """Etykieta osi z separatorem tysięcy (spacja)"""
+    return f"{value:,.0f}".replace(',', ' ')
+
+def _nice_max(value):
+    """Zaokrąglij maksimum osi w górę do 'ładnej' wartości (1, 2, 2.5, 5 x 10^n)"""
+    if not value or value <= 0:
+        return 10
+    exponent = 10 ** (len(str(int(value))) - 1)
+    for step in (1, 2, 2.5, 5, 10):
+        if value <= step * exponent:
+            return step * exponent
+    return 10 * exponent
+
+def chart_image_spec(chart, params, df):
+    """
+    Zamień dane wykresu na wspólny opis: tytuł, kategorie osi X
+    i serie {'type', 'name', 'color', 'axis', 'values'}
+    """
+    if chart == 'series':
+        data = build_series_data(df, params['kod'])
+        title = f"{data['kod']} {data['nazwa']}".strip()
+        categories = [str(day) for day in data['series'][0]['x']] if data['series'] else []
+        series = [{'type': s['type'], 'name': s['name'], 'color': s['color'],
+                   'axis': s['yaxis'], 'values': s['y']} for s in data['series']]
+    else:
+        data = build_jumbo_series(df, params['segments'], params['brygada'])
+        title = f"Wydajność {', '.join(params['segments'])} – brygada {params['brygada']}"
+        categories = data.get('days', [])
+        series = [{'type': s['type'], 'name': s['name'], 'color': s['color'],
+                   'axis': 'y' if s['yaxis'] == 'y1' else 'y2', 'values': s['data']} for s in data['series']]
+    return {'title': title, 'categories': categories, 'series': series}
+
+def chart_image_shapes(spec, width, height):
+    """
+    Rozmieść wykres na płótnie - zwraca listę prostych kształtów
+    (rect, line, circle, text) wspólną dla SVG i PNG
+    """
+    left, right, top, bottom = 90, 90, 60, 110
+    plot_w, plot_h = width - left - right, height - top - bottom
+    shapes = [('text', width / 2, 36, spec['title'], 22, '#111827', 'middle')]
+
+    categories = spec['categories']
+    if not categories or not spec['series']:
+        shapes.append(('text', width / 2, height / 2, 'Brak danych', 20, '#6b7280', 'middle'))
+        return shapes
+
+    # Osobna skala dla osi lewej (y) i prawej (y2)
+    axis_max = {}
+    for axis in ('y', 'y2'):
+        values = [v for s in spec['series'] if s['axis'] == axis for v in s['values'] if v is not None]
+        axis_max[axis] = _nice_max(max(values) if values else 0)
+
+    def to_y(value, axis):
+        return top + plot_h - (value / axis_max[axis]) * plot_h
+
+    # Siatka i etykiety osi Y
+    ticks = 5
+    for i in range(ticks + 1):
+        y = top + plot_h - plot_h * i / ticks
+        shapes.append(('line', [(left, y), (left + plot_w, y)], '#e5e7eb', 1))
+        shapes.append(('text', left - 10, y + 5, _format_tick(axis_max['y'] * i / ticks), 13, '#374151', 'end'))
+        if any(s['axis'] == 'y2' for s in spec['series']):
+            shapes.append(('text', left + plot_w + 10, y + 5, _format_tick(axis_max['y2'] * i / ticks),
+                           13, '#374151', 'start'))
+
+    band = plot_w / len(categories)
+    # Co która etykieta osi X, aby się nie nakładały (ok. 8 px na znak)
+    label_width = max(len(label) for label in categories) * 8 + 16
+    label_step = max(1, -(-len(categories) * label_width // plot_w))
+    for i, label in enumerate(categories):
+        if i % label_step == 0:
+            shapes.append(('text', left + band * (i + 0.5), top + plot_h + 22, label, 13, '#374151', 'middle'))
+
+    # Słupki - grupowane w obrębie dnia
+    bars = [s for s in spec['series'] if s['type'] == 'bar']
+    bar_w = band * 0.8 / max(len(bars), 1)
+    for n, s in enumerate(bars):
+        for i, value in enumerate(s['values']):
+            if value is None or value <= 0:
+                continue
+            x = left + band * i + band * 0.1 + bar_w * n
+            y = to_y(value, s['axis'])
+            shapes.append(('rect', x, y, bar_w, top + plot_h - y, s['color']))
+
+    # Linie - przerwane tam, gdzie brakuje wartości
+    for s in spec['series']:
+        if s['type'] != 'line':
+            continue
+        points = []
+        for i, value in enumerate(s['values'] + [None]):
+            if value is None:
+                if len(points) > 1:
+                    shapes.append(('line', points, s['color'], 2))
+                points = []
+                continue
+            point = (left + band * (i + 0.5), to_y(value, s['axis']))
+            points.append(point)
+            shapes.append(('circle', point[0], point[1], 3, s['color']))
+
+    shapes.append(('line', [(left, top + plot_h), (left + plot_w, top + plot_h)], '#9ca3af', 1))
+
+    # Legenda pod wykresem
+    items = [(s['name'], s['color']) for s in spec['series']]
+    item_widths = [24 + len(name) * 8 + 24 for name, _ in items]
+    x = max(left, (width - sum(item_widths)) / 2)
+    y = height - 30
+    for (name, color), item_w in zip(items, item_widths):
+        shapes.append(('rect', x, y - 12, 14, 14, color))
+        shapes.append(('text', x + 20, y, name, 14, '#111827', 'start'))
+        x += item_w
+    return shapes
+
+@timed('chart_render')
+def render_chart_svg(shapes, width, height):
+    """Zapisz kształty jako dokument SVG"""
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}" font-family="Roboto, Arial, sans-serif">',
+             f'<rect width="{width}" height="{height}" fill="white"/>']
+    for shape in shapes:
+        kind = shape[0]
+        if kind == 'rect':
+            _, x, y, w, h, color = shape
+            parts.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{w:.1f}" height="{h:.1f}" fill="{color}"/>')
+        elif kind == 'line':
+            _, points, color, line_w = shape
+            coords = ' '.join(f"{px:.1f},{py:.1f}" for px, py in points)
+            parts.append(f'<polyline points="{coords}" fill="none" stroke="{color}" stroke-width="{line_w}"/>')
+        elif kind == 'circle':
+            _, x, y, r, color = shape
+            parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{r}" fill="{color}"/>')
+        elif kind == 'text':
+            _, x, y, text, size, color, anchor = shape
+            parts.append(f'<text x="{x:.1f}" y="{y:.1f}" font-size="{size}" fill="{color}" '
+                         f'text-anchor="{anchor}">{html.escape(str(text))}</text>')
+    parts.append('</svg>')
+    return '\n'.join(parts).encode('utf-8')
+
+def _chart_font(size):
+    if size not in _chart_fonts:
+        try:
+            _chart_fonts[size] = ImageFont.truetype(os.path.join('static', 'fonts', 'roboto-regular.ttf'), size)
+        except OSError:
+            _chart_fonts[size] = ImageFont.load_default()
+    return _chart_fonts[size]
+
+@timed('chart_render')
+def render_chart_png(shapes, width, height):
+    """Narysuj kształty jako obraz PNG (wymaga pakietu Pillow)"""
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    anchors = {'start': 'ls', 'middle': 'ms', 'end': 'rs'}
+    for shape in shapes:
+        kind = shape[0]
+        if kind == 'rect':
+            _, x, y, w, h, color = shape
+            draw.rectangle([x, y, x + w, y + h], fill=color)
+        elif kind == 'line':
+            _, points, color, line_w = shape
+            draw.line(points, fill=color, width=line_w)
+        elif kind == 'circle':
+            _, x, y, r, color = shape
+            draw.ellipse([x - r, y - r, x + r, y + r], fill=color)
+        elif kind == 'text':
+            _, x, y, text, size, color, anchor = shape
+            draw.text((x, y), str(text), fill=color, font=_chart_font(size), anchor=anchors[anchor])
+    output = io.BytesIO()
+    image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+def chart_image_filename(chart, params, version, fmt):
+    """Nazwa pliku obrazka: wykres, hash parametrów i wersja danych"""
+    return f"{chart}-{_short_hash(params)}-v{version}.{fmt}"
+
+def get_chart_image(chart, params, fmt):
+    """Zwróć nazwę pliku (w CHART_IMAGE_FOLDER) z obrazkiem wykresu - renderuje tylko przy braku w cache"""
+    version, df = get_dataset_with_version(CHART_IMAGE_DATASETS[chart])
+    filename = chart_image_filename(chart, params, version, fmt)
+    path = os.path.join(CHART_IMAGE_FOLDER, filename)
+    if os.path.exists(path):
+        return filename
+    return single_flight.do('chart_image', filename, lambda: _render_chart_image(chart, params, df, fmt, path))
+
+def _render_chart_image(chart, params, df, fmt, path):
+    width, height = CHART_IMAGE_SIZE
+    shapes = chart_image_shapes(chart_image_spec(chart, params, df), width, height)
+    content = render_chart_svg(shapes, width, height) if fmt == 'svg' else render_chart_png(shapes, width, height)
+
+    os.makedirs(CHART_IMAGE_FOLDER, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return os.path.basename(path)
+
+def _remove_old_chart_images(chart, version):
+    """Usuń obrazki wykresu z wcześniejszych wersji danych"""
+    if not os.path.isdir(CHART_IMAGE_FOLDER):
+        return
+    for filename in os.listdir(CHART_IMAGE_FOLDER):
+        match = re.match(rf'^{chart}-[0-9a-f]+-v(\d+)\.', filename)
+        if match and int(match.group(1)) < version:
+            try:
+                os.remove(os.path.join(CHART_IMAGE_FOLDER, filename))
+            except OSError:
+                pass
+
+def render_default_chart_images(dataset):
+    """Wygeneruj obrazki domyślnych wariantów wykresów dla zbioru danych (po uploadzie)"""
+    formats = ['svg'] + (['png'] if Image is not None else [])
+    store = data_store()
+    version, df = store.dataset_version(dataset), store.frame(dataset)
+    if df.empty:
+        return
+    start = time.time()
+    count = 0
+    try:
+        if dataset == 'export':
+            chart = 'series'
+            variants = [{'kod': maszyna['kod']} for maszyna in store.machines]
+        else:
+            chart = 'jumbo'
+            variants = [{'segments': segments, 'brygada': brygada}
+                        for segments in CHART_JUMBO_VARIANTS for brygada in CHART_BRYGADY]
+        for params in variants:
+            for fmt in formats:
+                get_chart_image(chart, params, fmt)
+                count += 1
+        _remove_old_chart_images(chart, version)
+        print(f"🖼️ Obrazki wykresów ({dataset} v{version}): {count} w {time.time() - start:.1f} s")
     except Exception as e:
-        print(f"Błąd API jumbo: {e}")
-        return jsonify({'series': [], 'error': str(e)})
+        print(f"Błąd generowania obrazków wykresów ({dataset}): {e}")
+
+def schedule_chart_images(dataset):
+    """Uruchom generowanie obrazków wykresów w tle, aby nie opóźniać odpowiedzi na upload"""
+    threading.Thread(target=render_default_chart_images, args=(dataset,), daemon=True).start()
+
+@app.route('/api/chart-image/<chart>.<fmt>')
+def chart_image(chart, fmt):
+    """
+    Wykres jako obrazek dla słabszych terminali:
+    /api/chart-image/series.svg?kod=1310
+    /api/chart-image/jumbo.png?segments[]=Amazon&brygada=All
+    """
+    if chart not in CHART_IMAGE_DATASETS:
+        return jsonify({'error': 'Nieznany wykres'}), 404
+    if fmt not in CHART_IMAGE_MIMETYPES:
+        return jsonify({'error': 'Dozwolone formaty: svg, png'}), 400
+    if fmt == 'png' and Image is None:
+        return jsonify({'error': 'Format PNG wymaga pakietu Pillow'}), 501
+
+    if chart == 'series':
+        kod = request.args.get('kod', '')
+        if not kod:
+            return jsonify({'error': 'Brak kodu maszyny'}), 400
+        params = {'kod': kod}
+    else:
+        params = {'segments': request.args.getlist('segments[]') or ['Amazon', 'Reszta'],
+                  'brygada': request.args.get('brygada', 'All')}
+
+    try:
+        filename = get_chart_image(chart, params, fmt)
+    except Exception as e:
+        print(f"Błąd renderowania wykresu {chart}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    response = send_from_directory(CHART_IMAGE_FOLDER, filename, mimetype=CHART_IMAGE_MIMETYPES[fmt], max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# ==================== EKSPORT DANYCH (CSV / PARQUET) ====================
+#
+# Znormalizowane dane do analizy bez otwierania plików Excel:
+#   /api/export/long.csv|parquet  - Export.xlsx w formie długiej (Typ, Kod, Brygada, Dzien, Wartosc)
+#   /api/export/jumbo.csv|parquet - Jumbo.xlsx z typami kolumn
+#   /api/export/long-archive.*, /api/export/jumbo-archive.* - zbiory z wielu plików (ingest.py)
+# Odpowiedź jest generowana porcjami z migawki danych, więc cały plik nie powstaje w pamięci.
+# Parquet wymaga pakietu pyarrow (importowany dopiero przy pierwszym eksporcie).
+
+EXPORT_DATASETS = {'long': 'export', 'jumbo': 'jumbo',
+                   'long-archive': 'export_archive', 'jumbo-archive': 'jumbo_archive'}
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+EXPORT_CHUNK_ROWS = 5000
+
+def export_filter_mask(dataset, df, args):
+    """
+    Maska wierszy dla filtrów z query string (ValueError przy błędnej wartości):
+    kod, brygada (można powtarzać), Export: day_from/day_to, Jumbo: segment, date_from/date_to,
+    zbiory z wielu plików: plik
+    """
+    import pandas as pd
+
+    mask = pd.Series(True, index=df.index)
+    brygady = args.getlist('brygada')
+    if brygady:
+        mask &= df['Brygada'].isin(brygady)
+    pliki = args.getlist('plik')
+    if pliki and INGEST_PROVENANCE_COLUMN in df.columns:
+        mask &= df[INGEST_PROVENANCE_COLUMN].isin(pliki)
+    kody = args.getlist('kod')
+    if ARCHIVE_DATASETS.get(dataset, dataset) == 'export':
+        if kody:
+            mask &= df['Kod'].isin(kody)
+        if args.get('day_from'):
+            mask &= df['Dzien'] >= int(args['day_from'])
+        if args.get('day_to'):
+            mask &= df['Dzien'] <= int(args['day_to'])
+    else:
+        if kody:
+            mask &= df['Maszyna'].isin([float(kod) for kod in kody])
+        segments = args.getlist('segment')
+        if segments:
+            mask &= df['Segment'].isin(segments)
+        if args.get('date_from'):
+            mask &= df['Dzień'] >= pd.Timestamp(args['date_from'])
+        if args.get('date_to'):
+            mask &= df['Dzień'] <= pd.Timestamp(args['date_to'])
+    return mask
+
+def export_chunks(df, mask, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Wybrane wiersze porcjami po chunk_rows (kopiowana jest tylko bieżąca porcja)"""
+    import numpy as np
+
+    positions = np.flatnonzero(mask.to_numpy())
+    for start in range(0, len(positions), chunk_rows):
+        yield df.iloc[positions[start:start + chunk_rows]]
+
+def stream_csv(columns, chunks):
+    """CSV dla Excela (utf-8 z BOM, separator ';', przecinek dziesiętny) - porcja po porcji"""
+    yield ('\ufeff' + ';'.join(columns) + '\n').encode('utf-8')
+    for chunk in chunks:
+        yield chunk.to_csv(sep=';', decimal=',', header=False, index=False, date_format='%Y-%m-%d').encode('utf-8')
+
+class _ChunkSink(io.RawIOBase):
+    """Plik tylko do zapisu, z którego generator odbiera kolejne zapisane bajty"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+def stream_parquet(empty, chunks):
+    """Parquet - każda porcja to osobna grupa wierszy wysyłana zaraz po zapisaniu"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(empty, preserve_index=False)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    for chunk in chunks:
+        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+@app.route('/api/export/<name>.<fmt>')
+def export_data(name, fmt):
+    """
+    Strumieniowy eksport znormalizowanych danych, np.
+    /api/export/long.csv?kod=1310&brygada=A&day_from=1&day_to=14
+    /api/export/jumbo.parquet?segment=Amazon&date_from=2025-01-01
+    """
+    if name not in EXPORT_DATASETS:
+        return jsonify({'error': 'Dostępne zbiory: ' + ', '.join(EXPORT_DATASETS)}), 404
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({'error': 'Dozwolone formaty: csv, parquet'}), 400
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return jsonify({'error': 'Format Parquet wymaga pakietu pyarrow'}), 501
+
+    dataset = EXPORT_DATASETS[name]
+    # Ramka z migawki żądania - generator czyta ją także po podmianie danych przez upload
+    store = data_store()
+    version = store.dataset_version(dataset)
+    if not version:
+        return jsonify({'error': 'Brak danych - wczytaj pliki poleceniem python ingest.py <katalog|archiwum.zip>'}), 404
+    df = store.frame(dataset)
+    df = df[[column for column in df.columns if not str(column).startswith('Unnamed:')]]
+    try:
+        mask = export_filter_mask(dataset, df, request.args)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Nieprawidłowy filtr: {e}'}), 400
+
+    chunks = export_chunks(df, mask)
+    body = stream_csv(list(df.columns), chunks) if fmt == 'csv' else stream_parquet(df.iloc[:0], chunks)
+    filename = f"{'Export_long' if ARCHIVE_DATASETS.get(dataset, dataset) == 'export' else 'Jumbo'}"
+    filename += f"{'_archiwum' if dataset in ARCHIVE_DATASETS else ''}-v{version}.{fmt}"
+    return Response(body, mimetype=EXPORT_MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# ==================== ROZGRZEWANIE (WARM-UP) ====================
+#
+# Start w dwóch fazach: serwer od razu nasłuchuje i obsługuje strony oparte na SQLite
+# oraz pliki statyczne, a ciężkie rzeczy robi wątek w tle - import pandas/openpyxl,
+# kompilacja szablonów, wczytanie Export/Jumbo (migawki) i gotowe odpowiedzi wykresów.
+# Kiosk uruchomiony po zaniku prądu dostaje stronę od razu, a /api/ready mówi,
+# czy dane są już rozgrzane.
+
+_warmup = {'state': 'pending', 'started': None, 'finished': None, 'step': None, 'steps': {}, 'error': None}
+_warmup_lock = threading.Lock()
+
+def _warm_imports():
+    import pandas  # noqa: F401 - sam import jest rozgrzewką
+    import openpyxl  # noqa: F401
+
+def _warm_templates():
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+def _warm_export():
+    # Domyślny widok każdej maszyny (suwak na dniu 1, format kolumnowy kiosku) i dane wykresu kombinowanego
+    for maszyna in data_store().machines:
+        params = ('chart-data', maszyna['kod'], 1)
+        builder = lambda df, kod=maszyna['kod']: build_chart_data(df, kod, 1)
+        chart_payload('export', params + ('columnar',), columnar_builder('export', params, builder, 'columnar'))
+        chart_payload('export', ('series', maszyna['kod']),
+                      lambda df, kod=maszyna['kod']: build_series_data(df, kod))
+
+def _warm_jumbo():
+    get_dataset('jumbo')
+    for segments in CHART_JUMBO_VARIANTS:
+        for brygada in CHART_BRYGADY:
+            params = ('jumbo-data', tuple(segments), brygada)
+            builder = lambda df, s=segments, b=brygada: build_jumbo_series(df, s, b)
+            chart_payload('jumbo', params + ('columnar',), columnar_builder('jumbo', params, builder, 'columnar'))
+
+WARMUP_STEPS = [
+    ('imports', _warm_imports),
+    ('templates', _warm_templates),
+    ('export', _warm_export),
+    ('jumbo', _warm_jumbo),
+    ('chart_images', lambda: (render_default_chart_images('export'), render_default_chart_images('jumbo')))
+]
+
+def warm_up():
+    """Wykonaj kroki rozgrzewania po kolei; błąd kroku nie zatrzymuje pozostałych"""
+    _warmup.update(state='running', started=time.time())
+    errors = []
+    for name, step in WARMUP_STEPS:
+        _warmup['step'] = name
+        start = time.perf_counter()
+        try:
+            with timed_stage('warmup'):
+                step()
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+            print(f"⚠️ Rozgrzewanie - krok {name} nieudany: {e}")
+        _warmup['steps'][name] = round((time.perf_counter() - start) * 1000, 1)
+
+    _warmup.update(state='failed' if errors else 'ready', step=None, finished=time.time(),
+                   error='; '.join(errors) or None)
+    print(f"🔥 Rozgrzewanie zakończone w {_warmup['finished'] - _warmup['started']:.1f} s "
+          f"({', '.join(f'{name} {ms:.0f} ms' for name, ms in _warmup['steps'].items())})")
+
+def start_warm_up():
+    """Uruchom rozgrzewanie w tle (raz na proces)"""
+    with _warmup_lock:
+        if _warmup['state'] != 'pending':
+            return
+        _warmup['state'] = 'starting'
+    threading.Thread(target=warm_up, daemon=True, name='warm-up').start()
+
+@app.route('/api/ready')
+def readiness():
+    """
+    Stan rozgrzewania: 200 gdy dane gotowe, 503 w trakcie (serwer i tak już obsługuje żądania)
+    oraz po nieudanym rozgrzewaniu - load balancer nie kieruje ruchu do procesu bez danych;
+    przyczyna w polach 'failed' i 'error'
+    """
+    finished = _warmup['finished'] or time.time()
+    body = {
+        'ready': _warmup['state'] == 'ready',
+        'failed': _warmup['state'] == 'failed',
+        'state': _warmup['state'],
+        'step': _warmup['step'],
+        'steps_ms': dict(_warmup['steps']),
+        'elapsed_s': round(finished - _warmup['started'], 2) if _warmup['started'] else 0,
+        'error': _warmup['error'],
+        'pid': os.getpid()
+    }
+    response = jsonify(body)
+    if not body['ready']:
+        response.status_code = 503
+        if not body['failed']:
+            response.headers['Retry-After'] = '2'
+    return response
 
 if __name__ == '__main__':
     # Inicjalizuj bazę danych
@@ -1329,17 +4435,27 @@ if __name__ == '__main__':
     # Utwórz folder na zdjęcia jeśli nie istnieje
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
+    # Przygotuj zasoby statyczne z hashem w nazwie (plotly.js, chart.js, CSS, czcionki)
+    build_static_assets()
+    
     # Wymuś inicjalizację bazy przy starcie (dodatkowe zabezpieczenie)
     init_db()
     
+    server_config = get_server_config()
+    metrics.set('kiosk_server_threads', value=server_config['threads'])
+    
+    # Ciężkie importy i dane w tle - port otwiera się od razu
+    start_warm_up()
+    
     # Uruchom serwer produkcyjny Waitress
     print("=" * 60)
     print("🚀 Firmowy Kiosk - Aplikacja uruchomiona!")
     print("=" * 60)
-    print("📍 Adres lokalny: http://0.0.0.0:5000")
-    print("🔐 Panel admina: http://0.0.0.0:5000/admin")
+    print(f"📍 Adres lokalny: http://{server_config['host']}:{server_config['port']}")
+    print(f"🔐 Panel admina: http://{server_config['host']}:{server_config['port']}/admin")
     print("🔑 PIN administracyjny: 7456")
     print("=" * 60)
     
     # Bind do 0.0.0.0:5000 dla Replit
-    serve(app, host='0.0.0.0', port=5000, threads=4)
+    serve(app, host=server_config['host'], port=server_config['port'],
+          threads=server_config['threads'], connection_limit=server_config['connection_limit'])
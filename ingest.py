@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Firmowy Kiosk - wczytanie zaległych danych z wielu plików Export/Jumbo naraz
+
+Przyjmuje katalog (także z podkatalogami, np. zakład/miesiąc) albo archiwum .zip
+z plikami Export*.xlsx i Jumbo*.xlsx - po jednym na linię, miesiąc lub zakład.
+Pliki są parsowane równolegle w puli procesów (jeden plik = jeden rdzeń), łączone
+per zbiór z kolumną 'Plik' (nazwa pliku źródłowego) i publikowane jako migawki
+export_archive / jumbo_archive. Działający serwer podmienia je przy najbliższym
+żądaniu; dane są dostępne pod /api/export/long-archive.csv i jumbo-archive.csv
+(także .parquet, filtr ?plik=...). Raport każdego pliku widać w panelu admina.
+
+Uruchomienie:
+    python ingest.py zalegle/                       # katalog z plikami
+    python ingest.py zalegle-2025.zip --workers 8   # archiwum, 8 procesów
+    python ingest.py linia2/ --dataset export       # wszystkie .xlsx jako Export
+    python ingest.py zalegle/ --dry-run             # tylko sprawdzenie plików
+"""
+
+import argparse
+import sys
+import time
+
+from app import init_db, ingest_workbooks, DATASET_LOADERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Równoległe wczytanie wielu plików Export/Jumbo')
+    parser.add_argument('source', help='katalog lub archiwum .zip z plikami .xlsx')
+    parser.add_argument('--dataset', choices=sorted(DATASET_LOADERS),
+                        help='traktuj wszystkie pliki .xlsx jako ten zbiór (domyślnie wg nazwy pliku)')
+    parser.add_argument('--workers', type=int, default=None, help='liczba procesów (domyślnie liczba rdzeni)')
+    parser.add_argument('--dry-run', action='store_true', help='wczytaj i sprawdź pliki bez publikacji')
+    args = parser.parse_args()
+
+    init_db()
+    start = time.perf_counter()
+    try:
+        summary = ingest_workbooks(args.source, dataset=args.dataset, workers=args.workers,
+                                   publish=not args.dry_run)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    for name, result in summary.items():
+        print("=" * 60)
+        print(f"📦 {name}: {len(result['files'])} plików, {result['rows']} wierszy"
+              + (f", wersja {result['version']}" if result['version'] else " (bez publikacji)"))
+        for report in result['files']:
+            icon = {'ok': '✅', 'warning': '⚠️', 'error': '❌'}[report['status']]
+            detail = report['error'] or f"{report['info'].get('rows', 0)} wierszy"
+            print(f"  {icon} {report['filename']}: {detail} ({report['total_ms']:.0f} ms)")
+            failed += report['status'] == 'error'
+    print("=" * 60)
+    print(f"⏱️ Razem {elapsed:.1f} s" + (f", pliki z błędem: {failed}" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
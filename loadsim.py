@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+"""
+Firmowy Kiosk - symulator obciążenia (N kiosków zachowujących się jak main.js)
+
+Każdy symulowany kiosk:
+  1. ładuje stronę główną i wykonuje serię żądań startowych z initializeApp()
+     (/api/content, /api/machines, /api/chart-data, /api/inspirations,
+     /api/slides, /api/jumbo-data) i rejestruje service worker: /sw.js,
+     /api/manifest i pobranie wszystkich wpisów manifestu (sw.js),
+  2. co jakiś czas "przeciąga suwak dni" - każdy krok suwaka to osobne,
+     nieczekające na odpowiedź żądanie /api/chart-data (jak zdarzenie 'input'),
+  3. co 5 minut (z --sse co 30 minut) synchronizuje manifest i wykonuje
+     refreshContent(); z opcją --sse dodatkowo odpytuje /api/events jak EventSource
+     i po każdym zdarzeniu synchronizuje manifest i przeładowuje tylko to, o czym
+     informuje zdarzenie (jak eventHandlers w main.js); po przerwie w połączeniu
+     ponownie sprawdza manifest.
+Adresy z manifestu service worker serwuje z pamięci podręcznej - takie żądania
+nie trafiają do serwera. Bez https (kiosk po adresie IP) service worker nie działa -
+ten przypadek odtwarza opcja --no-service-worker.
+W połowie testu symulowany admin loguje się PIN-em i wgrywa Export.xlsx.
+
+Na koniec wypisuje przepustowość oraz opóźnienia p50/p95/p99 per trasa.
+Używa wyłącznie biblioteki standardowej.
+
+Uruchomienie (przy działającym serwerze):
+    python loadsim.py --kiosks 20 --duration 360
+    python loadsim.py --kiosks 50 --duration 120 --refresh-interval 30 --sse
+    python loadsim.py --kiosks 20 --duration 360 --sse --no-service-worker
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import secrets
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+BROWSER_CONNECTIONS = 6     # przeglądarka otwiera max 6 połączeń do jednego hosta
+DAY_SLIDER_RANGE = (1, 25)  # suwak dni w index.html
+# Jak w main.js: nawiasy [] bez kodowania - adres musi być identyczny z wpisem manifestu
+JUMBO_QUERY = 'segments[]=Amazon&segments[]=Reszta&brygada=All&format=columnar'
+
+
+class LatencyStats:
+    """Czasy odpowiedzi i błędy zbierane per trasa"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status is None or status >= 400:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return ({route: sorted(values) for route, values in self.latencies.items()},
+                    dict(self.errors), dict(self.statuses))
+
+
+def percentile(sorted_values, pct):
+    """Percentyl metodą najbliższej rangi (wartości posortowane rosnąco)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.4999)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class KioskClient:
+    """Klient HTTP z połączeniami keep-alive (jedno na wątek, jak w przeglądarce)"""
+
+    def __init__(self, base_url, stats, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 80
+        self.stats = stats
+        self.timeout = timeout
+        self.cookie = None
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def request(self, method, path, body=None, headers=None, route=None):
+        """Wykonaj żądanie i zapisz jego czas; zwraca (status, treść) albo (None, b'') przy błędzie"""
+        headers = dict(headers or {})
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        route = route or path.split('?', 1)[0]
+
+        start = time.perf_counter()
+        for attempt in (1, 2):
+            reused = getattr(self._local, 'conn', None) is not None
+            try:
+                conn = self._connection()
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                self._drop_connection()
+                # Serwer mógł zamknąć bezczynne połączenie - jedna ponowna próba na nowym
+                if attempt == 2 or not reused:
+                    self.stats.record(route, time.perf_counter() - start, None)
+                    return None, b''
+
+        self.stats.record(route, time.perf_counter() - start, response.status)
+        set_cookie = response.getheader('Set-Cookie')
+        if set_cookie:
+            cookie = SimpleCookie(set_cookie)
+            self.cookie = '; '.join(f'{name}={morsel.value}' for name, morsel in cookie.items())
+        return response.status, data
+
+    def get(self, path, route=None):
+        return self.request('GET', path, route=route)
+
+    def get_json(self, path, default=None):
+        status, data = self.get(path)
+        if status != 200:
+            return default
+        try:
+            return json.loads(data)
+        except ValueError:
+            return default
+
+
+class SimulatedKiosk:
+    """Jeden ekran kiosku - odtwarza kolejność i rytm żądań z main.js"""
+
+    def __init__(self, kiosk_id, args, stats, stop_event):
+        self.kiosk_id = kiosk_id
+        self.args = args
+        self.client = KioskClient(args.url, stats, timeout=args.timeout)
+        self.stop_event = stop_event
+        self.rng = random.Random(args.seed + kiosk_id)
+        self.pool = ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS,
+                                       thread_name_prefix=f'kiosk-{kiosk_id}')
+        self.machine = '1310'
+        self.start_day = 1
+        self.event_stream = None
+        # Stan service workera: adres -> wersja wpisu w pamięci podręcznej
+        self.service_worker = args.service_worker
+        self.sw_active = False
+        self.offline = {}
+        self.manifest_version = None
+        self._sync_lock = threading.Lock()
+
+    # --- Service worker (sw.js) ---
+
+    def fetch(self, path):
+        """Żądanie strony: wpis manifestu z pamięci service workera (bez sieci), reszta do serwera"""
+        if self.sw_active and path in self.offline:
+            return
+        self.client.get(path)
+
+    def _sync_manifest(self):
+        """syncManifest(): manifest z If-None-Match, potem tylko nowe i zmienione wpisy"""
+        with self._sync_lock:
+            headers = {'If-None-Match': f'"{self.manifest_version}"'} if self.manifest_version else {}
+            status, data = self.client.request('GET', '/api/manifest', headers=headers)
+            if status != 200:
+                return False
+            try:
+                manifest = json.loads(data)
+            except ValueError:
+                return False
+            if manifest.get('version') == self.manifest_version:
+                return False
+
+            cached, failed = {}, False
+            for entry in manifest.get('entries', []):
+                url, version = entry['url'], entry['version']
+                if url in self.offline and self.offline[url] == version:
+                    cached[url] = version
+                    continue
+                path = url.split('?', 1)[0]
+                # Pliki statyczne (slajdy, zasoby z hashem) w raporcie zbiorczo per katalog
+                route = os.path.dirname(path) + '/*' if path.startswith('/static/') else path
+                status, _ = self.client.get(url, route=route)
+                if status == 200:
+                    cached[url] = version
+                else:
+                    # Poprzednia odpowiedź zostaje w pamięci, wpis zostanie ponowiony
+                    failed = True
+                    if url in self.offline:
+                        cached[url] = None
+            self.offline = cached
+            self.manifest_version = None if failed else manifest.get('version')
+            return True
+
+    def install_service_worker(self):
+        """registerServiceWorker(): /sw.js, pierwsza synchronizacja (install), potem przejęcie strony"""
+        status, _ = self.client.get('/sw.js')
+        if status != 200:
+            return
+        self._sync_manifest()
+        self.sw_active = True
+
+    def sync_offline_cache(self):
+        """syncOfflineCache() z main.js - bez aktywnego service workera nic nie robi"""
+        if self.sw_active:
+            self._sync_manifest()
+
+    # --- Odpowiedniki funkcji z main.js ---
+
+    def load_chart_data(self, start_day=1):
+        self.fetch('/api/chart-data?' + urlencode({'kod': self.machine, 'start_day': start_day,
+                                                   'format': 'columnar'}))
+
+    def load_performance_data(self):
+        self.fetch('/api/jumbo-data?' + JUMBO_QUERY)
+
+    def initialize(self):
+        """initializeApp(): service worker, strona, treść, maszyny (+ wykres w tle), inspiracje, slajdy, wydajność"""
+        self.fetch('/')
+        if self.service_worker:
+            self.pool.submit(self.install_service_worker)
+        self.fetch('/api/content')
+        machines = self.client.get_json('/api/machines', default=[])
+        if machines:
+            self.machine = str(machines[0].get('kod', self.machine))
+            self.pool.submit(self.load_chart_data, self.start_day)
+        self.fetch('/api/inspirations')
+        self.fetch('/api/slides')
+        self.load_performance_data()
+
+    def refresh_content(self):
+        """refreshContent(): wykres (dzień 1, jak loadChartData z domyślnym startDay), inspiracje, slajdy, treść"""
+        self.load_chart_data()
+        self.fetch('/api/inspirations')
+        self.fetch('/api/slides')
+        self.fetch('/api/content')
+
+    def periodic_refresh(self):
+        """Odświeżanie z setInterval w initializeApp(): najpierw manifest, potem refreshContent()"""
+        self.sync_offline_cache()
+        self.refresh_content()
+
+    def slider_storm(self):
+        """Przeciągnięcie suwaka dni: każdy krok to żądanie wysłane bez czekania na poprzednie"""
+        target = self.rng.randint(*DAY_SLIDER_RANGE)
+        step = 1 if target >= self.start_day else -1
+        for day in range(self.start_day + step, target + step, step):
+            if self.stop_event.is_set():
+                return
+            self.start_day = day
+            self.pool.submit(self.load_chart_data, day)
+            time.sleep(self.rng.uniform(0.015, 0.05))
+
+    # --- Zdarzenia SSE ---
+
+    def _event_handlers(self):
+        return {
+            'settings': lambda: self.fetch('/api/content'),
+            'visibility': lambda: self.fetch('/api/content'),
+            'slides': lambda: self.fetch('/api/slides'),
+            'inspirations': lambda: self.fetch('/api/inspirations'),
+            'export-data': lambda: self.load_chart_data(self.start_day),
+            'jumbo-data': self.load_performance_data,
+            'reset': self.refresh_content
+        }
+
+    def _on_event(self, handler):
+        # Jak w connectEvents(): najpierw pamięć offline, aby handler nie dostał starej wersji
+        self.sync_offline_cache()
+        handler()
+
+    def listen_events(self):
+        """
+        Odpowiednik EventSource: /api/events z Last-Event-ID i ponowne połączenie po 'retry'.
+        Pod Waitress serwer oddaje zaległe zdarzenia i zamyka odpowiedź (krótkie odpytywanie),
+        pod serve_async.py połączenie trwa - oba przypadki obsługuje ta sama pętla.
+        """
+        handlers = self._event_handlers()
+        last_id = ''
+        retry = 3.0
+        # Jak w connectEvents(): zamknięcie po udanym połączeniu to zwykłe ponowne połączenie,
+        # przerwa to nieudana próba - dopiero po niej 'open' synchronizuje manifest
+        outage = False
+        while not self.stop_event.is_set():
+            conn = http.client.HTTPConnection(self.client.host, self.client.port, timeout=None)
+            self.event_stream = conn
+            headers = {'Accept': 'text/event-stream'}
+            if last_id:
+                headers['Last-Event-ID'] = last_id
+            start = time.perf_counter()
+            try:
+                conn.request('GET', '/api/events', headers=headers)
+                response = conn.getresponse()
+                self.client.stats.record('/api/events', time.perf_counter() - start, response.status)
+                if response.status != 200:
+                    outage = True
+                else:
+                    if outage:
+                        outage = False
+                        self.pool.submit(self.sync_offline_cache)
+                    event_type = None
+                    while not self.stop_event.is_set():
+                        line = response.readline()
+                        if not line:
+                            break
+                        line = line.decode('utf-8', 'replace').rstrip('\r\n')
+                        field, _, value = line.partition(':')
+                        value = value[1:] if value.startswith(' ') else value
+                        if field == 'event':
+                            event_type = value
+                        elif field == 'id':
+                            last_id = value
+                        elif field == 'retry' and value.isdigit():
+                            retry = int(value) / 1000.0
+                        elif not line:
+                            if event_type in handlers:
+                                self.pool.submit(self._on_event, handlers[event_type])
+                            event_type = None
+            except (OSError, http.client.HTTPException):
+                if not self.stop_event.is_set():
+                    self.client.stats.record('/api/events', time.perf_counter() - start, None)
+                    outage = True
+            finally:
+                conn.close()
+            self.stop_event.wait(retry)
+
+    def close_events(self):
+        conn = self.event_stream
+        if conn is not None and conn.sock is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    # --- Pętla kiosku ---
+
+    def run(self):
+        if self.stop_event.wait(self.rng.uniform(0, self.args.ramp_up)):
+            return
+        self.initialize()
+        if self.args.sse:
+            events = threading.Thread(target=self.listen_events, daemon=True,
+                                      name=f'kiosk-{self.kiosk_id}-events')
+            events.start()
+
+        now = time.monotonic()
+        next_refresh = now + self.args.refresh_interval
+        next_storm = now + self.rng.expovariate(1.0 / self.args.storm_interval)
+        while True:
+            wake_at = min(next_storm, next_refresh)
+            if self.stop_event.wait(max(0.0, wake_at - time.monotonic())):
+                break
+            now = time.monotonic()
+            if now >= next_storm:
+                self.slider_storm()
+                next_storm = time.monotonic() + self.rng.expovariate(1.0 / self.args.storm_interval)
+            if now >= next_refresh:
+                self.periodic_refresh()
+                next_refresh += self.args.refresh_interval
+
+        self.close_events()
+        if self.args.sse:
+            events.join()
+        self.pool.shutdown(wait=True)
+
+
+def run_admin_upload(args, stats, stop_event, log):
+    """Admin loguje się PIN-em i wgrywa Export.xlsx w trakcie testu"""
+    if stop_event.wait(args.upload_at):
+        return
+    with open(args.upload_file, 'rb') as f:
+        content = f.read()
+
+    client = KioskClient(args.url, stats, timeout=max(args.timeout, 120))
+    client.request('POST', '/admin', body=urlencode({'pin': args.pin}),
+                   headers={'Content-Type': 'application/x-www-form-urlencoded'})
+
+    boundary = secrets.token_hex(16)
+    body = (f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="excel_file"; filename="Export.xlsx"\r\n'
+            f'Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n'
+            ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    start = time.perf_counter()
+    status, data = client.request('POST', '/api/upload-excel', body=body,
+                                  headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    log.append((time.perf_counter() - start, status, data[:200].decode('utf-8', 'replace')))
+
+
+def print_report(stats, elapsed, upload_log):
+    latencies, errors, statuses = stats.snapshot()
+    total = sum(len(values) for values in latencies.values())
+
+    print()
+    print(f"Czas testu: {elapsed:.1f} s, żądań: {total}, przepustowość: {total / elapsed:.1f} req/s")
+    print("Kody odpowiedzi: " + ', '.join(f"{'błąd połączenia' if status is None else status}: {count}"
+                                          for status, count in sorted(statuses.items(), key=lambda item: str(item[0]))))
+    for seconds, status, message in upload_log:
+        print(f"Upload Export.xlsx: status {status}, {seconds * 1000:.0f} ms - {message}")
+    print()
+
+    header = f"{'Trasa':<28}{'żądań':>8}{'błędy':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    print(header)
+    print('-' * len(header))
+    for route, values in sorted(latencies.items(), key=lambda item: -len(item[1])):
+        print(f"{route:<28}{len(values):>8}{errors.get(route, 0):>7}{len(values) / elapsed:>8.1f}"
+              f"{percentile(values, 50) * 1000:>9.1f}{percentile(values, 95) * 1000:>9.1f}"
+              f"{percentile(values, 99) * 1000:>9.1f}{values[-1] * 1000:>9.1f}")
+
+
+def load_admin_pin():
+    try:
+        with open('config.json', 'r', encoding='utf-8') as f:
+            return json.load(f).get('admin_pin', '')
+    except (OSError, ValueError):
+        return ''
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Symulator obciążenia floty kiosków (zachowanie main.js)')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='adres serwera kiosku')
+    parser.add_argument('--kiosks', type=int, default=10, help='liczba symulowanych ekranów')
+    parser.add_argument('--duration', type=float, default=360, help='czas testu [s]')
+    parser.add_argument('--ramp-up', type=float, default=5,
+                        help='start kiosków rozłożony na tyle sekund (0 = wszystkie naraz, jak po zaniku prądu)')
+    parser.add_argument('--refresh-interval', type=float, default=None,
+                        help='odstęp refreshContent() [s] (main.js: 300, z SSE 1800)')
+    parser.add_argument('--storm-interval', type=float, default=60,
+                        help='średni odstęp między przeciągnięciami suwaka na jednym kiosku [s]')
+    parser.add_argument('--sse', action='store_true',
+                        help='kiosk słucha /api/events i odświeża się po zdarzeniach (pełne odświeżanie rzadziej)')
+    parser.add_argument('--no-service-worker', dest='service_worker', action='store_false',
+                        help='kiosk bez service workera (strona po http z adresu IP) - bez /api/manifest')
+    parser.add_argument('--upload-file', default='Export.xlsx', help='plik wgrywany przez admina')
+    parser.add_argument('--upload-at', type=float, default=None, help='moment uploadu [s] (domyślnie połowa testu)')
+    parser.add_argument('--no-upload', action='store_true', help='bez uploadu pliku przez admina')
+    parser.add_argument('--pin', default=None, help='PIN admina (domyślnie z config.json)')
+    parser.add_argument('--timeout', type=float, default=30, help='limit czasu pojedynczego żądania [s]')
+    parser.add_argument('--seed', type=int, default=1, help='ziarno losowania (powtarzalne scenariusze)')
+    args = parser.parse_args()
+    if args.refresh_interval is None:
+        args.refresh_interval = 1800 if args.sse else 300
+    if args.upload_at is None:
+        args.upload_at = args.duration / 2
+    if args.pin is None:
+        args.pin = load_admin_pin()
+    return args
+
+
+def main():
+    args = parse_args()
+    stats = LatencyStats()
+    stop_event = threading.Event()
+    upload_log = []
+
+    print(f"🚀 Symulacja {args.kiosks} kiosków na {args.url} przez {args.duration:.0f} s "
+          f"({'SSE, ' if args.sse else ''}odświeżanie co {args.refresh_interval:.0f} s, "
+          f"{'service worker' if args.service_worker else 'bez service workera'})")
+
+    threads = [threading.Thread(target=SimulatedKiosk(i, args, stats, stop_event).run, name=f'kiosk-{i}')
+               for i in range(args.kiosks)]
+    if not args.no_upload and os.path.exists(args.upload_file):
+        threads.append(threading.Thread(target=run_admin_upload, args=(args, stats, stop_event, upload_log),
+                                        name='admin'))
+    elif not args.no_upload:
+        print(f"⚠️ Brak pliku {args.upload_file} - test bez uploadu")
+
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    try:
+        stop_event.wait(args.duration)
+    except KeyboardInterrupt:
+        print("⏹️ Przerwano - kończę trwające żądania")
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+
+    print_report(stats, time.monotonic() - start, upload_log)
+
+
+if __name__ == '__main__':
+    main()
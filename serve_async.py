@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Firmowy Kiosk - tryb asynchroniczny (asyncio + uvicorn)
+
+Te same trasy Flask co w app.py, ale połączenia obsługuje pętla asyncio:
+- blokująca praca (pandas/openpyxl, SQLite) trafia do ograniczonej puli wątków,
+- strumień /api/events jest trzymany otwarty bezpośrednio w pętli asyncio,
+  więc setki podłączonych kiosków nie zajmują żadnego wątku.
+
+Uruchomienie:
+    python serve_async.py
+Liczba wątków i limity połączeń: sekcja "server" w config.json.
+"""
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+
+from app import (app, init_db, load_config, get_server_config, event_broker, pending_sse_events,
+                 build_static_assets, metrics, start_warm_up)
+
+
+class KioskASGI:
+    """Adapter ASGI: uruchamia aplikację WSGI w puli wątków, a SSE obsługuje natywnie"""
+
+    def __init__(self, wsgi_app, executor_threads, stream_limit, keepalive_seconds):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=executor_threads,
+                                           thread_name_prefix='kiosk-worker')
+        self.stream_limit = stream_limit
+        self.keepalive_seconds = keepalive_seconds
+        self.open_streams = 0
+        self.loop = None
+        self.changed = None
+
+    def _on_publish(self):
+        """Wywoływane z dowolnego wątku po publikacji zdarzenia - budzi strumienie SSE"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._wake_streams)
+
+    def _wake_streams(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self.changed = asyncio.Event()
+            event_broker.add_listener(self._on_publish)
+
+        if scope['path'] == '/api/events' and scope['method'] == 'GET':
+            await self.handle_events(scope, receive, send)
+        else:
+            await self.handle_wsgi(scope, receive, send)
+
+    # ==================== SSE ====================
+
+    async def handle_events(self, scope, receive, send):
+        """Strumień SSE trzymany otwarty w pętli asyncio (bez zajmowania wątku)"""
+        if self.open_streams >= self.stream_limit:
+            await send({'type': 'http.response.start', 'status': 503,
+                        'headers': [(b'retry-after', b'30'), (b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b'Za duzo polaczen SSE'})
+            return
+
+        headers = dict(scope['headers'])
+        raw_last_id = headers.get(b'last-event-id', b'').decode('latin-1')
+        if not raw_last_id:
+            query = scope['query_string'].decode('latin-1')
+            for part in query.split('&'):
+                if part.startswith('last_event_id='):
+                    raw_last_id = part.split('=', 1)[1]
+
+        self.open_streams += 1
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ]})
+            retry_ms = int(load_config().get('sse_retry_ms', 5000))
+            await send({'type': 'http.response.body', 'more_body': True,
+                        'body': f"retry: {retry_ms}\n\n".encode('utf-8')})
+
+            while True:
+                # Zapamiętaj zdarzenie przed odczytem bufora, aby nie zgubić publikacji
+                waiter = self.changed
+                chunks, last_id = pending_sse_events(raw_last_id)
+                raw_last_id = event_broker.format_id(last_id)
+                if chunks:
+                    await send({'type': 'http.response.body', 'more_body': True,
+                                'body': ''.join(chunks).encode('utf-8')})
+
+                changed = asyncio.ensure_future(waiter.wait())
+                done, _ = await asyncio.wait({changed, disconnected}, timeout=self.keepalive_seconds,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                changed.cancel()
+                if disconnected.done():
+                    break
+                if not done:
+                    await send({'type': 'http.response.body', 'more_body': True,
+                                'body': b': keepalive\n\n'})
+        finally:
+            self.open_streams -= 1
+            disconnected.cancel()
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    # ==================== WSGI ====================
+
+    async def handle_wsgi(self, scope, receive, send):
+        """Przekaż żądanie do Flask w puli wątków i odeślij odpowiedź fragmentami"""
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        environ = self.build_environ(scope, bytes(body))
+        status, headers, iterator, first_chunk = await self.loop.run_in_executor(
+            self.executor, self.start_wsgi, environ)
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        try:
+            chunk = first_chunk
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await self.loop.run_in_executor(self.executor, next, iterator, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                await self.loop.run_in_executor(self.executor, close)
+
+    def start_wsgi(self, environ):
+        """Wywołaj aplikację WSGI i pobierz pierwszy fragment odpowiedzi (w wątku puli)"""
+        response = {}
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                                   for k, v in headers]
+            return written.append
+
+        app_iter = self.wsgi_app(environ, start_response)
+        iterator = iter(app_iter)
+        first_chunk = next(iterator, None)
+        if written:
+            first_chunk = b''.join(written) + (first_chunk or b'')
+
+        # Zachowaj metodę close() oryginalnego iteratora (wymóg WSGI)
+        if hasattr(app_iter, 'close') and not hasattr(iterator, 'close'):
+            iterator = _ClosingIterator(iterator, app_iter.close)
+        return response['status'], response['headers'], iterator, first_chunk
+
+    @staticmethod
+    def build_environ(scope, body):
+        """Zbuduj słownik environ WSGI na podstawie zakresu ASGI"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        path = scope['path'].encode('utf-8').decode('latin-1')
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': path,
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name == 'CONTENT_LENGTH':
+                environ['CONTENT_LENGTH'] = value
+            else:
+                key = f'HTTP_{name}'
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+
+class _ClosingIterator:
+    """Iterator z metodą close() przekazaną z odpowiedzi WSGI"""
+
+    def __init__(self, iterator, close):
+        self._iterator = iterator
+        self.close = close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+
+if __name__ == '__main__':
+    init_db()
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    build_static_assets()
+
+    server_config = get_server_config()
+    metrics.set('kiosk_server_threads', value=server_config['executor_threads'])
+    asgi_app = KioskASGI(app,
+                         executor_threads=server_config['executor_threads'],
+                         stream_limit=server_config['stream_limit'],
+                         keepalive_seconds=server_config['keepalive_seconds'])
+
+    print("=" * 60)
+    print("🚀 Firmowy Kiosk - tryb asynchroniczny (uvicorn)")
+    print("=" * 60)
+    print(f"📍 Adres lokalny: http://{server_config['host']}:{server_config['port']}")
+    print(f"🧵 Wątki robocze: {server_config['executor_threads']}")
+    print(f"🔌 Limit połączeń: {server_config['connection_limit']} (SSE: {server_config['stream_limit']})")
+    print("=" * 60)
+
+    start_warm_up()
+    uvicorn.run(asgi_app,
+                host=server_config['host'],
+                port=server_config['port'],
+                lifespan='off',
+                limit_concurrency=server_config['connection_limit'],
+                timeout_keep_alive=server_config['keepalive_seconds'],
+                log_level='warning')
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Firmowy Kiosk - tryb wieloprocesowy (kilka procesów Waitress na jednym porcie)
+
+Proces nadrzędny otwiera gniazdo nasłuchujące i uruchamia N procesów potomnych,
+które przyjmują połączenia z tego samego gniazda. Każdy proces ma własny GIL,
+więc operacje pandas w różnych żądaniach nie blokują się nawzajem.
+
+Dane Export/Jumbo nie są parsowane w każdym procesie osobno - pierwszy proces
+zapisuje migawkę w katalogu cache/, a pozostałe mapują ją do pamięci.
+O nowej wersji po uploadzie procesy dowiadują się z tabeli data_versions (SQLite).
+
+Uruchomienie (Linux / Raspberry Pi):
+    python serve_workers.py
+Liczba procesów: "workers" w sekcji "server" pliku config.json (0 = liczba rdzeni).
+Na Windows (brak fork) aplikacja uruchamia się w jednym procesie.
+"""
+
+import os
+import signal
+import socket
+import sys
+import time
+
+from waitress import serve
+
+from app import app, init_db, get_server_config, event_broker, build_static_assets, metrics, start_warm_up
+
+
+def create_listen_socket(host, port, backlog=2048):
+    """Utwórz gniazdo nasłuchujące współdzielone przez procesy potomne"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def run_worker(sock, server_config):
+    """Proces potomny - obsługuje żądania z gniazda rodzica"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Każdy proces rozgrzewa się sam (wątki nie przechodzą przez fork); przy aktualnej
+    # migawce w cache/ proces tylko ją mapuje zamiast parsować Excel
+    start_warm_up()
+    serve(app, sockets=[sock], threads=server_config['threads'],
+          connection_limit=server_config['connection_limit'])
+
+
+def spawn_worker(sock, server_config):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(sock, server_config)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    init_db()
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    build_static_assets()
+
+    server_config = get_server_config()
+    metrics.set('kiosk_server_threads', value=server_config['threads'])
+    workers = int(server_config.get('workers') or 0) or os.cpu_count() or 1
+    sock = create_listen_socket(server_config['host'], server_config['port'])
+
+    # Zdarzenia SSE muszą być widoczne we wszystkich procesach
+    event_broker.use_database()
+
+    print("=" * 60)
+    print("🚀 Firmowy Kiosk - tryb wieloprocesowy")
+    print("=" * 60)
+    print(f"📍 Adres lokalny: http://{server_config['host']}:{server_config['port']}")
+
+    if not hasattr(os, 'fork'):
+        print("⚠️ System bez fork() - uruchamiam jeden proces")
+        print("=" * 60)
+        start_warm_up()
+        serve(app, sockets=[sock], threads=server_config['threads'],
+              connection_limit=server_config['connection_limit'])
+        return
+
+    print(f"🧵 Procesy: {workers} x {server_config['threads']} wątki")
+    print("=" * 60)
+
+    children = {spawn_worker(sock, server_config) for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Pilnuj procesów potomnych - restartuj te, które padły
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️ Proces {pid} zakończył się (status {status}) - uruchamiam nowy")
+            time.sleep(1)
+            children.add(spawn_worker(sock, server_config))
+
+    sock.close()
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
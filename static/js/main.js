@@ -39,6 +39,7 @@ document.addEventListener('DOMContentLoaded', () => {
 // ==================== FUNKCJE GŁÓWNE ====================
 
 async function initializeApp() {
+    registerServiceWorker();
     updateCurrentTime();
     setInterval(updateCurrentTime, 1000);
     
@@ -56,7 +57,13 @@ async function initializeApp() {
         showSection('wykresy');
     }
     
-    setInterval(refreshContent, 5 * 60 * 1000);
+    // Zmiany z panelu admina przychodzą przez SSE; pełne odświeżanie zostaje jako zapas
+    // (przy działającym SSE rzadziej - na zmiany, o których nie przyszło zdarzenie)
+    const refreshMinutes = connectEvents() ? 30 : 5;
+    setInterval(async () => {
+        await syncOfflineCache();
+        refreshContent();
+    }, refreshMinutes * 60 * 1000);
 }
 
 function updateCurrentTime() {
@@ -235,10 +242,37 @@ function updateDayRangeLabel(startDay) {
     }
 }
 
+// Serwer przeciążony lub w trakcie przebudowy danych odpowiada poprzednią wersją
+// (nagłówek X-Kiosk-Stale) - pokaż ją od razu i pobierz ponownie za chwilę
+const STALE_RETRY_MS = 5000;
+const staleRetryTimers = {};
+
+function retryIfStale(response, name, reload) {
+    clearTimeout(staleRetryTimers[name]);
+    if (response.headers.get('X-Kiosk-Stale')) {
+        staleRetryTimers[name] = setTimeout(reload, STALE_RETRY_MS);
+    }
+}
+
+// Wykresy pobierają dane w formacie kolumnowym (?format=columnar): wspólna oś 'x',
+// opis serii osobno i gęste tablice 'values' (null = brak danych). Rozwinięcie do
+// postaci serii używanej przez wykresy (x/y oraz days/data) tylko podpina tablice;
+// dodatkowe tablice serii ('extra', np. total/days zestawień) wracają na swoje miejsce.
+function fromColumnar(data) {
+    if (!data || data.format !== 'columnar') return data;
+    const { x, series, values, format, ...rest } = data;
+    return {
+        ...rest,
+        days: x,
+        series: series.map(({ extra, ...meta }, i) => ({ ...meta, ...extra, x, y: values[i], data: values[i] }))
+    };
+}
+
 async function loadChartData(kod = '1310', startDay = 1) {
     try {
-        const response = await fetch(`/api/chart-data?kod=${encodeURIComponent(kod)}&start_day=${startDay}`);
-        const data = await response.json();
+        const response = await fetch(`/api/chart-data?kod=${encodeURIComponent(kod)}&start_day=${startDay}&format=columnar`);
+        retryIfStale(response, 'chart-data', () => loadChartData(currentMachineCode, currentStartDay));
+        const data = fromColumnar(await response.json());
         if (data && data.series && data.series.length > 0) {
             createCharts(data);
         }
@@ -574,8 +608,9 @@ function createPerformanceChart(data) {
 async function loadPerformanceData() {
     const segmentsQuery = currentPerformanceSegments.map(s => `segments[]=${encodeURIComponent(s)}`).join('&');
     try {
-        const response = await fetch(`/api/jumbo-data?${segmentsQuery}&brygada=${currentPerformanceBrygada}`);
-        const data = await response.json();
+        const response = await fetch(`/api/jumbo-data?${segmentsQuery}&brygada=${currentPerformanceBrygada}&format=columnar`);
+        retryIfStale(response, 'jumbo-data', loadPerformanceData);
+        const data = fromColumnar(await response.json());
         performanceFullData = data;
         
         const slider = document.getElementById('performance-slider');
@@ -661,6 +696,7 @@ document.addEventListener('input', (e) => {
 async function loadContent() {
     try {
         const response = await fetch('/api/content');
+        retryIfStale(response, 'content', loadContent);
         const content = await response.json();
         
         if (content.settings) {
@@ -706,6 +742,74 @@ async function refreshContent() {
     await loadContent();
 }
 
+// ==================== ZDARZENIA NA ŻYWO (SSE) ====================
+
+// Każdy typ zdarzenia odświeża tylko tę część kiosku, która się zmieniła
+const eventHandlers = {
+    'settings': loadContent,
+    'visibility': loadContent,
+    'slides': loadSlidesData,
+    'inspirations': loadInspirationsData,
+    'export-data': () => loadChartData(currentMachineCode, currentStartDay),
+    'jumbo-data': loadPerformanceData,
+    'reset': refreshContent
+};
+
+function connectEvents() {
+    if (!window.EventSource) return false;
+    const source = new EventSource('/api/events');
+    Object.entries(eventHandlers).forEach(([type, handler]) => {
+        source.addEventListener(type, async () => {
+            console.log('📡 Zdarzenie:', type);
+            // Najpierw odśwież pamięć offline, aby handler nie dostał starej wersji
+            await syncOfflineCache();
+            handler();
+        });
+    });
+    // Serwer bez strumieniowania (waitress) zamyka połączenie po każdej odpowiedzi,
+    // więc 'error' zaraz po 'open' to zwykłe ponowne połączenie. Przerwa jest wtedy,
+    // gdy próba połączenia się nie udała - dopiero po niej sprawdź manifest
+    // (zaległe zdarzenia i tak przyjdą dzięki Last-Event-ID, a po restarcie - 'reset').
+    let connected = false;
+    let outage = false;
+    source.addEventListener('error', () => {
+        if (!connected) outage = true;
+        connected = false;
+    });
+    source.addEventListener('open', () => {
+        connected = true;
+        if (outage) {
+            outage = false;
+            syncOfflineCache();
+        }
+    });
+    return true;
+}
+
+// ==================== TRYB OFFLINE (SERVICE WORKER) ====================
+
+function registerServiceWorker() {
+    // Service worker działa tylko w bezpiecznym kontekście (https lub localhost)
+    if (!('serviceWorker' in navigator) || !window.isSecureContext) return;
+    navigator.serviceWorker.register('/sw.js', { scope: '/' })
+        .then(() => console.log('📦 Tryb offline aktywny'))
+        .catch(error => console.warn('Service worker niedostępny:', error));
+}
+
+function syncOfflineCache() {
+    const worker = navigator.serviceWorker && navigator.serviceWorker.controller;
+    if (!worker) return Promise.resolve(false);
+    return new Promise(resolve => {
+        const channel = new MessageChannel();
+        const timeout = setTimeout(() => resolve(false), 10000);
+        channel.port1.onmessage = event => {
+            clearTimeout(timeout);
+            resolve(event.data && event.data.changed);
+        };
+        worker.postMessage({ type: 'sync' }, [channel.port2]);
+    });
+}
+
 // ==================== EKSPORTOWANE FUNKCJE ====================
 
 window.showSection = showSection;
@@ -0,0 +1,177 @@
+// Firmowy Kiosk - Service worker (tryb offline)
+//
+// Wpisy z manifestu /api/manifest są trzymane w pamięci podręcznej 'kiosk-offline'
+// i serwowane z niej od razu. Po zmianie wersji manifestu pobierane są tylko wpisy,
+// których wersja się zmieniła. Pozostałe zapytania GET idą do sieci, a gdy serwer
+// nie odpowiada - z pamięci podręcznej 'kiosk-runtime'.
+
+const OFFLINE_CACHE = 'kiosk-offline';
+const RUNTIME_CACHE = 'kiosk-runtime';
+const MANIFEST_URL = '/api/manifest';
+
+// Adresy, których service worker nie obsługuje (strumień SSE, panel admina, eksport danych)
+const BYPASS_PREFIXES = ['/api/events', '/api/manifest', '/api/export/', '/sw.js', '/admin'];
+
+let manifestUrls = null;
+let syncPromise = null;
+
+// ==================== MANIFEST ====================
+
+async function readStoredManifest() {
+    const cache = await caches.open(OFFLINE_CACHE);
+    const response = await cache.match(MANIFEST_URL);
+    return response ? response.json() : null;
+}
+
+async function getManifestUrls() {
+    if (!manifestUrls) {
+        const manifest = await readStoredManifest();
+        manifestUrls = new Set(manifest ? manifest.entries.map(entry => new URL(entry.url, self.location).href) : []);
+    }
+    return manifestUrls;
+}
+
+async function syncManifest() {
+    const stored = await readStoredManifest();
+    // Serwer porównuje wersję z ETag - bez zmian odpowiada 304 bez treści
+    const headers = stored && stored.version ? { 'If-None-Match': `"${stored.version}"` } : {};
+    const response = await fetch(MANIFEST_URL, { cache: 'no-store', headers });
+    if (response.status === 304) return false;
+    if (!response.ok) throw new Error(`Manifest: HTTP ${response.status}`);
+    const manifest = await response.clone().json();
+    const cache = await caches.open(OFFLINE_CACHE);
+
+    if (stored && stored.version === manifest.version) {
+        return false;
+    }
+
+    const oldVersions = new Map((stored ? stored.entries : []).map(entry => [entry.url, entry.version]));
+    const failed = [];
+
+    // Pobierz tylko nowe i zmienione wpisy
+    for (const entry of manifest.entries) {
+        const cached = await cache.match(entry.url);
+        if (cached && oldVersions.get(entry.url) === entry.version) continue;
+        try {
+            const entryResponse = await fetch(entry.url, { cache: 'no-store' });
+            // Odpowiedź nieaktualna (serwer przeciążony) nie może trafić do pamięci pod nową wersją
+            if (entryResponse.ok && !entryResponse.headers.get('X-Kiosk-Stale')) {
+                await cache.put(entry.url, entryResponse);
+            } else {
+                failed.push(entry.url);
+            }
+        } catch (error) {
+            failed.push(entry.url);
+        }
+    }
+
+    // Usuń wpisy, których nie ma już w manifeście
+    const currentUrls = new Set(manifest.entries.map(entry => new URL(entry.url, self.location).href));
+    for (const request of await cache.keys()) {
+        if (request.url !== new URL(MANIFEST_URL, self.location).href && !currentUrls.has(request.url)) {
+            await cache.delete(request);
+        }
+    }
+
+    // Dane w pamięci 'runtime' pochodzą ze starszej wersji
+    await caches.delete(RUNTIME_CACHE);
+
+    // Wpisy, których nie udało się pobrać, zostaną ponowione przy następnej synchronizacji
+    if (failed.length > 0) {
+        console.warn('[sw] Nie pobrano:', failed);
+        manifest.entries = manifest.entries.map(entry =>
+            failed.includes(entry.url) ? { ...entry, version: null } : entry);
+        manifest.version = null;
+    }
+    await cache.put(MANIFEST_URL, new Response(JSON.stringify(manifest), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+    manifestUrls = currentUrls;
+    return true;
+}
+
+function syncOnce() {
+    if (!syncPromise) {
+        syncPromise = syncManifest()
+            .catch(error => {
+                console.warn('[sw] Synchronizacja nieudana:', error);
+                return false;
+            })
+            .finally(() => { syncPromise = null; });
+    }
+    return syncPromise;
+}
+
+// ==================== CYKL ŻYCIA ====================
+
+self.addEventListener('install', event => {
+    event.waitUntil(syncOnce().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+// Strona prosi o synchronizację (np. po zdarzeniu SSE) i czeka na odpowiedź
+self.addEventListener('message', event => {
+    if (!event.data || event.data.type !== 'sync') return;
+    const port = event.ports[0];
+    event.waitUntil(syncOnce().then(changed => {
+        if (port) port.postMessage({ changed });
+    }));
+});
+
+// ==================== OBSŁUGA ZAPYTAŃ ====================
+
+async function networkFirst(request) {
+    try {
+        const response = await fetch(request);
+        if (response.ok && !response.headers.get('X-Kiosk-Stale')) {
+            const cache = await caches.open(RUNTIME_CACHE);
+            await cache.put(request, response.clone());
+        } else if (response.status === 503) {
+            // Serwer odrzucił zapytanie (pełna kolejka) - lepsza poprzednia odpowiedź niż błąd
+            const cached = await caches.match(request);
+            if (cached) return cached;
+        }
+        return response;
+    } catch (error) {
+        const cached = await caches.match(request);
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+async function cacheFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    const response = await fetch(request);
+    if (response.ok && cacheName === RUNTIME_CACHE) {
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function handleFetch(request) {
+    const urls = await getManifestUrls();
+    if (urls.has(request.url)) {
+        return cacheFirst(request, OFFLINE_CACHE);
+    }
+    // Pliki z hashem w nazwie nigdy się nie zmieniają
+    if (new URL(request.url).pathname.startsWith('/static/dist/')) {
+        return cacheFirst(request, RUNTIME_CACHE);
+    }
+    return networkFirst(request);
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+    if (BYPASS_PREFIXES.some(prefix => url.pathname.startsWith(prefix))) return;
+
+    event.respondWith(handleFetch(request));
+});
@@ -0,0 +1,28 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cwd(tmp_path, monkeypatch):
+    """Baza kiosk.db i inne pliki względne powstają w katalogu tymczasowym, nie w repozytorium"""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def kiosk_data(tmp_path, monkeypatch):
+    """Kopia Export.xlsx / Jumbo.xlsx / config.json, nowa baza i pusta migawka danych procesu"""
+    for name in ('Export.xlsx', 'Jumbo.xlsx', 'config.json'):
+        shutil.copy(os.path.join(ROOT, name), tmp_path / name)
+    monkeypatch.setattr(app, '_data_store', app.DataStore())
+    monkeypatch.setattr(app, '_last_good', {})
+    monkeypatch.setattr(app, 'event_broker', app.EventBroker())
+    app.init_db()
+    return tmp_path
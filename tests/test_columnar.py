@@ -0,0 +1,107 @@
+import base64
+import json
+import os
+import re
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+import app
+from conftest import ROOT
+
+URLS = [
+    '/api/chart-data?kod=1310&start_day=1',
+    '/api/chart-data?kod=1316&start_day=8',
+    '/api/jumbo-data?segments[]=Amazon&segments[]=Reszta&brygada=All',
+    '/api/jumbo-data?segments[]=Amazon&brygada=A',
+    '/api/series?kod=1310',
+    '/api/series?kod=1310&granularity=week',
+    '/api/series?kod=1310&granularity=month',
+]
+
+
+def from_columnar(data):
+    """To samo co fromColumnar() w static/js/main.js"""
+    if data.get('format') != 'columnar':
+        return data
+    rest = {key: value for key, value in data.items() if key not in ('x', 'series', 'values', 'format')}
+    series = [{**{key: value for key, value in meta.items() if key != 'extra'}, **meta.get('extra', {}),
+               'x': data['x'], 'y': values, 'data': values}
+              for meta, values in zip(data['series'], data['values'])]
+    return {**rest, 'days': data['x'], 'series': series}
+
+
+def decode_b64(data):
+    """columnar-b64 -> columnar (NaN = brak danych)"""
+    def decode(column):
+        values = np.frombuffer(base64.b64decode(column['data']), dtype='<' + column['dtype'])
+        return [None if np.isnan(value) else value.item() for value in values]
+    series = [{**meta, 'extra': {key: decode(value) for key, value in meta['extra'].items()}} if 'extra' in meta
+              else meta for meta in data['series']]
+    return {**data, 'format': 'columnar', 'series': series, 'values': [decode(column) for column in data['values']]}
+
+
+def assert_same_rows(rows, decoded):
+    """Rozwinięta odpowiedź kolumnowa zawiera te same punkty serii co odpowiedź wierszowa"""
+    assert {key: value for key, value in decoded.items() if key not in ('series', 'days')} == \
+        {key: value for key, value in rows.items() if key not in ('series', 'days')}
+    assert len(decoded['series']) == len(rows['series']) > 0
+    for row, serie in zip(rows['series'], decoded['series']):
+        arrays = [key for key, value in row.items() if isinstance(value, list) and key != 'x']
+        assert {key: value for key, value in row.items() if key not in arrays and key != 'x'} == \
+            {key: value for key, value in serie.items() if key not in arrays and key not in ('x', 'y', 'data')}
+        if 'days' in rows:
+            # Serie wyrównane do wspólnej osi dni - tablice identyczne, łącznie z null
+            assert decoded['days'] == rows['days']
+            for key in arrays:
+                assert serie[key] == row[key], key
+        else:
+            # Każda seria ma własne dni - oś kolumnowa to ich suma, brakujące dni to null
+            assert set(row['x']) <= set(serie['x'])
+            for key in arrays:
+                expected = dict(zip(row['x'], row[key]))
+                assert None not in expected.values()
+                assert {x: v for x, v in zip(serie['x'], serie[key]) if v is not None} == expected, key
+
+
+@pytest.fixture
+def client(kiosk_data):
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_columnar_decodes_to_rows(client, url):
+    rows = client.get(url).get_json()
+    response = client.get(url + '&format=columnar')
+    assert response.status_code == 200
+    assert_same_rows(rows, from_columnar(response.get_json()))
+
+    # Ten sam format przez nagłówek Accept
+    accepted = client.get(url, headers={'Accept': app.COLUMNAR_MIMETYPE}).get_json()
+    assert accepted == response.get_json()
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_columnar_b64_decodes_to_rows(client, url):
+    rows = client.get(url).get_json()
+    encoded = client.get(url + '&format=columnar-b64').get_json()
+    assert_same_rows(rows, from_columnar(decode_b64(encoded)))
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get(URLS[0] + '&format=xml').status_code == 400
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='brak node.js')
+def test_frontend_from_columnar_matches_rows(client):
+    with open(os.path.join(ROOT, 'static', 'js', 'main.js'), encoding='utf-8') as f:
+        source = re.search(r'^function fromColumnar\(data\) \{.*?^\}', f.read(), re.S | re.M).group(0)
+    script = source + '\nconst input = JSON.parse(require("fs").readFileSync(0, "utf-8"));\n' \
+                      'process.stdout.write(JSON.stringify(input.map(fromColumnar)));\n'
+    payloads = [client.get(url + '&format=columnar').get_json() for url in URLS]
+    result = subprocess.run(['node', '-e', script], input=json.dumps(payloads), capture_output=True,
+                            text=True, check=True)
+    for url, decoded in zip(URLS, json.loads(result.stdout)):
+        assert_same_rows(client.get(url).get_json(), decoded)
@@ -0,0 +1,124 @@
+import gzip
+
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+import app
+
+BODY_A = ('{"wartosci": [' + ', '.join(str(i) for i in range(600)) + ']}').encode('utf-8')
+BODY_B = BODY_A.replace(b'1', b'7')
+
+
+def _middleware(body=BODY_A, mimetype='application/json', headers=None, **kwargs):
+    def wsgi_app(environ, start_response):
+        response = Response(body, mimetype=mimetype, headers=headers or {})
+        return response(environ, start_response)
+    return app.CompressionMiddleware(wsgi_app, level=6, min_size=1024, **kwargs)
+
+
+def _get(middleware, accept_encoding=None):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    return Client(middleware).get('/', headers=headers)
+
+
+def test_gzip_when_accepted():
+    response = _get(_middleware(), 'gzip, deflate')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert gzip.decompress(response.data) == BODY_A
+
+
+def test_brotli_preferred_and_refused_with_q0():
+    brotli = pytest.importorskip('brotli')
+    middleware = _middleware()
+    response = _get(middleware, 'gzip, br')
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == BODY_A
+
+    response = _get(middleware, 'br;q=0, gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == BODY_A
+
+
+def test_identity_without_accept_encoding_or_with_q0():
+    for accept_encoding in (None, 'gzip;q=0', 'identity'):
+        response = _get(_middleware(), accept_encoding)
+        assert 'Content-Encoding' not in response.headers
+        assert response.data == BODY_A
+
+
+@pytest.mark.parametrize('mimetype,headers', [
+    ('text/event-stream', {}),
+    ('application/json', {'Content-Encoding': 'gzip'}),
+    ('application/json', {'Cache-Control': 'no-transform'}),
+    ('image/png', {}),
+])
+def test_streams_and_encoded_responses_pass_through(mimetype, headers):
+    response = _get(_middleware(mimetype=mimetype, headers=headers), 'gzip')
+    assert response.headers.get('Content-Encoding') == headers.get('Content-Encoding')
+    assert response.data == BODY_A
+
+
+def test_small_responses_are_not_compressed():
+    response = _get(_middleware(body=b'{"ok": true}'), 'gzip')
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_existing_vary_and_etag_are_kept():
+    middleware = _middleware(headers={'Vary': 'Cookie', 'ETag': '"v1"'})
+    response = _get(middleware, 'gzip')
+    assert response.headers['Vary'] == 'Cookie, Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"v1"'
+
+
+def test_cache_is_keyed_by_body_and_encoding():
+    bodies = iter([BODY_A, BODY_B, BODY_A, BODY_A])
+
+    def wsgi_app(environ, start_response):
+        return Response(next(bodies), mimetype='application/json')(environ, start_response)
+    middleware = app.CompressionMiddleware(wsgi_app, min_size=1024)
+
+    assert gzip.decompress(_get(middleware, 'gzip').data) == BODY_A
+    assert gzip.decompress(_get(middleware, 'gzip').data) == BODY_B  # ta sama długość, inna treść
+    assert gzip.decompress(_get(middleware, 'gzip').data) == BODY_A  # z pamięci
+    assert len(middleware._cache) == 2
+    if app.brotli is not None:
+        assert app.brotli.decompress(_get(middleware, 'br').data) == BODY_A
+        assert len(middleware._cache) == 3
+    assert {encoding for _, encoding in middleware._cache} >= {'gzip'}
+
+
+def test_cache_hit_reuses_compressed_bytes():
+    middleware = _middleware()
+    hits = ('kiosk_compression_total', (('encoding', 'gzip'), ('cache', 'hit')))
+    before = app.metrics._values.get(hits, 0)
+    first = _get(middleware, 'gzip').data
+    assert _get(middleware, 'gzip').data == first
+    assert app.metrics._values.get(hits, 0) == before + 1
+
+
+def test_private_responses_are_not_cached():
+    for headers in ({'Cache-Control': 'no-store'}, {'Cache-Control': 'private'}, {'Set-Cookie': 'session=1'}):
+        middleware = _middleware(headers=headers)
+        assert gzip.decompress(_get(middleware, 'gzip').data) == BODY_A
+        assert middleware._cache == {}
+
+
+def test_cache_evicts_least_recently_used():
+    bodies = [BODY_A.replace(b'[0', f'[{i}0'.encode()) for i in range(9)]
+    sizes = [len(gzip.compress(body, compresslevel=6, mtime=0)) for body in bodies]
+    cache_bytes = max(sizes) * 8  # mieści się osiem wpisów, dziewiąty wypycha najdawniej używany
+    assert sum(sizes[:8]) <= cache_bytes < sum(sizes)
+    queue = iter(bodies[:8] + [bodies[0], bodies[8]])
+
+    def wsgi_app(environ, start_response):
+        return Response(next(queue), mimetype='application/json')(environ, start_response)
+    middleware = app.CompressionMiddleware(wsgi_app, min_size=1024, cache_bytes=cache_bytes)
+    for _ in range(10):
+        _get(middleware, 'gzip')
+
+    cached = {gzip.decompress(value) for value in middleware._cache.values()}
+    assert cached == set(bodies) - {bodies[1]}  # bodies[0] był odczytany ponownie, więc został
+    assert middleware._cache_size == sum(len(value) for value in middleware._cache.values())
@@ -0,0 +1,21 @@
+import os
+
+import app
+
+
+def _event_types():
+    return [event_type for _, event_type, _ in app.event_broker.since(0)]
+
+
+def test_file_changed_outside_admin_publishes_event(kiosk_data):
+    app.data_store()
+    assert _event_types() == []  # pierwsze wczytanie to nie zmiana danych
+
+    export = kiosk_data / 'Export.xlsx'
+    mtime = os.path.getmtime(export) + 60
+    os.utime(export, (mtime, mtime))
+    app.data_store()
+    assert _event_types() == ['export-data']
+
+    app.data_store()  # dane już aktualne - bez kolejnego zdarzenia
+    assert _event_types() == ['export-data']
@@ -0,0 +1,97 @@
+import os
+
+import openpyxl
+import pytest
+
+import app
+
+
+@pytest.fixture
+def admin(kiosk_data, monkeypatch):
+    # Obrazki wykresów po publikacji (wątek w tle) nie są tu sprawdzane
+    monkeypatch.setattr(app, 'schedule_chart_images', lambda dataset: None)
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['authenticated'] = True
+    with app.app.test_request_context():
+        app.data_store()
+    return client
+
+
+def _live():
+    """Bajty i czas modyfikacji Export.xlsx oraz wersja i dane aktywnej migawki"""
+    with open('Export.xlsx', 'rb') as f:
+        content = f.read()
+    with app.app.test_request_context():
+        store = app.data_store()
+        return content, os.path.getmtime('Export.xlsx'), store.dataset_version('export'), store.frame('export')
+
+
+def _upload(client, path):
+    with open(path, 'rb') as f:
+        return client.post('/api/upload-excel', data={'excel_file': (f, 'Export.xlsx')})
+
+
+def _variant(tmp_path):
+    """Poprawny plik Export z inną wartością pierwszego dnia"""
+    workbook = openpyxl.load_workbook('Export.xlsx')
+    workbook.active.cell(row=2, column=4).value = 123
+    path = tmp_path / 'nowy' / 'Export.xlsx'
+    path.parent.mkdir()
+    workbook.save(path)
+    return path
+
+
+def test_invalid_file_is_rejected_without_touching_live_data(admin, tmp_path):
+    content, mtime, version, frame = _live()
+    broken = tmp_path / 'zepsuty.xlsx'
+    broken.write_bytes(b'to nie jest plik Excel')
+
+    response = _upload(admin, broken)
+    assert response.status_code == 400
+    after = _live()
+    assert after[:3] == (content, mtime, version)
+    assert after[3] is frame
+    assert os.listdir(app.DATA_FILE_FOLDER) == []
+
+
+def test_failing_publish_restores_previous_file(admin, tmp_path, monkeypatch):
+    content, mtime, version, frame = _live()
+    publish_dataset = app.publish_dataset
+
+    def failing_publish(*args, **kwargs):
+        raise OSError('dysk pełny')
+    monkeypatch.setattr(app, 'publish_dataset', failing_publish)
+
+    response = _upload(admin, _variant(tmp_path))
+    assert response.status_code == 500
+    monkeypatch.setattr(app, 'publish_dataset', publish_dataset)
+    # Plik i czas modyfikacji bez zmian - migawka aktywna, bez ponownego parsowania
+    after = _live()
+    assert after[:3] == (content, mtime, version)
+    assert after[3] is frame
+    assert not os.path.exists('Export.xlsx.prev')
+
+
+def test_publish_and_rollback_round_trip(admin, tmp_path):
+    content, _, version, frame = _live()
+
+    response = _upload(admin, _variant(tmp_path))
+    assert response.status_code == 200
+    published_content, _, published_version, published_frame = _live()
+    assert published_version == version + 1
+    assert published_content != content
+    assert not published_frame.equals(frame)
+
+    files = admin.get('/api/data-files?dataset=export').get_json()
+    assert [item['live'] for item in files] == [True, False]
+    previous = files[1]
+    assert previous['original_name'] == 'Export.xlsx' and 'poprzedni' in previous['filename']
+
+    response = admin.post(f"/api/data-files/{previous['id']}/publish")
+    assert response.status_code == 200
+    restored_content, _, restored_version, restored_frame = _live()
+    assert restored_content == content
+    assert restored_version == version + 2
+    assert restored_frame.equals(frame)
+    assert admin.get('/api/data-files?dataset=export').get_json()[0]['id'] == previous['id']
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import app
+
+pytestmark = pytest.mark.skipif(app.fcntl is None or not hasattr(os, 'fork'),
+                                reason='blokada między procesami wymaga fcntl i fork')
+
+
+def _parse_count():
+    return app.metrics._histograms.get(('kiosk_stage_duration_seconds', (('stage', 'excel_parse'),)), [0])[-1]
+
+
+def _load_in_worker(barrier, results):
+    if barrier is not None:
+        barrier.wait()
+    before = _parse_count()
+    store = app.data_store()
+    results.put((store.version, _parse_count() - before))
+
+
+def _start_workers(count, barrier=None):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=_load_in_worker, args=(barrier, results)) for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers, results
+
+
+def _collect(workers, results):
+    collected = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=10)
+    return collected
+
+
+def test_cold_start_parses_each_file_once(kiosk_data):
+    barrier = multiprocessing.get_context('fork').Barrier(3)
+    workers, results = _start_workers(3, barrier)
+    collected = _collect(workers, results)
+
+    assert {version for version, _ in collected} == {'export1-jumbo1'}
+    assert sum(parsed for _, parsed in collected) == 2  # Export i Jumbo - po jednym razie
+    versions = app.get_data_versions()
+    assert versions['export'][0] == versions['jumbo'][0] == 1
+
+
+def test_worker_waits_for_upload_instead_of_reparsing(kiosk_data):
+    df = app.data_store().frame('export')
+    export = kiosk_data / 'Export.xlsx'
+
+    with app.dataset_parse_lock('export'):
+        # Jak publish_data_file: plik już podmieniony, wersja jeszcze nie zapisana
+        mtime = os.path.getmtime(export) + 60
+        os.utime(export, (mtime, mtime))
+        workers, results = _start_workers(1)
+        time.sleep(0.5)
+        app.publish_dataset('export', df, app._source_mtime('export'))
+
+    [(version, parsed)] = _collect(workers, results)
+    assert version == 'export2-jumbo1'
+    assert parsed == 0
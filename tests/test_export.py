@@ -0,0 +1,57 @@
+import io
+import sys
+
+import pandas as pd
+import pytest
+
+import app
+
+
+def _frame(dataset):
+    df = app.data_store().frame(dataset)
+    return df[[column for column in df.columns if not str(column).startswith('Unnamed:')]].reset_index(drop=True)
+
+
+def test_csv_export_parses_back_to_the_same_rows(kiosk_data):
+    response = app.app.test_client().get('/api/export/long.csv')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/csv; charset=utf-8'
+
+    exported = pd.read_csv(io.BytesIO(response.data), sep=';', decimal=',', encoding='utf-8-sig',
+                           dtype={'Typ': str, 'Kod': str, 'Nazwa': str, 'Brygada': str}, keep_default_na=False)
+    with app.app.test_request_context():
+        expected = _frame('export')
+    assert len(exported) == len(expected) > 0
+    pd.testing.assert_frame_equal(exported, expected, check_dtype=False)
+
+
+def test_csv_export_applies_filters(kiosk_data):
+    with app.app.test_request_context():
+        expected = _frame('export')
+    kod = str(expected['Kod'].iloc[0])
+    response = app.app.test_client().get(f'/api/export/long.csv?kod={kod}&day_from=1&day_to=7')
+    exported = pd.read_csv(io.BytesIO(response.data), sep=';', decimal=',', encoding='utf-8-sig',
+                           dtype={'Kod': str})
+    assert len(exported) > 0
+    assert set(exported['Kod']) == {kod}
+    assert exported['Dzien'].between(1, 7).all()
+
+
+def test_parquet_export_parses_back_to_the_same_rows(kiosk_data):
+    pytest.importorskip('pyarrow')
+    response = app.app.test_client().get('/api/export/jumbo.parquet')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/vnd.apache.parquet'
+
+    exported = pd.read_parquet(io.BytesIO(response.data))
+    with app.app.test_request_context():
+        expected = _frame('jumbo')
+    assert len(exported) == len(expected) > 0
+    pd.testing.assert_frame_equal(exported, expected, check_dtype=False)
+
+
+def test_parquet_without_pyarrow_is_501(kiosk_data, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)  # import pyarrow -> ImportError
+    response = app.app.test_client().get('/api/export/long.parquet')
+    assert response.status_code == 501
+    assert 'pyarrow' in response.get_json()['error']
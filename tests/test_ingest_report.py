@@ -0,0 +1,31 @@
+import os
+import zipfile
+
+import app
+
+EXPORT_PATH = os.path.join(app.app.root_path, 'Export.xlsx')
+
+
+def test_read_excel_staged_reports_sizes_without_extra_inflate(monkeypatch):
+    reads = []
+    original_read = zipfile.ZipFile.read
+    monkeypatch.setattr(zipfile.ZipFile, 'read', lambda self, name, pwd=None: reads.append(name) or original_read(self, name, pwd))
+
+    report = app.IngestReport('export', 'Export.xlsx')
+    df = app.read_excel_staged(EXPORT_PATH, report, preferred_sheets=('Export',))
+
+    assert not df.empty
+    assert [name for name, _ in report.stages] == ['zip_open', 'sheet_selection', 'cell_read']
+    with zipfile.ZipFile(EXPORT_PATH) as archive:
+        assert report.info['xml_bytes'] == sum(info.file_size for info in archive.infolist())
+        # Każdy plik archiwum rozpakowany co najwyżej raz (przez openpyxl)
+        assert len(reads) == len(set(reads)) <= len(archive.infolist())
+
+
+def test_read_excel_staged_rejects_broken_archive(tmp_path):
+    path = tmp_path / 'Export.xlsx'
+    path.write_bytes(b'not a zip')
+    report = app.IngestReport('export', 'Export.xlsx')
+    df = app.load_long(report, str(path))
+    assert df.empty
+    assert 'uszkodzone archiwum zip' in report.error
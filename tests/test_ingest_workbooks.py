@@ -0,0 +1,80 @@
+import os
+import shutil
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+import app
+from conftest import ROOT
+
+
+@pytest.fixture
+def backlog(kiosk_data):
+    """Katalog zaległych plików: dwa poprawne Export, jeden uszkodzony i jeden Jumbo"""
+    folder = kiosk_data / 'zalegle'
+    (folder / 'linia2').mkdir(parents=True)
+    shutil.copy(kiosk_data / 'Export.xlsx', folder / 'Export-linia1.xlsx')
+    shutil.copy(kiosk_data / 'Export.xlsx', folder / 'linia2' / 'Export-luty.xlsx')
+    (folder / 'Export-uszkodzony.xlsx').write_bytes(b'PK\x03\x04 to nie jest skoroszyt')
+    shutil.copy(kiosk_data / 'Jumbo.xlsx', folder / 'Jumbo-linia1.xlsx')
+    (folder / 'notatki.txt').write_text('pomijany', encoding='utf-8')
+    return folder
+
+
+def _check_summary(summary):
+    export = summary['export_archive']
+    reports = {report['filename']: report for report in export['files']}
+    assert set(reports) == {'Export-linia1.xlsx', 'Export-uszkodzony.xlsx', 'linia2/Export-luty.xlsx'}
+    assert reports['Export-uszkodzony.xlsx']['status'] == 'error'
+    assert reports['Export-uszkodzony.xlsx']['error']
+    assert reports['Export-linia1.xlsx']['status'] != 'error'
+    assert export['rows'] == reports['Export-linia1.xlsx']['info']['rows'] * 2
+    assert export['version'] == 1
+    assert summary['jumbo_archive']['version'] == 1
+
+
+def test_parallel_ingest_publishes_valid_files_and_reports_errors(backlog):
+    summary = app.ingest_workbooks(str(backlog), workers=2)
+    _check_summary(summary)
+
+    with app.app.test_request_context():
+        store = app.data_store()
+        archive = store.frame('export_archive')
+        assert store.dataset_version('export_archive') == 1
+    assert set(archive[app.INGEST_PROVENANCE_COLUMN]) == {'Export-linia1.xlsx', 'linia2/Export-luty.xlsx'}
+
+    # Raport uszkodzonego pliku widać w panelu admina
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['authenticated'] = True
+    reports = client.get('/api/ingest-reports?dataset=export&limit=50').get_json()
+    assert any(r['filename'] == 'Export-uszkodzony.xlsx' and r['status'] == 'error' for r in reports)
+
+    response = client.get('/api/export/long-archive.csv?plik=linia2/Export-luty.xlsx')
+    assert response.status_code == 200
+    assert response.data.count(b'\n') == len(archive) // 2 + 1
+
+
+def test_zip_archive_and_dry_run(backlog, tmp_path):
+    source = tmp_path / 'zalegle.zip'
+    with zipfile.ZipFile(source, 'w') as archive:
+        for path in backlog.rglob('*'):
+            archive.write(path, path.relative_to(backlog))
+
+    summary = app.ingest_workbooks(str(source), workers=2, publish=False)
+    assert summary['export_archive']['version'] is None
+    assert summary['export_archive']['rows'] > 0
+    assert app.get_data_version('export_archive')[0] == 0
+
+    _check_summary(app.ingest_workbooks(str(source), workers=2))
+
+
+def test_ingest_cli_exit_code(backlog):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'ingest.py'), str(backlog), '--workers', '2'],
+                            cwd=backlog.parent, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=ROOT, PYTHONIOENCODING='utf-8'))
+    assert result.returncode == 1
+    assert 'Export-uszkodzony.xlsx' in result.stdout
+    assert 'pliki z błędem: 1' in result.stdout
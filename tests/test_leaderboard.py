@@ -0,0 +1,60 @@
+import pandas as pd
+
+import app
+
+
+def _leaderboard(cumulative, last_day=20):
+    """Ranking z wartości narastających {(kod, brygada): wartość na ostatni dzień}"""
+    rows = []
+    for (kod, brygada), value in cumulative.items():
+        rows.append({'Typ': 'Dzienne', 'Kod': kod, 'Nazwa': '', 'Brygada': brygada, 'Dzien': last_day, 'Wartosc': 1.0})
+        # Wcześniejszy dzień z wyższą wartością - liczy się ostatni dzień, nie maksimum
+        rows.append({'Typ': 'Narastające', 'Kod': kod, 'Nazwa': '', 'Brygada': brygada, 'Dzien': 1,
+                     'Wartosc': value + 1000.0})
+        rows.append({'Typ': 'Narastające', 'Kod': kod, 'Nazwa': '', 'Brygada': brygada, 'Dzien': last_day,
+                     'Wartosc': float(value)})
+    df_long = pd.DataFrame(rows)
+    rollups = app.build_export_rollups(df_long)
+    return app.build_leaderboard(df_long, rollups['month'], app.list_machines(df_long))
+
+
+def test_ranking_and_ties():
+    result = _leaderboard({
+        ('1310', 'A'): 100, ('1310', 'B'): 80, ('1310', 'C'): 120,
+        ('1316', 'A'): 50, ('1316', 'B'): 50,                      # remis - prowadzi pierwsza brygada
+        ('1323', 'A'): 150, ('1323', 'B'): 50,                     # ta sama średnia co 1310
+    })
+    assert result['day'] == 20
+
+    machines = [(m['rank'], m['kod'], m['mtd'], m['leader']) for m in result['machines']]
+    assert machines == [(1, '1310', 100, 'C'), (2, '1323', 100, 'A'), (3, '1316', 50, 'A')]
+    assert result['machines'][2]['brygady'] == {'A': 50, 'B': 50}
+
+    brygady = [(b['rank'], b['brygada'], b['machines_led'], b['relative_pct'], b['machines'])
+               for b in result['brygady']]
+    assert brygady == [(1, 'A', 2, 116.7, 3), (2, 'C', 1, 120.0, 1), (3, 'B', 0, 76.7, 3)]
+
+
+def test_full_tie_is_ordered_by_name():
+    # Każda brygada prowadzi na jednej maszynie z tym samym wynikiem względnym
+    for cumulative in ({('1', 'B'): 100, ('1', 'A'): 50, ('2', 'B'): 50, ('2', 'A'): 100},
+                       {('2', 'A'): 100, ('2', 'B'): 50, ('1', 'A'): 50, ('1', 'B'): 100}):
+        result = _leaderboard(cumulative)
+        assert [(b['brygada'], b['machines_led'], b['relative_pct']) for b in result['brygady']] == \
+            [('A', 1, 100.0), ('B', 1, 100.0)]
+        assert [m['kod'] for m in result['machines']] == ['1', '2']
+
+
+def test_empty_month():
+    assert app.build_leaderboard(pd.DataFrame(), None, []) == {'day': None, 'brygady': [], 'machines': []}
+
+
+def test_leaderboard_endpoint(kiosk_data):
+    response = app.app.test_client().get('/api/leaderboard')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert [m['rank'] for m in result['machines']] == list(range(1, len(result['machines']) + 1))
+    assert [m['mtd'] for m in result['machines']] == sorted((m['mtd'] for m in result['machines']), reverse=True)
+    assert [b['machines_led'] for b in result['brygady']] == \
+        sorted((b['machines_led'] for b in result['brygady']), reverse=True)
+    assert sum(b['machines_led'] for b in result['brygady']) == len(result['machines'])
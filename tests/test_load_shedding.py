@@ -0,0 +1,69 @@
+import os
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client(kiosk_data):
+    client = app.app.test_client()
+    response = client.get('/api/machines')  # wczytanie danych
+    assert response.status_code == 200 and 'X-Kiosk-Stale' not in response.headers
+    return client
+
+
+@pytest.fixture
+def no_free_slots(monkeypatch):
+    admission = app.AdmissionControl(1, 0, 0)
+    assert admission.acquire()
+    monkeypatch.setattr(app, 'data_admission', admission)
+
+
+@pytest.mark.parametrize('url', ['/api/machines', '/api/leaderboard'])
+def test_precomputed_values_skip_admission(client, no_free_slots, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'X-Kiosk-Stale' not in response.headers
+
+
+def test_computed_payload_is_shed_without_free_slot(client, no_free_slots):
+    assert client.get('/api/series?kod=does-not-exist').status_code == 503
+
+
+def _metric(name, labels):
+    return app.metrics._values.get((name, labels), 0)
+
+
+def test_background_revalidation_runs_outside_the_request(client, monkeypatch):
+    assert client.get('/api/content').status_code == 200
+    images = os.path.join('static', 'images')
+    os.makedirs(images, exist_ok=True)
+    with open(os.path.join(images, 'slajd.jpg'), 'wb') as f:
+        f.write(b'jpg')
+
+    admission = app.AdmissionControl(1, 1, 5)
+    assert admission.acquire()
+    monkeypatch.setattr(app, 'data_admission', admission)
+    contexts = []
+    build_content = app.build_content
+    monkeypatch.setattr(app, 'build_content',
+                        lambda: contexts.append(app.has_request_context()) or build_content())
+
+    route = (('route', '/api/content'),)
+    total = (('method', 'GET'), ('route', '/api/content'), ('status', '200'))
+    in_flight, requests = _metric('kiosk_http_requests_in_flight', route), _metric('kiosk_http_requests_total', total)
+
+    response = client.get('/api/content')
+    assert response.headers['X-Kiosk-Stale'] == '1'
+    admission.release()  # odświeżanie w tle czeka w kolejce na to miejsce
+    for _ in range(500):
+        if contexts and not app.single_flight.busy('revalidate', ('content',)):
+            break
+        time.sleep(0.01)
+
+    assert contexts == [False]
+    assert app._last_good[('content',)]['slides'][0]['url'] == '/static/images/slajd.jpg'
+    assert _metric('kiosk_http_requests_in_flight', route) == in_flight
+    assert _metric('kiosk_http_requests_total', total) == requests + 1
@@ -0,0 +1,34 @@
+import app
+
+
+def _sqlite_count():
+    return app.metrics._histograms.get(('kiosk_stage_duration_seconds', (('stage', 'sqlite'),)), [0])[-1]
+
+
+def test_connection_execute_is_timed():
+    conn = app.db_connect(':memory:')
+    try:
+        before = _sqlite_count()
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.executemany('INSERT INTO t VALUES (?)', [(1,), (2,)])
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 2
+        conn.executescript('DELETE FROM t;')
+        assert _sqlite_count() - before == 4
+    finally:
+        conn.close()
+
+
+def test_cursor_execute_is_timed():
+    conn = app.db_connect(':memory:')
+    try:
+        before = _sqlite_count()
+        conn.cursor().execute('SELECT 1')
+        assert _sqlite_count() - before == 1
+    finally:
+        conn.close()
+
+
+def test_metrics_content_type_has_single_charset():
+    response = app.app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/plain; version=0.0.4; charset=utf-8'
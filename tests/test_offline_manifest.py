@@ -0,0 +1,41 @@
+import sqlite3
+
+import app
+
+
+def _slide_order():
+    conn = sqlite3.connect('kiosk.db')
+    rows = conn.execute('SELECT filename FROM slide_order').fetchall()
+    conn.close()
+    return rows
+
+
+def test_unchanged_manifest_is_304_without_rebuild(kiosk_data, monkeypatch):
+    monkeypatch.setattr(app, '_offline_manifest_cache', {'key': None, 'manifest': None})
+    builds = []
+    build = app.build_offline_manifest
+    monkeypatch.setattr(app, 'build_offline_manifest', lambda: builds.append(1) or build())
+    client = app.app.test_client()
+
+    first = client.get('/api/manifest')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = client.get('/api/manifest', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert len(builds) == 1
+
+    # Zmiana z panelu admina (zdarzenie SSE) unieważnia manifest
+    app.event_broker.publish('settings')
+    changed = client.get('/api/manifest', headers={'If-None-Match': etag})
+    assert changed.status_code in (200, 304)
+    assert len(builds) == 2
+
+
+def test_manifest_does_not_write_slide_order(kiosk_data):
+    (kiosk_data / 'static' / 'images').mkdir(parents=True)
+    (kiosk_data / 'static' / 'images' / 'slajd.jpg').write_bytes(b'jpg')
+
+    assert app.app.test_client().get('/api/manifest').status_code == 200
+    assert _slide_order() == []
@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import app
+from conftest import ROOT
+
+
+def _answer_rows(db_path='kiosk.db'):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute('SELECT COUNT(*) FROM quiz_answers').fetchone()[0]
+    stats = conn.execute('SELECT question_id, answers, correct, answer1_count, answer2_count '
+                         'FROM quiz_answer_stats ORDER BY question_id').fetchall()
+    conn.close()
+    return count, stats
+
+
+def _wait_for(condition, seconds=5):
+    deadline = time.monotonic() + seconds
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_full_batch_is_flushed_before_the_interval(kiosk_data):
+    buffer = app.QuizAnswerBuffer(size=100, flush_seconds=60, batch_size=3)
+    buffer.record(1, 0, True)
+    buffer.record(1, 1, False)
+    time.sleep(0.2)
+    assert _answer_rows()[0] == 0  # niepełna partia czeka na interwał
+
+    buffer.record(2, 0, True)
+    assert _wait_for(lambda: _answer_rows()[0] == 3)
+    assert _answer_rows()[1] == [(1, 2, 1, 1, 1), (2, 1, 1, 1, 0)]
+    assert buffer.pending == 0
+
+
+def test_answers_are_flushed_on_interval(kiosk_data):
+    buffer = app.QuizAnswerBuffer(size=100, flush_seconds=0.05, batch_size=1000)
+    buffer.record(1, 0, True)
+    assert _wait_for(lambda: _answer_rows()[0] == 1)
+    buffer.record(1, 0, True)  # kolejne partie doliczają się do tych samych statystyk dnia
+    assert _wait_for(lambda: _answer_rows()[1] == [(1, 2, 2, 2, 0)])
+
+
+def test_full_buffer_drops_oldest_answers(kiosk_data):
+    buffer = app.QuizAnswerBuffer(size=2, flush_seconds=60, batch_size=1000)
+    for answer_index in range(3):
+        buffer.record(1, answer_index, False)
+    assert (buffer.pending, buffer.dropped) == (2, 1)
+    assert buffer.flush() == 2
+    assert _answer_rows()[1] == [(1, 2, 0, 0, 1)]
+
+
+def test_pending_answers_are_written_on_shutdown(kiosk_data):
+    # Interwał i partia większe niż test - zapisać może tylko atexit przy zamknięciu procesu
+    config = (kiosk_data / 'config.json').read_text(encoding='utf-8')
+    config = config.replace('"flush_seconds": 5', '"flush_seconds": 3600')
+    (kiosk_data / 'config.json').write_text(config, encoding='utf-8')
+    script = ('import app\n'
+              'for i in range(5):\n'
+              '    app.quiz_answers.record(7, i % 2, i % 2 == 0)\n'
+              'assert app.quiz_answers.pending == 5\n')
+    subprocess.run([sys.executable, '-c', script], cwd=kiosk_data, check=True, capture_output=True,
+                   env=dict(os.environ, PYTHONPATH=ROOT))
+    assert _answer_rows() == (5, [(7, 5, 3, 3, 2)])
+
+
+def test_quiz_export_has_single_charset(kiosk_data):
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['authenticated'] = True
+    response = client.get('/api/quiz/export')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/csv; charset=utf-8'
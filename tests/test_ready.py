@@ -0,0 +1,45 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def warmup(monkeypatch):
+    state = {'state': 'pending', 'started': None, 'finished': None, 'step': None, 'steps': {}, 'error': None}
+    monkeypatch.setattr(app, '_warmup', state)
+    return state
+
+
+def test_pending_and_running_are_not_ready(warmup):
+    client = app.app.test_client()
+    for state in ('pending', 'starting', 'running'):
+        warmup['state'] = state
+        response = client.get('/api/ready')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '2'
+        assert response.get_json()['ready'] is False
+
+
+def test_failed_warmup_is_not_ready(warmup, monkeypatch):
+    def broken_export():
+        raise ValueError('Export.xlsx uszkodzony')
+    monkeypatch.setattr(app, 'WARMUP_STEPS', [('imports', lambda: None), ('export', broken_export)])
+    app.warm_up()
+
+    response = app.app.test_client().get('/api/ready')
+    assert response.status_code == 503
+    assert 'Retry-After' not in response.headers
+    body = response.get_json()
+    assert (body['ready'], body['failed'], body['state']) == (False, True, 'failed')
+    assert body['error'] == 'export: Export.xlsx uszkodzony'
+    assert set(body['steps_ms']) == {'imports', 'export'}
+
+
+def test_successful_warmup_is_ready(warmup, monkeypatch):
+    monkeypatch.setattr(app, 'WARMUP_STEPS', [('imports', lambda: None)])
+    app.warm_up()
+
+    response = app.app.test_client().get('/api/ready')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['ready'], body['failed'], body['error']) == (True, False, None)
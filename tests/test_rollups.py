@@ -0,0 +1,90 @@
+import math
+import random
+
+import pandas as pd
+import pytest
+
+import app
+
+
+def _long(rows):
+    """Forma długa Export.xlsx z listy (Typ, Kod, Brygada, Dzien, Wartosc) - w losowej kolejności"""
+    rows = list(rows)
+    random.Random(0).shuffle(rows)
+    return pd.DataFrame([{'Typ': typ, 'Kod': kod, 'Nazwa': 'Linia', 'Brygada': brygada, 'Dzien': dzien,
+                          'Wartosc': float(wartosc)} for typ, kod, brygada, dzien, wartosc in rows])
+
+
+@pytest.fixture
+def df_long():
+    daily_a = {6: 10, 7: 20, 8: 30, 14: 40, 15: 50, 29: 60, 31: 70}
+    cumulative_a = {1: 5, 7: 100, 8: 110, 14: 140, 31: 310}
+    return _long([('Dzienne', '1310', 'A', day, value) for day, value in daily_a.items()]
+                 + [('Narastające', '1310', 'A', day, value) for day, value in cumulative_a.items()]
+                 + [('Dzienne', '1310', 'B', 22, 90), ('Narastające', '1310', 'B', 22, 90)])
+
+
+def _row(rollup, brygada, period):
+    row = rollup.loc[('1310', brygada, period)]
+    return {key: (None if isinstance(value, float) and math.isnan(value) else value) for key, value in row.items()}
+
+
+def test_week_boundaries(df_long):
+    week = app.build_export_rollups(df_long)['week']
+    # Tydzień = dni 1-7, 8-14, 15-21, 22-28, 29-31; narastająco - wartość z ostatniego dnia okresu
+    assert _row(week, 'A', 1) == {'srednia': 15, 'suma': 30, 'dni': 2, 'narastajaco': 100}
+    assert _row(week, 'A', 2) == {'srednia': 35, 'suma': 70, 'dni': 2, 'narastajaco': 140}
+    assert _row(week, 'A', 3) == {'srednia': 50, 'suma': 50, 'dni': 1, 'narastajaco': None}
+    assert _row(week, 'A', 5) == {'srednia': 65, 'suma': 130, 'dni': 2, 'narastajaco': 310}
+    assert ('1310', 'A', 4) not in week.index
+    assert _row(week, 'B', 4) == {'srednia': 90, 'suma': 90, 'dni': 1, 'narastajaco': 90}
+
+
+def test_month_covers_the_whole_file(df_long):
+    month = app.build_export_rollups(df_long)['month']
+    assert list(month.index.get_level_values('Okres').unique()) == [1]
+    assert _row(month, 'A', 1) == {'srednia': 40, 'suma': 280, 'dni': 7, 'narastajaco': 310}
+    assert _row(month, 'B', 1) == {'srednia': 90, 'suma': 90, 'dni': 1, 'narastajaco': 90}
+
+
+def test_empty_data_has_no_rollups():
+    assert app.build_export_rollups(_long([])) == {}
+
+
+def test_week_series_labels_and_missing_periods(df_long):
+    rollup = app.build_export_rollups(df_long)['week']
+    result = app.build_rollup_series(df_long, rollup, '1310', 'week')
+
+    assert result['nazwa'] == 'Linia'
+    assert result['series'][0]['x'] == ['Tydz. 1 (1-7)', 'Tydz. 2 (8-14)', 'Tydz. 3 (15-21)',
+                                        'Tydz. 4 (22-28)', 'Tydz. 5 (29-31)']
+    bars = {s['name']: s for s in result['series'] if s['type'] == 'bar'}
+    lines = {s['name']: s for s in result['series'] if s['type'] == 'line'}
+    assert [s['type'] for s in result['series']] == ['bar', 'bar', 'line', 'line']
+    # Okres bez danych brygady to 0, jak w widoku dziennym
+    assert bars['A']['y'] == [15, 35, 50, 0, 65]
+    assert bars['A']['total'] == [30, 70, 50, 0, 130]
+    assert bars['A']['days'] == [2, 2, 1, 0, 2]
+    assert lines['Narastająco A']['y'] == [100, 140, 0, 0, 310]
+    assert bars['B']['y'] == [0, 0, 0, 90, 0]
+
+
+def test_month_series_and_unknown_machine(df_long):
+    rollup = app.build_export_rollups(df_long)['month']
+    result = app.build_rollup_series(df_long, rollup, '1310', 'month')
+    bars = {s['name']: s for s in result['series'] if s['type'] == 'bar'}
+    assert bars['A']['x'] == ['Miesiąc']
+    assert (bars['A']['y'], bars['A']['total'], bars['A']['days']) == ([40], [280], [7])
+
+    assert app.build_rollup_series(df_long, rollup, '9999', 'month')['series'] == []
+
+
+def test_rollup_endpoint_matches_snapshot(kiosk_data):
+    client = app.app.test_client()
+    assert client.get('/api/series?kod=1310&granularity=year').status_code == 400
+    response = client.get('/api/series?kod=1310&granularity=week')
+    assert response.status_code == 200
+    with app.app.test_request_context():
+        store = app.data_store()
+        expected = app.build_rollup_series(store.frame('export'), store.rollup('week'), '1310', 'week')
+    assert response.get_json() == expected
@@ -0,0 +1,36 @@
+import gzip
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def asset_folder(tmp_path, monkeypatch):
+    content = b'console.log("kiosk");\n' * 100
+    (tmp_path / 'main.abc123.js').write_bytes(content)
+    (tmp_path / 'main.abc123.js.gz').write_bytes(gzip.compress(content))
+    (tmp_path / 'main.abc123.js.br').write_bytes(b'brotli-body')
+    monkeypatch.setattr(app, 'ASSET_FOLDER', str(tmp_path))
+    return content
+
+
+def test_brotli_refused_with_q0_falls_back_to_gzip(asset_folder):
+    response = app.app.test_client().get('/static/dist/main.abc123.js',
+                                          headers={'Accept-Encoding': 'br;q=0, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == asset_folder
+
+
+def test_all_encodings_refused_returns_identity(asset_folder):
+    response = app.app.test_client().get('/static/dist/main.abc123.js',
+                                          headers={'Accept-Encoding': 'br;q=0, gzip;q=0'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == asset_folder
+
+
+def test_brotli_preferred_when_accepted(asset_folder):
+    response = app.app.test_client().get('/static/dist/main.abc123.js',
+                                          headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.get_data() == b'brotli-body'